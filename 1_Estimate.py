@@ -1,8 +1,9 @@
+import copy
 import streamlit as st
-import json
-from datetime import datetime
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import pricing
+import save_queue
+import timing
+from pricing_graph import PricingGraph
 
 # Inject custom CSS to hide sidebar page titles on mobile
 st.markdown(
@@ -50,372 +51,258 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Google Sheets setup
-def get_google_sheets_client():
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds_dict = json.loads(st.secrets["GOOGLE_CREDENTIALS"])
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    client = gspread.authorize(creds)
-    return client
-
-def save_estimate(account_name, inputs, results):
+def save_estimate(account_name, inputs, results, replace=False):
+    # Queued locally and synced to the estimate store in the background. A
+    # save only replaces the version this session last saved (or, for an
+    # account it hasn't saved yet, only adds it), so it never silently
+    # overwrites someone else's estimate; replace=True overwrites anyway.
     try:
-        client = get_google_sheets_client()
-        spreadsheet_id = st.secrets["SPREADSHEET_ID"]
-        st.write(f"Using Spreadsheet ID: {spreadsheet_id}")
-        sheet = client.open_by_key(spreadsheet_id).sheet1
-        all_records = sheet.get_all_records()
-        row_to_update = None
-        for idx, record in enumerate(all_records, start=2):
-            if record["Account Name"] == account_name:
-                row_to_update = idx
-                break
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        inputs_str = json.dumps(inputs)
-        results_str = json.dumps(results)
-        st.write(f"Saving inputs: {inputs_str}")
-        st.write(f"Saving results: {results_str}")
-        if row_to_update:
-            sheet.update(f"A{row_to_update}:D{row_to_update}", [[account_name, timestamp, inputs_str, results_str]])
+        queue = save_queue.get_save_queue()
+        # A save of ours that synced since the last rerun is the version to replace
+        note_synced_save(account_name)
+        saved = st.session_state.saved_estimates.get(account_name)
+        if replace:
+            to_save, expected_version, base_inputs = inputs, None, None
+        elif saved:
+            # Our edits since the last save, on top of what that save stored
+            to_save, _ = save_queue.merge_inputs(saved["mine"], inputs, saved["stored"])
+            expected_version, base_inputs = saved["version"], saved["stored"]
         else:
-            sheet.append_row([account_name, timestamp, inputs_str, results_str])
-        st.success(f"Estimate for {account_name} saved to Google Sheets!")
+            to_save, expected_version, base_inputs = inputs, 0, None
+        if to_save != inputs:
+            results = pricing.price_estimate(to_save)
+        timestamp = queue.enqueue(account_name, to_save, results, expected_version, base_inputs)
+        st.session_state.pending_saves[account_name] = (timestamp, copy.deepcopy(inputs))
+        st.success(f"Estimate for {account_name} queued for {queue.store.name}.")
     except Exception as e:
         st.error(f"Failed to save estimate. Error: {str(e)}")
         raise e
 
+def note_synced_save(account_name):
+    # The account's last synced save, if any; when it is this session's
+    # pending save, later saves from this session build on it
+    synced = save_queue.get_save_queue().synced(account_name)
+    pending = st.session_state.pending_saves.get(account_name)
+    if synced and pending and synced["timestamp"] == pending[0]:
+        st.session_state.saved_estimates[account_name] = {
+            "version": synced["version"], "stored": synced["inputs"], "mine": pending[1],
+        }
+        del st.session_state.pending_saves[account_name]
+    return synced
+
+def display_save_status(account_name):
+    queue = save_queue.get_save_queue()
+    status, error = queue.status(account_name)
+    if status == "synced":
+        synced = note_synced_save(account_name)
+        st.caption(f"Estimate for {account_name} is synced.")
+        if synced and synced["merged"]:
+            merged = ", ".join(key.replace("_", " ") for key in synced["merged"])
+            st.caption(f"It was merged with changes someone else saved at the same time: {merged}.")
+    elif status == "queued":
+        st.caption(f"Estimate for {account_name} is queued and will sync shortly.")
+    elif status == "retrying":
+        st.caption(f"Estimate for {account_name} is queued; retrying after error: {error}")
+    elif status == "conflict":
+        st.warning(f"Estimate for {account_name} was not saved. {error}.")
+        if st.button("Replace the saved estimate"):
+            save_estimate(account_name, st.session_state.inputs, st.session_state.results, replace=True)
+
 # Initialize session state
 if "inputs" not in st.session_state:
-    st.session_state.inputs = {
-        "total_perimeter": 0,
-        "max_height": 0,
-        "house_dirtiness": "Light",
-        "stories": 1.0,
-        "pest_infestation": "Light",
-        "ladder_spots_pest": 0,
-        "structure_type": "Main",
-        "rodent_stations": 4,
-        "interior_monitoring": False,
-        "exterior_standard_windows": 0,
-        "exterior_high_windows": 0,
-        "interior_standard_windows": 0,
-        "interior_high_windows": 0,
-        "tracks_sills_price": 99.0,
-        "roof_treatment": "NO",
-        "roof_type": "Asphalt",
-        "roof_sq_ft": 0,
-        "roof_metal_min": 399.0,
-        "gutter_cleaning": "NO",
-        "gutter_linear_feet": 0,
-        "roof_blow_off": "NO",
-        "blow_off_hours": 0,
-        "blow_off_men": 1,
-        "concrete_cleaning": "NO",
-        "concrete_sq_ft": 0,
-        "deck_dock_cleaning": "NO",
-        "deck_dock_sq_ft": 0,
-        "vinyl_porch_cleaning": "NO",
-        "vinyl_panels": 0,
-        "storm_windows_cleaning": "NO",
-        "storm_windows": 0,
-        "custom_items": [],
-    }
+    st.session_state.inputs = pricing.default_inputs()
 
 if "results" not in st.session_state:
     st.session_state.results = {}
 
+# Saves of this session: account -> the stored version, what it stored and
+# the inputs we sent, used to make the next save of that account conditional
+if "saved_estimates" not in st.session_state:
+    st.session_state.saved_estimates = {}
+if "pending_saves" not in st.session_state:
+    st.session_state.pending_saves = {}
+
+# Live pricing: only lines whose inputs changed are repriced on each rerun
+if "pricing_graph" not in st.session_state:
+    st.session_state.pricing_graph = PricingGraph()
+
+# The page is split into fragments: property measurements, one section per
+# selected add-on, and the estimate summary. Editing a field reruns only its
+# own section (when it has dependent widgets) and the summary, not the whole
+# page. Every value is read back from the widget keys in session state, which
+# match the pricing input names.
+SUMMARY_FRAGMENT = "estimate_summary"
+
+PROPERTY_INPUTS = [
+    "total_perimeter",
+    "max_height",
+    "house_dirtiness",
+    "stories",
+    "pest_infestation",
+    "ladder_spots_pest",
+    "structure_type",
+    "rodent_stations",
+    "interior_monitoring",
+    "exterior_standard_windows",
+    "exterior_high_windows",
+    "interior_standard_windows",
+    "interior_high_windows",
+    "tracks_sills_price",
+]
+
+def rerun_sections(*fragment_keys):
+    # Widget callback: rerun the named fragments and the summary only
+    return lambda: st.rerun([*fragment_keys, SUMMARY_FRAGMENT])
+
+def addon_fragment_key(service):
+    return f"addon_{service}"
+
+def service_inputs(service):
+    state = st.session_state
+    if service == "roof treatment":
+        roof_metal_min = state.get("roof_metal_min", 399.0) if state.roof_type == "Metal" else 399.0
+        return {"roof_type": state.roof_type, "roof_sq_ft": state.roof_sq_ft, "roof_metal_min": roof_metal_min}
+    if service == "roof blow-off":
+        return {"blow_off_hours": state.blow_off_hours, "blow_off_men": state.blow_off_men}
+    if service == "custom items":
+        return {"custom_items": [{"name": state.custom_item_name, "price": state.custom_item_price}]}
+    input_name = pricing.ADDITIONAL_SERVICE_PRICES[service][1]
+    return {input_name: state[input_name]}
+
 # Display pricing estimate
 def display_pricing_estimate():
     if st.session_state.results:
         st.header("Pricing Estimate")
-        for service in ["house_washing", "pest_control", "rodent_control", "exterior_windows", "interior_windows", "tracks_sills"]:
+        for service in pricing.BASE_SERVICES:
             if service in st.session_state.results:
                 st.write(f"{service.replace('_', ' ')}: ${st.session_state.results[service]:.2f}")
         for service, price in st.session_state.results.items():
-            if service not in ["house_washing", "pest_control", "rodent_control", "exterior_windows", "interior_windows", "tracks_sills", "total"]:
+            if service not in pricing.BASE_SERVICES and service != "total":
                 st.write(f"{service}: ${price:.2f}")
         if "total" in st.session_state.results:
             st.write(f"**TOTAL: ${st.session_state.results['total']:.2f}**")
 
+@st.fragment(key="property_inputs")
+def property_inputs():
+    refresh = rerun_sections()
+
+    # Shared Inputs for House Washing and Pest Control
+    st.subheader("Property Measurements")
+    st.number_input("Total Perimeter (ft)", min_value=0.0, step=1.0, key="total_perimeter", on_change=refresh)
+    st.selectbox("Number of Stories", [1.0, 1.5, 2.0, 2.5, 3.0], key="stories", on_change=refresh)
+
+    # House Washing
+    st.subheader("House Washing")
+    st.number_input("Max Height (ft)", min_value=0.0, step=1.0, key="max_height", on_change=refresh)
+    st.radio("Dirtiness", ["Light", "Medium", "Heavy"], key="house_dirtiness", on_change=refresh)
+
+    # Pest Control
+    st.subheader("Pest Control")
+    st.radio("Infestation Level", ["Light", "Medium", "Heavy"], key="pest_infestation", on_change=refresh)
+    st.number_input("Ladder Spots (Pest Control)", min_value=0, step=1, key="ladder_spots_pest", on_change=refresh)
+    st.radio("Structure Type", ["Main", "Additional"], key="structure_type", on_change=refresh)
+
+    # Rodent Control (Unchanged)
+    st.subheader("Rodent Control")
+    st.number_input("Rodent Stations", min_value=0, step=1, value=4, key="rodent_stations", on_change=refresh)
+    st.checkbox("Interior Monitoring", key="interior_monitoring", on_change=refresh)
+
+    # Window Cleaning (Unchanged)
+    st.subheader("Window Cleaning")
+    st.number_input("Exterior Standard Windows", min_value=0, step=1, key="exterior_standard_windows", on_change=refresh)
+    st.number_input("Exterior High Windows", min_value=0, step=1, key="exterior_high_windows", on_change=refresh)
+    st.number_input("Interior Standard Windows", min_value=0, step=1, key="interior_standard_windows", on_change=refresh)
+    st.number_input("Interior High Windows", min_value=0, step=1, key="interior_high_windows", on_change=refresh)
+    st.number_input("Tracks/Sills Price (minimum $99)", min_value=0.0, step=1.0, value=99.0, key="tracks_sills_price", on_change=refresh)
+
+def addon_section(service):
+    refresh = rerun_sections(addon_fragment_key(service))
+    if service == "roof treatment":
+        roof_type = st.selectbox("Roof Type", ["Asphalt", "Metal"], key="roof_type", on_change=refresh)
+        st.number_input("Roof Square Footage", min_value=0, step=100, key="roof_sq_ft", on_change=refresh)
+        if roof_type == "Metal":
+            st.number_input("Metal Roof Minimum (399 or 599)", min_value=399.0, step=1.0, value=399.0, key="roof_metal_min", on_change=refresh)
+    elif service == "gutter cleaning":
+        st.number_input("Gutter Linear Feet", min_value=0, step=1, key="gutter_linear_feet", on_change=refresh)
+    elif service == "roof blow-off":
+        st.number_input(
+            "Hours for Roof Blow-Off", 
+            min_value=0.0, 
+            max_value=10.0, 
+            step=0.25, 
+            format="%.2f", 
+            key="blow_off_hours",
+            on_change=refresh
+        )
+        st.selectbox("Number of Men", [1, 2], key="blow_off_men", on_change=refresh)
+    elif service == "concrete cleaning":
+        st.number_input("Concrete Square Footage", min_value=0, step=100, key="concrete_sq_ft", on_change=refresh)
+    elif service == "deck/dock cleaning":
+        st.number_input("Deck/Dock Square Footage", min_value=0, step=100, key="deck_dock_sq_ft", on_change=refresh)
+    elif service == "vinyl porch cleaning":
+        st.number_input("Number of Vinyl Panels", min_value=0, step=1, key="vinyl_panels", on_change=refresh)
+    elif service == "storm windows":
+        st.number_input("Number of Storm Windows", min_value=0, step=1, key="storm_windows", on_change=refresh)
+    elif service == "custom items":
+        st.text_input("Custom Item Name", key="custom_item_name", on_change=refresh)
+        st.number_input("Custom Item Price", min_value=0.0, step=1.0, key="custom_item_price", on_change=refresh)
+
+    missing_detail = pricing.missing_additional_details(service, service_inputs(service))
+    if missing_detail:
+        st.error(pricing.missing_details_message([missing_detail]))
+
+@st.fragment(key=SUMMARY_FRAGMENT)
+@timing.request(f"fragment {SUMMARY_FRAGMENT}")
+def estimate_summary(additional_services):
+    inputs = st.session_state.inputs
+    inputs.update({name: st.session_state[name] for name in PROPERTY_INPUTS})
+
+    priced_services = []
+    for service in additional_services:
+        addon_inputs = service_inputs(service)
+        if pricing.missing_additional_details(service, addon_inputs):
+            continue
+        inputs.update(addon_inputs)
+        priced_services.append(service)
+
+    # Record which add-ons are on this estimate
+    for service, flag in pricing.ADDITIONAL_SERVICE_FLAGS.items():
+        inputs[flag] = "YES" if service in priced_services else "NO"
+    if "custom items" not in priced_services:
+        inputs["custom_items"] = []
+
+    # Reprice what changed; the graph keeps the total (and truck minimum) current
+    pricing_graph = st.session_state.pricing_graph
+    st.session_state.results = pricing_graph.update(inputs, priced_services)
+    if pricing_graph.missing:
+        st.info(pricing.missing_details_message(pricing_graph.missing))
+    display_pricing_estimate()
+
+    # Save Estimate Button
+    account_name = st.session_state.account_name
+    if st.session_state.results:
+        if st.button("Save Estimate"):
+            if not account_name:
+                st.error("Please enter an account name before saving.")
+            else:
+                save_estimate(account_name, inputs, st.session_state.results)
+        if account_name:
+            display_save_status(account_name)
+
 # Title
 st.title("CC Inc. Pricing Calculator")
 
 # Account Name
-account_name = st.text_input("Account Name", placeholder="Enter account name (e.g., Rizzo)")
+st.text_input("Account Name", placeholder="Enter account name (e.g., Rizzo)", key="account_name")
 
 # Estimate Details
 st.header("Estimate Details")
-
-# Shared Inputs for House Washing and Pest Control
-st.subheader("Property Measurements")
-total_perimeter = st.number_input("Total Perimeter (ft)", min_value=0.0, step=1.0, key="total_perimeter")
-stories = st.selectbox("Number of Stories", [1.0, 1.5, 2.0, 2.5, 3.0], key="stories")
-
-# House Washing
-st.subheader("House Washing")
-max_height = st.number_input("Max Height (ft)", min_value=0.0, step=1.0, key="max_height")
-house_dirtiness = st.radio("Dirtiness", ["Light", "Medium", "Heavy"], key="house_dirtiness")
-
-# Pest Control
-st.subheader("Pest Control")
-pest_infestation = st.radio("Infestation Level", ["Light", "Medium", "Heavy"], key="pest_infestation")
-ladder_spots_pest = st.number_input("Ladder Spots (Pest Control)", min_value=0, step=1, key="ladder_spots_pest")
-structure_type = st.radio("Structure Type", ["Main", "Additional"], key="structure_type")
-
-# Rodent Control (Unchanged)
-st.subheader("Rodent Control")
-rodent_stations = st.number_input("Rodent Stations", min_value=0, step=1, value=4, key="rodent_stations")
-interior_monitoring = st.checkbox("Interior Monitoring", key="interior_monitoring")
-
-# Window Cleaning (Unchanged)
-st.subheader("Window Cleaning")
-exterior_standard_windows = st.number_input("Exterior Standard Windows", min_value=0, step=1, key="exterior_standard_windows")
-exterior_high_windows = st.number_input("Exterior High Windows", min_value=0, step=1, key="exterior_high_windows")
-interior_standard_windows = st.number_input("Interior Standard Windows", min_value=0, step=1, key="interior_standard_windows")
-interior_high_windows = st.number_input("Interior High Windows", min_value=0, step=1, key="interior_high_windows")
-tracks_sills_price = st.number_input("Tracks/Sills Price (minimum $99)", min_value=0.0, step=1.0, value=99.0, key="tracks_sills_price")
-
-# Calculate Button
-if st.button("Calculate"):
-    missing_details = []
-    if total_perimeter == 0:
-        missing_details.append("total perimeter")
-    if max_height == 0:
-        missing_details.append("max height for house washing")
-    if tracks_sills_price == 0:
-        missing_details.append("tracks/sills price (or confirm to use default $99)")
-
-    if missing_details:
-        st.error(f"I need more information to calculate the prices. Please provide: {', '.join(missing_details)}.")
-    else:
-        # House Washing Calculation
-        house_sq_ft = total_perimeter * max_height
-        if house_sq_ft < 6000:
-            house_base_rate = 0.094
-        elif house_sq_ft < 10000:
-            house_base_rate = 0.067
-        else:
-            house_base_rate = 0.111
-        house_condition_adder = 0
-        if house_dirtiness == "Medium":
-            house_condition_adder = 76
-        elif house_dirtiness == "Heavy":
-            house_condition_adder = 152
-        house_washing_total = (house_sq_ft * house_base_rate) + house_condition_adder
-        st.write(f"DEBUG: House Washing - Sq Ft: {house_sq_ft}, Base Rate: {house_base_rate}, Condition Adder: {house_condition_adder}, Pre-Min Total: {house_washing_total}")
-        house_washing_total = max(house_washing_total, 429)  # Minimum price
-        st.write(f"DEBUG: House Washing - After Min Total: {house_washing_total}")
-
-        # Pest Control Calculation
-        treated_area = total_perimeter * (stories * 10)
-        if treated_area < 6000:
-            pest_base_rate = 0.033 if structure_type == "Main" else 0.049
-        else:
-            pest_base_rate = 0.030
-        pest_infestation_adder = 0
-        if pest_infestation == "Medium":
-            pest_infestation_adder = 50
-        elif pest_infestation == "Heavy":
-            pest_infestation_adder = 100
-        ladder_cost = 25 if ladder_spots_pest > 0 else 0
-        ladder_cost += (ladder_spots_pest - 1) * 15 if ladder_spots_pest > 1 else 0
-        pest_total = (treated_area * pest_base_rate) + pest_infestation_adder + ladder_cost
-        if structure_type == "Main":
-            pest_minimum_price = 179 if treated_area < 3000 else 145
-            pest_total = max(pest_total, pest_minimum_price)
-
-        # Rodent Control Calculation (Unchanged)
-        rodent_base_price = 399.00
-        extra_stations = max(0, rodent_stations - 4)
-        rodent_stations_price = extra_stations * 30.00
-        interior_monitoring_price = 50.00 if interior_monitoring else 0.00
-        rodent_control_total = rodent_base_price + rodent_stations_price + interior_monitoring_price
-
-        # Window Cleaning Calculation (Unchanged)
-        exterior_windows_total = (exterior_standard_windows * 3.30) + (exterior_high_windows * 5.25)
-        if exterior_windows_total > 0 and exterior_windows_total < 149.00:
-            exterior_windows_total = 149.00
-        elif exterior_windows_total == 0:
-            exterior_windows_total = 0.00
-
-        interior_windows_total = (interior_standard_windows * 2.00) + (interior_high_windows * 4.00)
-        if interior_windows_total > 0 and interior_windows_total < 99.00:
-            interior_windows_total = 99.00
-        elif interior_windows_total == 0:
-            interior_windows_total = 0.00
-
-        tracks_sills_total = tracks_sills_price if tracks_sills_price > 0 else 99.00
-
-        # Store mandatory results
-        results = {
-            "house_washing": round(house_washing_total, 2),
-            "pest_control": round(pest_total, 2),
-            "rodent_control": round(rodent_control_total, 2),
-            "exterior_windows": round(exterior_windows_total, 2),
-            "interior_windows": round(interior_windows_total, 2),
-            "tracks_sills": round(tracks_sills_total, 2),
-        }
-        st.write(f"DEBUG: House Washing - Final Stored Value: {results['house_washing']}")
-
-        # Calculate initial total and apply truck minimum
-        total = sum(results.values())
-        total = max(total, 299.00)  # Apply truck minimum of $299
-        results["total"] = round(total, 2)
-
-        # Update inputs in session state
-        st.session_state.inputs.update({
-            "total_perimeter": total_perimeter,
-            "max_height": max_height,
-            "house_dirtiness": house_dirtiness,
-            "stories": stories,
-            "pest_infestation": pest_infestation,
-            "ladder_spots_pest": ladder_spots_pest,
-            "structure_type": structure_type,
-            "rodent_stations": rodent_stations,
-            "interior_monitoring": interior_monitoring,
-            "exterior_standard_windows": exterior_standard_windows,
-            "exterior_high_windows": exterior_high_windows,
-            "interior_standard_windows": interior_standard_windows,
-            "interior_high_windows": interior_high_windows,
-            "tracks_sills_price": tracks_sills_price,
-        })
-
-        # Store results in session state
-        st.session_state.results = results
-
-        # Display the initial pricing estimate
-        display_pricing_estimate()
-
-        # Show the additional services prompt
-        st.session_state.show_additional_services = True
+property_inputs()
 
 # Additional Services
-if "show_additional_services" in st.session_state and st.session_state.show_additional_services:
-    st.header("Additional Services")
-    additional_services = st.multiselect("Select additional services:", [
-        "roof treatment", "gutter cleaning", "roof blow-off", "concrete cleaning", 
-        "deck/dock cleaning", "vinyl porch cleaning", "storm windows", "custom items"
-    ])
-
-    additional_results = {}
-    if additional_services:
-        for service in additional_services:
-            if service == "roof treatment":
-                roof_type = st.selectbox("Roof Type", ["Asphalt", "Metal"], key="roof_type")
-                roof_sq_ft = st.number_input("Roof Square Footage", min_value=0, step=100, key="roof_sq_ft")
-                roof_metal_min = st.number_input("Metal Roof Minimum (399 or 599)", min_value=399.0, step=1.0, value=399.0, key="roof_metal_min") if roof_type == "Metal" else 399.0
-                if roof_sq_ft == 0:
-                    st.error("I need more information to calculate the prices. Please provide: roof square footage.")
-                    continue
-                rate = 0.25 if roof_type == "Asphalt" else 0.85
-                min_price = 399.0 if roof_type == "Asphalt" else roof_metal_min
-                roof_price = roof_sq_ft * rate
-                roof_price = max(roof_price, min_price)
-                additional_results["roof treatment"] = round(roof_price, 2)
-                st.session_state.inputs.update({
-                    "roof_treatment": "YES",
-                    "roof_type": roof_type,
-                    "roof_sq_ft": roof_sq_ft,
-                    "roof_metal_min": roof_metal_min,
-                })
-            elif service == "gutter cleaning":
-                gutter_linear_feet = st.number_input("Gutter Linear Feet", min_value=0, step=1, key="gutter_linear_feet")
-                if gutter_linear_feet == 0:
-                    st.error("I need more information to calculate the prices. Please provide: gutter linear feet.")
-                    continue
-                gutter_price = gutter_linear_feet * 0.50
-                gutter_price = max(gutter_price, 149.00)
-                additional_results["gutter cleaning"] = round(gutter_price, 2)
-                st.session_state.inputs.update({
-                    "gutter_cleaning": "YES",
-                    "gutter_linear_feet": gutter_linear_feet,
-                })
-            elif service == "roof blow-off":
-                blow_off_hours = st.number_input(
-                    "Hours for Roof Blow-Off", 
-                    min_value=0.0, 
-                    max_value=10.0, 
-                    step=0.25, 
-                    format="%.2f", 
-                    key="blow_off_hours"
-                )
-                blow_off_men = st.selectbox("Number of Men", [1, 2], key="blow_off_men")
-                if blow_off_hours == 0:
-                    st.error("I need more information to calculate the prices. Please provide: hours for roof blow-off.")
-                    continue
-                blow_off_price = (blow_off_hours * 149.00) + (blow_off_hours * 42.00 if blow_off_men == 2 else 0)
-                additional_results["roof blow-off"] = round(blow_off_price, 2)
-                st.session_state.inputs.update({
-                    "roof_blow_off": "YES",
-                    "blow_off_hours": blow_off_hours,
-                    "blow_off_men": blow_off_men,
-                })
-            elif service == "concrete cleaning":
-                concrete_sq_ft = st.number_input("Concrete Square Footage", min_value=0, step=100, key="concrete_sq_ft")
-                if concrete_sq_ft == 0:
-                    st.error("I need more information to calculate the prices. Please provide: concrete square footage.")
-                    continue
-                concrete_price = concrete_sq_ft * 0.15
-                additional_results["concrete cleaning"] = round(concrete_price, 2)
-                st.session_state.inputs.update({
-                    "concrete_cleaning": "YES",
-                    "concrete_sq_ft": concrete_sq_ft,
-                })
-            elif service == "deck/dock cleaning":
-                deck_dock_sq_ft = st.number_input("Deck/Dock Square Footage", min_value=0, step=100, key="deck_dock_sq_ft")
-                if deck_dock_sq_ft == 0:
-                    st.error("I need more information to calculate the prices. Please provide: deck/dock square footage.")
-                    continue
-                deck_dock_price = deck_dock_sq_ft * 0.15
-                additional_results["deck/dock cleaning"] = round(deck_dock_price, 2)
-                st.session_state.inputs.update({
-                    "deck_dock_cleaning": "YES",
-                    "deck_dock_sq_ft": deck_dock_sq_ft,
-                })
-            elif service == "vinyl porch cleaning":
-                vinyl_panels = st.number_input("Number of Vinyl Panels", min_value=0, step=1, key="vinyl_panels")
-                if vinyl_panels == 0:
-                    st.error("I need more information to calculate the prices. Please provide: number of vinyl panels.")
-                    continue
-                vinyl_porch_price = vinyl_panels * 13.00  # $13 per panel
-                additional_results["vinyl porch cleaning"] = round(vinyl_porch_price, 2)
-                st.session_state.inputs.update({
-                    "vinyl_porch_cleaning": "YES",
-                    "vinyl_panels": vinyl_panels,
-                })
-            elif service == "storm windows":
-                storm_windows = st.number_input("Number of Storm Windows", min_value=0, step=1, key="storm_windows")
-                if storm_windows == 0:
-                    st.error("I need more information to calculate the prices. Please provide: number of storm windows.")
-                    continue
-                storm_windows_price = storm_windows * 20.00  # $20 per storm window
-                additional_results["storm windows"] = round(storm_windows_price, 2)
-                st.session_state.inputs.update({
-                    "storm_windows_cleaning": "YES",
-                    "storm_windows": storm_windows,
-                })
-            elif service == "custom items":
-                custom_item_name = st.text_input("Custom Item Name", key="custom_item_name")
-                custom_item_price = st.number_input("Custom Item Price", min_value=0.0, step=1.0, key="custom_item_price")
-                if not custom_item_name or custom_item_price == 0:
-                    st.error("I need more information to calculate the prices. Please provide: custom item name and price.")
-                    continue
-                custom_item = {"name": custom_item_name, "price": custom_item_price}
-                st.session_state.inputs["custom_items"].append(custom_item)
-                additional_results[f"custom line item ({custom_item_name})"] = round(custom_item_price, 2)
-
-        if additional_results:
-            st.session_state.results.update(additional_results)
-            # Recalculate total with truck minimum
-            total = sum(st.session_state.results.values()) - st.session_state.results.get("total", 0)
-            total = max(total, 299.00)  # Apply truck minimum
-            st.session_state.results["total"] = round(total, 2)
-        display_pricing_estimate()
-
-# Save Estimate Button
-if st.session_state.results:
-    if st.button("Save Estimate"):
-        if not account_name:
-            st.error("Please enter an account name before saving.")
-        else:
-            save_estimate(account_name, st.session_state.inputs, st.session_state.results)
+st.header("Additional Services")
+additional_services = st.multiselect("Select additional services:", pricing.ADDITIONAL_SERVICES, key="additional_services")
+for service in additional_services:
+    st.fragment(addon_section, key=addon_fragment_key(service))(service)
+
+estimate_summary(additional_services)
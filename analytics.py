@@ -0,0 +1,286 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+
+import rates
+import timing
+from config import get_secret
+from estimate_codec import decode_inputs, decode_results
+
+# Management figures over the saved estimates: revenue by service group,
+# average ticket, and how often the truck minimum or a service minimum sets
+# the price, month by month. Each account counts once, with its latest save,
+# in the month of that save.
+#
+# The figures are kept in their own SQLite file, next to whichever store
+# holds the estimates: one row of facts per account (month, total, revenue
+# per group, minimum flags) and their sums per month. Every save through
+# storage.CachedEstimateStore swaps the account's old facts out of the sums
+# and the new ones in, so the Analytics page never decodes a Results cell.
+# rebuild() recomputes everything from the store in one pass, a chunk of
+# records at a time: each chunk is decoded into columns and its facts are
+# worked out a column at a time with numpy. Single saves go through the same
+# column code, so both paths give the same numbers.
+
+DEFAULT_DB_PATH = os.path.join("estimates", "analytics.db")
+
+# Revenue groups -> the result lines in them; every other line is an add-on
+SERVICE_GROUPS = {
+    "house_washing": ["house_washing"],
+    "pest_control": ["pest_control"],
+    "rodent_control": ["rodent_control"],
+    "windows": ["exterior_windows", "interior_windows", "tracks_sills"],
+}
+GROUPS = list(SERVICE_GROUPS) + ["add_ons"]
+
+GROUP_LABELS = {
+    "house_washing": "House washing",
+    "pest_control": "Pest control",
+    "rodent_control": "Rodent control",
+    "windows": "Windows",
+    "add_ons": "Add-ons",
+}
+
+# Result lines that have a minimum price, checked against the estimate's rate table
+MINIMUM_LINES = ["house_washing", "pest_control", "exterior_windows", "interior_windows", "roof treatment", "gutter cleaning"]
+
+# Sums kept per month, in table column order
+SUMS = ["estimates", "total"] + GROUPS + ["truck_minimum", "service_minimum"]
+
+UNKNOWN_PERIOD = "unknown"
+
+
+def period(timestamp):
+    # "2024-05-17 14:03:00" -> "2024-05"
+    timestamp = str(timestamp)
+    try:
+        return datetime.strptime(timestamp[:7], "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        return UNKNOWN_PERIOD
+
+
+def _columns(estimates):
+    # (account_name, timestamp, inputs, results) tuples -> dict of columns,
+    # with the prices of the lines that have minimums in "line <name>"
+    columns = {
+        name: []
+        for name in ["account_name", "period", "total", "lines", "rate_version", "main_structure", "roof_metal_min"]
+        + GROUPS + [f"line {service}" for service in MINIMUM_LINES]
+    }
+    for account_name, timestamp, inputs, results in estimates:
+        columns["account_name"].append(account_name)
+        columns["period"].append(period(timestamp))
+        columns["total"].append(float(results.get("total", 0.0)))
+        lines = {service: float(price) for service, price in results.items() if service != "total"}
+        columns["lines"].append(sum(lines.values()))
+        grouped = 0.0
+        for group, services in SERVICE_GROUPS.items():
+            revenue = sum(lines.get(service, 0.0) for service in services)
+            columns[group].append(revenue)
+            grouped += revenue
+        columns["add_ons"].append(columns["lines"][-1] - grouped)
+        for service in MINIMUM_LINES:
+            columns[f"line {service}"].append(lines.get(service, 0.0))
+        # Estimates saved before rate versions were priced with the first table
+        columns["rate_version"].append(inputs.get("rate_version") or rates.versions()[0])
+        columns["main_structure"].append(inputs.get("structure_type", "Main") == "Main")
+        columns["roof_metal_min"].append(float(inputs.get("roof_metal_min", 0.0)))
+    return {
+        name: np.array(values, dtype=object if name in ("account_name", "period", "rate_version") else None)
+        for name, values in columns.items()
+    }
+
+
+def _at_minimum(prices, minimums):
+    # Non-zero lines priced exactly at one of the minimums
+    return (prices > 0) & np.isin(np.round(prices, 2), np.round(np.asarray(minimums, dtype=float), 2))
+
+
+def _facts(columns):
+    # Truck and service minimum flags for every row, one rate table at a time
+    n = len(columns["account_name"])
+    truck = np.zeros(n, dtype=bool)
+    service = np.zeros(n, dtype=bool)
+    for version in set(columns["rate_version"]):
+        rows = columns["rate_version"] == version
+        try:
+            table = rates.rate_table(version)
+        except ValueError:
+            # A rate version since removed from rates.json: no flags
+            continue
+        truck[rows] = columns["lines"][rows] < table["truck_minimum"]
+        at_minimum = (
+            _at_minimum(columns["line house_washing"][rows], [table["house_washing"]["minimum"]])
+            | (columns["main_structure"][rows] & _at_minimum(columns["line pest_control"][rows], table["pest_control"]["main_minimum"].values))
+            | _at_minimum(columns["line exterior_windows"][rows], [table["exterior_windows"]["minimum"]])
+            | _at_minimum(columns["line interior_windows"][rows], [table["interior_windows"]["minimum"]])
+            | _at_minimum(columns["line gutter cleaning"][rows], [table["gutter cleaning"]["minimum"]])
+        )
+        roof = columns["line roof treatment"][rows]
+        at_minimum |= _at_minimum(roof, [table["roof treatment"]["asphalt_minimum"]])
+        at_minimum |= (roof > 0) & (np.round(roof, 2) == np.round(columns["roof_metal_min"][rows], 2))
+        service[rows] = at_minimum
+    return {
+        "account_name": columns["account_name"],
+        "period": columns["period"],
+        "total": columns["total"],
+        **{group: columns[group] for group in GROUPS},
+        "truck_minimum": truck.astype(int),
+        "service_minimum": service.astype(int),
+    }
+
+
+def _fact_rows(facts, versions):
+    # Facts as (account_name, version, period, total, groups..., flags) tuples
+    return [
+        (
+            facts["account_name"][i], versions[i], facts["period"][i], float(facts["total"][i]),
+            *(float(facts[group][i]) for group in GROUPS),
+            int(facts["truck_minimum"][i]), int(facts["service_minimum"][i]),
+        )
+        for i in range(len(facts["account_name"]))
+    ]
+
+
+class Aggregates:
+    def __init__(self, path=DEFAULT_DB_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        group_columns = "".join(f"{group} REAL NOT NULL, " for group in GROUPS)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS facts (
+                    account_name TEXT PRIMARY KEY,
+                    version INTEGER,
+                    period TEXT NOT NULL,
+                    total REAL NOT NULL,
+                    {group_columns}
+                    truck_minimum INTEGER NOT NULL,
+                    service_minimum INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS monthly (
+                    period TEXT PRIMARY KEY,
+                    estimates INTEGER NOT NULL,
+                    total REAL NOT NULL,
+                    {group_columns}
+                    truck_minimum INTEGER NOT NULL,
+                    service_minimum INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def built_at(self):
+        # When rebuild() last ran, or None if it never has
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = 'built_at'").fetchone()
+        return row["value"] if row else None
+
+    def _add(self, fact, sign):
+        # Adds (sign=1) or takes away (sign=-1) one fact row in its month's sums
+        _, _, month, total, *rest = fact
+        values = [sign, sign * total] + [sign * value for value in rest]
+        self._conn.execute(
+            f"""
+            INSERT INTO monthly (period, {", ".join(SUMS)}) VALUES (?, {", ".join("?" for _ in SUMS)})
+            ON CONFLICT (period) DO UPDATE SET {", ".join(f"{name} = {name} + excluded.{name}" for name in SUMS)}
+            """,
+            [month] + values,
+        )
+
+    @timing.timed("analytics.record")
+    def record(self, estimates):
+        # Swaps in the facts of saved estimates: (account_name, version,
+        # timestamp, inputs, results) tuples. A save older than the facts
+        # already recorded for its account is ignored. Nothing is kept until
+        # the first rebuild(), which would replace it anyway.
+        estimates = list(estimates)
+        if not estimates or self.built_at() is None:
+            return
+        facts = _facts(_columns(
+            (account_name, timestamp, inputs, results) for account_name, _, timestamp, inputs, results in estimates
+        ))
+        rows = _fact_rows(facts, [version for _, version, _, _, _ in estimates])
+        with self._lock, self._conn:
+            # Write lock before reading the old facts, so another process
+            # can't swap the same account out of the sums in between
+            self._conn.execute("BEGIN IMMEDIATE")
+            for fact in rows:
+                old = self._conn.execute("SELECT * FROM facts WHERE account_name = ?", (fact[0],)).fetchone()
+                if old is not None:
+                    if old["version"] is not None and fact[1] is not None and old["version"] > fact[1]:
+                        continue
+                    self._add(tuple(old), -1)
+                self._add(fact, 1)
+                self._conn.execute(f"INSERT OR REPLACE INTO facts VALUES ({', '.join('?' for _ in fact)})", fact)
+
+    @timing.timed("analytics.rebuild")
+    def rebuild(self, store, chunk_size=1000):
+        # Recomputes every figure from store.iter_records(); returns the
+        # number of estimates counted and skipped (unreadable)
+        counted = skipped = 0
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM facts")
+            chunk = []
+            for record in store.iter_records(chunk_size):
+                try:
+                    estimate = (record["Account Name"], record["Timestamp"], decode_inputs(record["Inputs"]), decode_results(record["Results"]))
+                except ValueError:
+                    skipped += 1
+                    continue
+                chunk.append((estimate, record.get("Version")))
+                if len(chunk) >= chunk_size:
+                    counted += self._insert_facts(chunk)
+                    chunk = []
+            if chunk:
+                counted += self._insert_facts(chunk)
+            self._conn.execute("DELETE FROM monthly")
+            self._conn.execute(
+                f"""
+                INSERT INTO monthly (period, {", ".join(SUMS)})
+                SELECT period, COUNT(*), {", ".join(f"SUM({name})" for name in SUMS[1:])} FROM facts GROUP BY period
+                """
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state VALUES ('built_at', ?)", (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),)
+            )
+        return counted, skipped
+
+    def _insert_facts(self, chunk):
+        facts = _facts(_columns(estimate for estimate, _ in chunk))
+        rows = _fact_rows(facts, [version for _, version in chunk])
+        # A Sheets account listed twice counts once, with its last row
+        self._conn.executemany(f"INSERT OR REPLACE INTO facts VALUES ({', '.join('?' for _ in rows[0])})", rows)
+        return len(rows)
+
+    def monthly(self):
+        # One dict of sums per month, oldest first
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM monthly WHERE estimates > 0 ORDER BY period").fetchall()
+        return [dict(row) for row in rows]
+
+
+_aggregates = None
+_aggregates_lock = threading.Lock()
+
+
+def get_aggregates():
+    # Process-wide aggregates in the ANALYTICS_DB_PATH file
+    global _aggregates
+    with _aggregates_lock:
+        if _aggregates is None:
+            _aggregates = Aggregates(get_secret("ANALYTICS_DB_PATH", DEFAULT_DB_PATH))
+        return _aggregates
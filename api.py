@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import contextvars
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Match, Route
+
+import batch_pricing
+import pricing
+import rates
+import save_queue
+import storage
+import timing
+from config import get_secret
+from estimate_codec import StoredEstimate
+
+# HTTP pricing API for the CRM and the website quote form, next to the
+# Streamlit app and over the same pricing rules and estimate store:
+#
+#   POST /price                  {"inputs": {...}, "additional_services": [...], "rate_version": "1"}
+#   POST /batch-price            {"estimates": [{"inputs": {...}, "additional_services": [...]}, ...], "rate_version": "1"}
+#   POST /estimates              {"account_name": "...", "inputs": {...}, "additional_services": [...], "expected_version": 3}
+#   GET  /estimates/{name}       one saved estimate
+#   GET  /estimates?prefix=&contains=&start=&end=&min_total=&max_total=
+#   GET  /health
+#   GET  /metrics[?format=json]  request timings (see timing.py), Prometheus text by default
+#
+# Inputs use the Estimate page's names (pricing.DEFAULT_INPUTS); anything left
+# out takes its default, and a value of the wrong type gets 400 (see
+# pricing.convert_input). Single quotes are priced on the event loop (they take
+# microseconds); batches and store reads run on bounded thread pools, and once
+# API_MAX_PENDING jobs are waiting new ones get 503 instead of piling up.
+# Saves go through the same write-behind queue as the Estimate page; with
+# "expected_version" (the "version" from GET, or 0 for a new account) a save
+# only replaces that version, and GET reports sync_status "conflict" if
+# someone else saved first.
+# Set API_KEY to require "Authorization: Bearer <key>" on every request.
+#
+#   python api.py --port 8600
+
+MAX_BATCH_ESTIMATES = 10000
+
+_pools = {}
+_pending = None
+
+
+class Busy(Exception):
+    pass
+
+
+def _pool(name):
+    if name not in _pools:
+        workers = int(get_secret("API_WORKERS", 8))
+        _pools[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"api-{name}")
+    return _pools[name]
+
+
+async def _run(pool_name, function, *args):
+    # Runs function(*args) on the named pool, refusing work past the limit
+    global _pending
+    if _pending is None:
+        _pending = asyncio.BoundedSemaphore(int(get_secret("API_MAX_PENDING", 256)))
+    if _pending.locked():
+        raise Busy()
+    async with _pending:
+        # Carry the request's timing context over to the worker thread
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(_pool(pool_name), context.run, function, *args)
+
+
+def _error(status, message, **details):
+    return JSONResponse({"error": message, **details}, status_code=status)
+
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def _estimate_inputs(body):
+    inputs = pricing.default_inputs()
+    given = body.get("inputs") or {}
+    if not isinstance(given, dict):
+        raise ValueError("inputs must be an object")
+    unknown = [key for key in given if key not in pricing.DEFAULT_INPUTS]
+    if unknown:
+        raise ValueError(f"Unknown inputs: {', '.join(unknown)}")
+    for key, value in given.items():
+        try:
+            inputs[key] = pricing.convert_input(key, value)
+        except ValueError as e:
+            raise ValueError(f"Bad {key} {value!r}: {e}") from None
+    if body.get("rate_version"):
+        try:
+            inputs["rate_version"] = pricing.convert_input("rate_version", body["rate_version"])
+        except ValueError as e:
+            raise ValueError(f"Bad rate_version {body['rate_version']!r}: {e}") from None
+    services = body.get("additional_services")
+    if services is not None:
+        if not isinstance(services, list) or not all(isinstance(service, str) for service in services):
+            raise ValueError("additional_services must be a list of service names")
+        unknown = [service for service in services if service not in pricing.ADDITIONAL_SERVICES]
+        if unknown:
+            raise ValueError(f"Unknown additional services: {', '.join(unknown)}")
+        # Same flags the Estimate page records for the add-ons it priced
+        for service, flag in pricing.ADDITIONAL_SERVICE_FLAGS.items():
+            inputs[flag] = "YES" if service in services and not pricing.missing_additional_details(service, inputs) else "NO"
+        if "custom items" not in services:
+            inputs["custom_items"] = []
+    return inputs
+
+
+def _price(inputs):
+    # (results, None) or (None, error response) for one estimate
+    missing = pricing.missing_details(inputs)
+    if missing:
+        return None, _error(422, pricing.missing_details_message(missing), missing=missing)
+    try:
+        return pricing.price_estimate(inputs), None
+    except (TypeError, ValueError) as e:
+        return None, _error(400, str(e))
+
+
+async def price(request):
+    body = await _json_body(request)
+    if body is None:
+        return _error(400, "Expected a JSON object")
+    try:
+        inputs = _estimate_inputs(body)
+    except ValueError as e:
+        return _error(400, str(e))
+    results, error = _price(inputs)
+    if error:
+        return error
+    return JSONResponse({"results": results, "rate_version": inputs["rate_version"]})
+
+
+def _price_many(estimates, rate_version):
+    try:
+        return batch_pricing.price_inputs(estimates, rate_version)
+    except (TypeError, ValueError):
+        # A bad value somewhere in the batch: price row by row to find it
+        priced = []
+        for inputs in estimates:
+            if pricing.missing_details(inputs):
+                priced.append(None)
+                continue
+            try:
+                priced.append(pricing.price_estimate(inputs, rate_version=rate_version))
+            except (TypeError, ValueError) as e:
+                priced.append(e)
+        return priced
+
+
+async def batch_price(request):
+    body = await _json_body(request)
+    if body is None or not isinstance(body.get("estimates"), list):
+        return _error(400, "Expected {\"estimates\": [...]}")
+    estimates = body["estimates"]
+    if len(estimates) > MAX_BATCH_ESTIMATES:
+        return _error(413, f"At most {MAX_BATCH_ESTIMATES} estimates per batch")
+    try:
+        if not all(isinstance(estimate, dict) for estimate in estimates):
+            raise ValueError("Each estimate must be an object")
+        inputs = [_estimate_inputs(estimate) for estimate in estimates]
+        rate_version = body.get("rate_version")
+        if rate_version:
+            try:
+                pricing.convert_input("rate_version", rate_version)
+            except ValueError as e:
+                raise ValueError(f"Bad rate_version {rate_version!r}: {e}") from None
+    except ValueError as e:
+        return _error(400, str(e))
+    priced = await _run("pricing", _price_many, inputs, rate_version)
+
+    items = []
+    for estimate_inputs, results in zip(inputs, priced):
+        if isinstance(results, dict):
+            items.append({"results": results})
+        elif isinstance(results, Exception):
+            items.append({"error": str(results)})
+        else:
+            missing = pricing.missing_details(estimate_inputs)
+            items.append({"error": pricing.missing_details_message(missing), "missing": missing})
+    return JSONResponse({"estimates": items})
+
+
+async def save(request):
+    body = await _json_body(request)
+    if body is None:
+        return _error(400, "Expected a JSON object")
+    account_name = str(body.get("account_name") or "").strip()
+    if not account_name:
+        return _error(400, "account_name is required")
+    try:
+        inputs = _estimate_inputs(body)
+    except ValueError as e:
+        return _error(400, str(e))
+    expected_version = body.get("expected_version")
+    if expected_version is not None and (
+        isinstance(expected_version, bool) or not isinstance(expected_version, int) or expected_version < 0
+    ):
+        return _error(400, "expected_version must be a whole number")
+    results, error = _price(inputs)
+    if error:
+        return error
+    timestamp = await _run("store", lambda: save_queue.get_save_queue().enqueue(account_name, inputs, results, expected_version))
+    return JSONResponse({"account_name": account_name, "timestamp": timestamp, "results": results, "status": "queued"}, status_code=202)
+
+
+def _read_estimate(account_name):
+    record = storage.get_store().get(account_name)
+    if record is None:
+        return None
+    estimate = StoredEstimate(record)
+    status, sync_error = save_queue.get_save_queue().status(account_name)
+    return {
+        "account_name": estimate.account_name,
+        "timestamp": estimate.timestamp,
+        "version": estimate.version,
+        "inputs": estimate.inputs,
+        "results": estimate.results,
+        "sync_status": status,
+        "sync_error": sync_error,
+    }
+
+
+async def lookup(request):
+    account_name = request.path_params["account_name"]
+    estimate = await _run("store", _read_estimate, account_name)
+    if estimate is None:
+        return _error(404, f"No saved estimate for {account_name}")
+    return JSONResponse(estimate)
+
+
+async def search(request):
+    params = request.query_params
+    try:
+        min_total = float(params["min_total"]) if params.get("min_total") else None
+        max_total = float(params["max_total"]) if params.get("max_total") else None
+    except ValueError:
+        return _error(400, "min_total and max_total must be numbers")
+    matches = await _run(
+        "store",
+        lambda: storage.get_store().index().search(
+            prefix=params.get("prefix"),
+            contains=params.get("contains"),
+            start=params.get("start"),
+            end=params.get("end"),
+            min_total=min_total,
+            max_total=max_total,
+        ),
+    )
+    return JSONResponse({"estimates": matches})
+
+
+async def health(request):
+    return JSONResponse({"ok": True, "rate_version": rates.current_version()})
+
+
+async def metrics(request):
+    if request.query_params.get("format") == "json":
+        return PlainTextResponse(timing.to_json(), media_type="application/json")
+    return PlainTextResponse(timing.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def _authorized(request):
+    api_key = get_secret("API_KEY", None)
+    if not api_key:
+        return True
+    supplied = request.headers.get("authorization", "")
+    return hmac.compare_digest(supplied.encode(), f"Bearer {api_key}".encode())
+
+
+def _route_name(request):
+    # Route template rather than the path, so account names don't each get a series
+    for route in request.app.routes:
+        if route.matches(request.scope)[0] == Match.FULL:
+            return f"api {request.method} {route.path}"
+    return f"api {request.method} unmatched"
+
+
+async def _require_api_key(request, call_next):
+    if request.url.path != "/health" and not _authorized(request):
+        return _error(401, "Missing or wrong API key")
+    with timing.request(_route_name(request)):
+        return await call_next(request)
+
+
+async def _busy(request, exc):
+    return _error(503, "Too many requests in progress, try again shortly")
+
+
+def create_app():
+    return Starlette(
+        routes=[
+            Route("/price", price, methods=["POST"]),
+            Route("/batch-price", batch_price, methods=["POST"]),
+            Route("/estimates", save, methods=["POST"]),
+            Route("/estimates", search, methods=["GET"]),
+            Route("/estimates/{account_name:path}", lookup, methods=["GET"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/metrics", metrics, methods=["GET"]),
+        ],
+        middleware=[Middleware(BaseHTTPMiddleware, dispatch=_require_api_key)],
+        exception_handlers={Busy: _busy},
+    )
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="CC Inc. pricing API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -1,4 +1,6 @@
 import streamlit as st
+import timing
+from config import get_secret
 from router import render_page, navigate_to, get_current_page
 
 # Set up the app configuration
@@ -13,6 +15,15 @@ with st.sidebar:
         navigate_to("how_to_count_windows")
     if st.button("View Estimates"):
         navigate_to("view_estimates")
+    if st.button("Price Sweep"):
+        navigate_to("price_sweep")
+    if st.button("Import / Export"):
+        navigate_to("import_export")
+    if st.button("Analytics"):
+        navigate_to("analytics")
+    if get_secret("ADMIN_PASSWORD", None) and st.button("Latency"):
+        navigate_to("latency")
 
-# Render the current page using the router
-render_page()
+# Render the current page using the router, timing the whole rerun
+with timing.request(f"rerun {get_current_page()}"):
+    render_page()
@@ -0,0 +1,170 @@
+import glob
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+import timing
+
+# Resized, re-encoded copies of the guide images. Each variant is written once
+# to images/.cache with the source's content hash in its name, e.g.
+#   images/.cache/frenchie.3f2a9c1b04de.grid.jpg
+# so an edited image gets new files and old ones are never served stale.
+# Variants are made on first use; run `python assets.py` to build them all
+# ahead of a deploy.
+#
+# st.image only sends JPEG, PNG or GIF, and re-encodes anything else (or
+# anything in another format than it would pick) on every render. So a
+# variant is JPEG, or PNG when the image really has transparency, which is
+# what st.image picks for it, and its bytes go to the browser unchanged. If
+# re-encoding doesn't make an image smaller, the variant is a copy of the
+# original.
+
+IMAGES_DIR = "images"
+CACHE_DIR = os.path.join(IMAGES_DIR, ".cache")
+
+# Maximum width in pixels for each display size (images are never upscaled)
+SIZES = {
+    "grid": 480,
+    "detail": 1000,
+}
+
+QUALITY = 80
+
+# Images count as transparent (kept as PNG) when at least this share of their
+# pixels can be seen through; a few soft edges are flattened onto white
+TRANSPARENT_SHARE = 0.01
+
+# Upper bound for image bytes kept in memory by image_bytes()
+MEMORY_CACHE_BYTES = 16 * 1024 * 1024
+
+_hashes = {}  # (path, mtime, size in bytes) -> content hash
+_formats = {}  # content hash -> variant file extension
+_lock = threading.Lock()
+
+_memory_cache = OrderedDict()  # variant path -> bytes, least recently used first
+_memory_cache_bytes = 0
+_memory_lock = threading.Lock()
+
+
+def content_hash(image_path):
+    stat = os.stat(image_path)
+    key = (image_path, stat.st_mtime, stat.st_size)
+    with _lock:
+        if key not in _hashes:
+            with open(image_path, "rb") as f:
+                _hashes[key] = hashlib.sha256(f.read()).hexdigest()[:12]
+        return _hashes[key]
+
+
+def _has_transparency(image):
+    if image.mode == "P":
+        image = image.convert("RGBA")
+    if image.mode not in ("RGBA", "LA"):
+        return False
+    histogram = image.getchannel("A").histogram()
+    return 1 - histogram[255] / sum(histogram) >= TRANSPARENT_SHARE
+
+
+def _flattened(image):
+    # RGB copy with any transparency blended onto white
+    if image.mode == "P":
+        image = image.convert("RGBA")
+    if image.mode in ("RGBA", "LA"):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        return Image.alpha_composite(background, image).convert("RGB")
+    return image.convert("RGB")
+
+
+def variant_format(image_path):
+    # "png" for images with see-through pixels, otherwise "jpg"
+    with Image.open(image_path) as image:
+        return "png" if _has_transparency(image) else "jpg"
+
+
+def variant_path(image_path, size):
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    content = content_hash(image_path)
+    with _lock:
+        fmt = _formats.get(content)
+    if fmt is None:
+        fmt = variant_format(image_path)
+        with _lock:
+            _formats[content] = fmt
+    return os.path.join(CACHE_DIR, f"{stem}.{content}.{size}.{fmt}")
+
+
+def _sent_as_is(image, max_width):
+    # Whether st.image would send the original's bytes without re-encoding
+    alpha_mode = image.mode in ("RGBA", "LA", "P")
+    return image.width <= max_width and image.format == ("PNG" if alpha_mode else "JPEG")
+
+
+@timing.timed("images.build_variant")
+def _build_variant(image_path, size, target):
+    fmt = "PNG" if target.endswith(".png") else "JPEG"
+    max_width = SIZES[size]
+    with Image.open(image_path) as original:
+        keep_original = _sent_as_is(original, max_width)
+        image = ImageOps.exif_transpose(original)
+        if image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        image = image.convert("RGBA") if fmt == "PNG" else _flattened(image)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temporary = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        image.save(temporary, format=fmt, quality=QUALITY, optimize=True)
+    if keep_original and os.path.getsize(image_path) <= os.path.getsize(temporary):
+        shutil.copyfile(image_path, temporary)
+    os.replace(temporary, target)
+
+
+def asset_path(image_path, size="grid"):
+    # Path of the image at the given display size, building it if needed.
+    # Falls back to the original if the variant can't be made.
+    try:
+        target = variant_path(image_path, size)
+        if not os.path.exists(target):
+            _build_variant(image_path, size, target)
+        return target
+    except (OSError, ValueError, KeyError):
+        return image_path
+
+
+@timing.timed("images.load")
+def image_bytes(image_path, size="grid"):
+    # Bytes of asset_path(...), served from memory after the first read.
+    # Least recently used images are dropped past MEMORY_CACHE_BYTES.
+    global _memory_cache_bytes
+    path = asset_path(image_path, size)
+    with _memory_lock:
+        data = _memory_cache.get(path)
+        if data is not None:
+            _memory_cache.move_to_end(path)
+            return data
+    with open(path, "rb") as f:
+        data = f.read()
+    with _memory_lock:
+        if path not in _memory_cache:
+            _memory_cache[path] = data
+            _memory_cache_bytes += len(data)
+        while _memory_cache_bytes > MEMORY_CACHE_BYTES and len(_memory_cache) > 1:
+            _, evicted = _memory_cache.popitem(last=False)
+            _memory_cache_bytes -= len(evicted)
+    return data
+
+
+def build_all():
+    built = []
+    for image_path in sorted(glob.glob(os.path.join(IMAGES_DIR, "*.jpg")) + glob.glob(os.path.join(IMAGES_DIR, "*.png"))):
+        for size in SIZES:
+            built.append(asset_path(image_path, size))
+    return built
+
+
+if __name__ == "__main__":
+    for path in build_all():
+        print(f"{os.path.getsize(path):>8}  {path}")
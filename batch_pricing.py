@@ -0,0 +1,235 @@
+import math
+
+import numpy as np
+import pricing
+import rates
+import timing
+
+# Column-at-a-time version of the rules in pricing.py, for re-quoting whole
+# sheets or lead lists. Every line is computed with the same operations in the
+# same order as the single-estimate path so the rounded results match exactly.
+#
+# Input columns use the same names as the estimate inputs (total_perimeter,
+# max_height, house_dirtiness, ...). Any column that is left out takes the
+# default from pricing.DEFAULT_INPUTS. Custom line items are free-form lists
+# per estimate and stay on the single-estimate path. A batch is priced with
+# one rate table (rates.py); tiered rates are looked up for the whole column
+# with np.searchsorted on the table's boundaries.
+
+ADDITIONAL_SERVICE_QUANTITIES = {
+    "roof treatment": "roof_sq_ft",
+    "gutter cleaning": "gutter_linear_feet",
+    "roof blow-off": "blow_off_hours",
+    "concrete cleaning": "concrete_sq_ft",
+    "deck/dock cleaning": "deck_dock_sq_ft",
+    "vinyl porch cleaning": "vinyl_panels",
+    "storm windows": "storm_windows",
+}
+
+
+def _row_count(columns):
+    lengths = {len(values) for values in columns.values() if np.ndim(values) > 0}
+    if len(lengths) > 1:
+        raise ValueError(f"All columns must have the same length, got {sorted(lengths)}")
+    return lengths.pop() if lengths else 1
+
+
+def _column(columns, key, n):
+    values = np.asarray(columns.get(key, pricing.DEFAULT_INPUTS[key]))
+    if values.ndim == 0:
+        values = np.full(n, values.item())
+    return values
+
+
+def _tier_values(tiers, amounts):
+    # Vector form of rates.Tiers.lookup()
+    return np.asarray(tiers.values)[np.searchsorted(tiers.boundaries, amounts, side="right")]
+
+
+def _mapped(mapping, values, default=0):
+    # mapping[value] for each value in a column of choices
+    result = np.full(len(values), default, dtype=np.result_type(default, *mapping.values()))
+    for choice, mapped in mapping.items():
+        result = np.where(values == choice, mapped, result)
+    return result
+
+
+def round_cents(values):
+    # np.round scales by 100 and rounds half to even, which can disagree with
+    # Python's correctly rounded round() right at a half cent. Those values are
+    # rare, so redo just them with round() to keep results identical.
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_half):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+def house_washing_prices(columns, n, table):
+    house_rates = table["house_washing"]
+    house_sq_ft = _column(columns, "total_perimeter", n) * _column(columns, "max_height", n)
+    house_base_rate = _tier_values(house_rates["base_rate"], house_sq_ft)
+    house_condition_adder = _mapped(house_rates["dirtiness_adder"], _column(columns, "house_dirtiness", n))
+    house_washing_total = (house_sq_ft * house_base_rate) + house_condition_adder
+    return np.maximum(house_washing_total, house_rates["minimum"])
+
+
+def pest_control_prices(columns, n, table):
+    pest_rates = table["pest_control"]
+    main_structure = _column(columns, "structure_type", n) == "Main"
+    treated_area = _column(columns, "total_perimeter", n) * (_column(columns, "stories", n) * pest_rates["story_height"])
+    pest_base_rate = np.where(
+        main_structure,
+        _tier_values(pest_rates["main_rate"], treated_area),
+        _tier_values(pest_rates["additional_rate"], treated_area),
+    )
+    pest_infestation_adder = _mapped(pest_rates["infestation_adder"], _column(columns, "pest_infestation", n))
+    ladder_spots_pest = _column(columns, "ladder_spots_pest", n)
+    ladder_cost = (
+        np.where(ladder_spots_pest > 0, pest_rates["first_ladder_spot"], 0)
+        + np.where(ladder_spots_pest > 1, (ladder_spots_pest - 1) * pest_rates["extra_ladder_spot"], 0)
+    )
+    pest_total = (treated_area * pest_base_rate) + pest_infestation_adder + ladder_cost
+    pest_minimum_price = _tier_values(pest_rates["main_minimum"], treated_area)
+    return np.where(main_structure, np.maximum(pest_total, pest_minimum_price), pest_total)
+
+
+def rodent_control_prices(columns, n, table):
+    rodent_rates = table["rodent_control"]
+    extra_stations = np.maximum(0, _column(columns, "rodent_stations", n) - rodent_rates["included_stations"])
+    rodent_stations_price = extra_stations * rodent_rates["extra_station"]
+    interior_monitoring_price = np.where(_column(columns, "interior_monitoring", n).astype(bool), rodent_rates["interior_monitoring"], 0.00)
+    return rodent_rates["base_price"] + rodent_stations_price + interior_monitoring_price
+
+
+def exterior_windows_prices(columns, n, table):
+    window_rates = table["exterior_windows"]
+    exterior_windows_total = (_column(columns, "exterior_standard_windows", n) * window_rates["standard"]) + (_column(columns, "exterior_high_windows", n) * window_rates["high"])
+    return np.where((exterior_windows_total > 0) & (exterior_windows_total < window_rates["minimum"]), window_rates["minimum"], exterior_windows_total)
+
+
+def interior_windows_prices(columns, n, table):
+    window_rates = table["interior_windows"]
+    interior_windows_total = (_column(columns, "interior_standard_windows", n) * window_rates["standard"]) + (_column(columns, "interior_high_windows", n) * window_rates["high"])
+    return np.where((interior_windows_total > 0) & (interior_windows_total < window_rates["minimum"]), window_rates["minimum"], interior_windows_total)
+
+
+def tracks_sills_prices(columns, n, table):
+    price = _column(columns, "tracks_sills_price", n)
+    return np.where(price > 0, price, table["tracks_sills"]["default_price"])
+
+
+BASE_SERVICE_PRICES = {
+    "house_washing": house_washing_prices,
+    "pest_control": pest_control_prices,
+    "rodent_control": rodent_control_prices,
+    "exterior_windows": exterior_windows_prices,
+    "interior_windows": interior_windows_prices,
+    "tracks_sills": tracks_sills_prices,
+}
+
+
+def _additional_service_prices(service, columns, n, table):
+    service_rates = table.get(service)
+    if service == "roof treatment":
+        asphalt = _column(columns, "roof_type", n) == "Asphalt"
+        rate = np.where(asphalt, service_rates["rate"]["Asphalt"], service_rates["rate"]["Metal"])
+        min_price = np.where(asphalt, service_rates["asphalt_minimum"], _column(columns, "roof_metal_min", n))
+        return np.maximum(_column(columns, "roof_sq_ft", n) * rate, min_price)
+    if service == "gutter cleaning":
+        return np.maximum(_column(columns, "gutter_linear_feet", n) * service_rates["rate"], service_rates["minimum"])
+    if service == "roof blow-off":
+        blow_off_hours = _column(columns, "blow_off_hours", n)
+        second_man = np.where(_column(columns, "blow_off_men", n) == 2, blow_off_hours * service_rates["second_man_hourly"], 0)
+        return (blow_off_hours * service_rates["hourly"]) + second_man
+    if service == "concrete cleaning":
+        return _column(columns, "concrete_sq_ft", n) * service_rates["rate"]
+    if service == "deck/dock cleaning":
+        return _column(columns, "deck_dock_sq_ft", n) * service_rates["rate"]
+    if service == "vinyl porch cleaning":
+        return _column(columns, "vinyl_panels", n) * service_rates["per_panel"]
+    if service == "storm windows":
+        return _column(columns, "storm_windows", n) * service_rates["per_window"]
+    raise ValueError(f"Batch pricing does not support {service}")
+
+
+@timing.timed("pricing.price_batch")
+def price_batch(columns, rate_version=None):
+    # Prices every row of a column table (dict of column name -> array or
+    # scalar) and returns a results table in the same shape: one float array
+    # per service line plus "total" and a "valid" mask. Rows that are missing
+    # required details get NaN prices. Add-ons are priced when their quantity
+    # is non-zero and, if the "YES"/"NO" flag column is given, it is "YES";
+    # unpriced add-ons are NaN. All rows use the rate_version rates (default:
+    # current); a "rate_version" column is not read.
+    table = rates.rate_table(rate_version)
+    n = _row_count(columns)
+    valid = (
+        (_column(columns, "total_perimeter", n) != 0)
+        & (_column(columns, "max_height", n) != 0)
+        & (_column(columns, "tracks_sills_price", n) != 0)
+    )
+
+    results = {}
+    total = np.zeros(n)
+    for service in pricing.BASE_SERVICES:
+        results[service] = round_cents(BASE_SERVICE_PRICES[service](columns, n, table))
+        total = total + results[service]
+
+    for service, quantity in ADDITIONAL_SERVICE_QUANTITIES.items():
+        priced = _column(columns, quantity, n) != 0
+        flag = pricing.ADDITIONAL_SERVICE_FLAGS[service]
+        if flag in columns:
+            priced &= _column(columns, flag, n) == "YES"
+        if not priced.any():
+            continue
+        prices = round_cents(_additional_service_prices(service, columns, n, table))
+        results[service] = np.where(priced, prices, np.nan)
+        total = total + np.where(priced, prices, 0.0)
+
+    results["total"] = round_cents(np.maximum(total, table["truck_minimum"]))
+    for service, prices in results.items():
+        results[service] = np.where(valid, prices, np.nan)
+    results["valid"] = valid
+    return results
+
+
+def batch_rows(results):
+    # Every row of a price_batch() table as a single-estimate results dict (or
+    # None where it is not valid), converting each column to floats only once
+    valid = results["valid"].tolist()
+    columns = {service: prices.tolist() for service, prices in results.items() if service != "valid"}
+    return [
+        {service: prices[i] for service, prices in columns.items() if not math.isnan(prices[i])} if valid[i] else None
+        for i in range(len(valid))
+    ]
+
+
+def price_inputs(estimates, rate_version=None):
+    # Batch version of pricing.price_estimate() for a list of inputs dicts:
+    # the results dict for each, or None when it is missing required details.
+    # Rows are grouped by their "rate_version" (or priced with rate_version
+    # when given), and custom line items are added per row afterwards.
+    groups = {}
+    for position, inputs in enumerate(estimates):
+        version = rate_version or inputs.get("rate_version") or rates.current_version()
+        groups.setdefault(version, []).append(position)
+
+    priced = [None] * len(estimates)
+    for version, positions in groups.items():
+        columns = {
+            key: np.array([estimates[position].get(key, default) for position in positions])
+            for key, default in pricing.DEFAULT_INPUTS.items()
+            if key not in ("custom_items", "rate_version")
+        }
+        table = price_batch(columns, rate_version=version)
+        for position, results in zip(positions, batch_rows(table)):
+            inputs = estimates[position]
+            if results and inputs.get("custom_items") and not pricing.missing_additional_details("custom items", inputs):
+                del results["total"]
+                results.update(pricing.additional_results("custom items", inputs))
+                results["total"] = pricing.estimate_total(results, rates.rate_table(version)["truck_minimum"])
+            priced[position] = results
+    return priced
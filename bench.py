@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from gspread.exceptions import APIError
+
+import batch_pricing
+import pricing
+import save_queue
+import sheets
+import storage
+from estimate_codec import StoredEstimate, encode_inputs, encode_results
+from fake_sheets import FakeWorksheet
+
+# Benchmarks for pricing throughput and estimate save/load latency, run
+# against fake_sheets.FakeWorksheet so the real spreadsheet is never touched:
+#
+#   python bench.py                               # everything, no simulated latency
+#   python bench.py --latency 0.2 --quota-error-rate 0.05
+#   python bench.py --only save --sizes 100,1000
+#
+#   price_single        pricing.price_estimate on one estimate
+#   price_batch         batch_pricing.price_inputs over BATCH_ESTIMATES estimates
+#   save_upsert_<n>     one estimate saved (half updates, half new accounts) into
+#                       an n-row sheet, as the save queue does for one account
+#   save_batch_<n>      a save queue batch of save_queue.BATCH_SIZE estimates
+#   view_accounts_<n>   View Estimates' account list
+#   view_open_<n>       loading and decoding one saved estimate
+#   view_index_<n>      building the search index from every row, then a search
+#
+# Each run is appended to RESULTS_PATH with its settings and commit, and the
+# table compares every benchmark with the last stored run that used the same
+# latency and quota error rate.
+
+RESULTS_PATH = os.path.join("benchmarks", "results.jsonl")
+SIZES = [100, 1000, 10000]
+BATCH_ESTIMATES = 10000
+
+# Slowdown over the previous run that gets flagged in the table
+REGRESSION_THRESHOLD = 0.10
+
+
+def sample_inputs(rng):
+    inputs = pricing.default_inputs()
+    inputs.update(
+        total_perimeter=rng.randint(80, 400),
+        max_height=rng.randint(8, 30),
+        house_dirtiness=rng.choice(pricing.INPUT_CHOICES["house_dirtiness"]),
+        pest_infestation=rng.choice(pricing.INPUT_CHOICES["pest_infestation"]),
+        exterior_standard_windows=rng.randint(0, 40),
+        interior_standard_windows=rng.randint(0, 20),
+    )
+    if rng.random() < 0.3:
+        inputs.update(roof_treatment="YES", roof_sq_ft=rng.randint(800, 3000))
+    return inputs
+
+
+def sample_sheet(rows, rng, latency=0.0, quota_error_rate=0.0):
+    estimates = []
+    for number in range(rows):
+        inputs = sample_inputs(rng)
+        results = pricing.price_estimate(inputs)
+        estimates.append([f"Account {number:06d}", storage.now_timestamp(), encode_inputs(inputs), encode_results(results)])
+    return FakeWorksheet(estimates, latency=latency, quota_error_rate=quota_error_rate, seed=rng.random())
+
+
+def _timed(operation, repeat):
+    # (seconds per run, runs that hit a simulated quota error)
+    seconds = []
+    errors = 0
+    for _ in range(repeat):
+        began = time.perf_counter()
+        try:
+            outcome = operation()
+        except APIError:
+            errors += 1
+        else:
+            if isinstance(outcome, list):
+                errors += sum(1 for saved in outcome if isinstance(saved, dict) and not saved.get("ok", True))
+        seconds.append(time.perf_counter() - began)
+    return seconds, errors
+
+
+def _sheet_store(sheet, name):
+    revision_sheet = FakeWorksheet(headers=sheets.REVISION_HEADERS, latency=sheet.latency, quota_error_rate=sheet.quota_error_rate)
+    sheets.use_worksheet(name, sheet, revision_sheet)
+    return storage.SheetsEstimateStore(name)
+
+
+def bench_price_single(rng, settings):
+    inputs = sample_inputs(rng)
+    return _timed(lambda: pricing.price_estimate(inputs), 2000)
+
+
+def bench_price_batch(rng, settings):
+    estimates = [sample_inputs(rng) for _ in range(BATCH_ESTIMATES)]
+    return _timed(lambda: batch_pricing.price_inputs(estimates), 5)
+
+
+def bench_save_upsert(rng, settings, size):
+    store = _sheet_store(sample_sheet(size, rng, settings["latency"], settings["quota_error_rate"]), f"bench-save-{size}")
+    new_accounts = iter(range(size, size * 2 + 1000))
+
+    def save():
+        # Alternate updating an existing account and adding a new one
+        if rng.random() < 0.5:
+            account_name = f"Account {rng.randrange(size):06d}"
+        else:
+            account_name = f"Account {next(new_accounts):06d}"
+        inputs = sample_inputs(rng)
+        store.save(account_name, inputs, pricing.price_estimate(inputs))
+
+    return _timed(save, 20)
+
+
+def bench_save_batch(rng, settings, size):
+    store = _sheet_store(sample_sheet(size, rng, settings["latency"], settings["quota_error_rate"]), f"bench-batch-{size}")
+    new_accounts = iter(range(size, size * 2 + 1000))
+
+    def save_many():
+        estimates = []
+        for _ in range(save_queue.BATCH_SIZE):
+            if rng.random() < 0.5:
+                account_name = f"Account {rng.randrange(size):06d}"
+            else:
+                account_name = f"Account {next(new_accounts):06d}"
+            inputs = sample_inputs(rng)
+            estimates.append((account_name, inputs, pricing.price_estimate(inputs)))
+        return store.save_many(estimates)
+
+    return _timed(save_many, 10)
+
+
+def bench_view_accounts(rng, settings, size):
+    store = _sheet_store(sample_sheet(size, rng, settings["latency"], settings["quota_error_rate"]), f"bench-view-{size}")
+    return _timed(lambda: store.list_accounts(), 10)
+
+
+def bench_view_open(rng, settings, size):
+    store = _sheet_store(sample_sheet(size, rng, settings["latency"], settings["quota_error_rate"]), f"bench-open-{size}")
+
+    def open_estimate():
+        estimate = StoredEstimate(store.get(f"Account {rng.randrange(size):06d}"))
+        return estimate.inputs, estimate.results
+
+    return _timed(open_estimate, 20)
+
+
+def bench_view_index(rng, settings, size):
+    store = _sheet_store(sample_sheet(size, rng, settings["latency"], settings["quota_error_rate"]), f"bench-index-{size}")
+
+    def build_and_search():
+        # A fresh cache each time, so the index is built from the sheet
+        storage.CachedEstimateStore(store).index().search(prefix="Account 00", min_total=500)
+
+    return _timed(build_and_search, 5)
+
+
+def benchmarks(sizes):
+    # name -> function(rng, settings) returning (seconds per run, errors)
+    suite = {
+        "price_single": bench_price_single,
+        "price_batch": bench_price_batch,
+    }
+    for prefix, function in [
+        ("save_upsert", bench_save_upsert),
+        ("save_batch", bench_save_batch),
+        ("view_accounts", bench_view_accounts),
+        ("view_open", bench_view_open),
+        ("view_index", bench_view_index),
+    ]:
+        for size in sizes:
+            suite[f"{prefix}_{size}"] = lambda rng, settings, function=function, size=size: function(rng, settings, size)
+    return suite
+
+
+def run(sizes=SIZES, only=None, latency=0.0, quota_error_rate=0.0, seed=0):
+    settings = {"latency": latency, "quota_error_rate": quota_error_rate}
+    results = {}
+    for name, function in benchmarks(sizes).items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        seconds, errors = function(random.Random(f"{seed}:{name}"), settings)
+        seconds.sort()
+        results[name] = {
+            "runs": len(seconds),
+            "errors": errors,
+            "median": statistics.median(seconds),
+            "min": seconds[0],
+            "max": seconds[-1],
+        }
+    return {"settings": settings, "results": results}
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_runs(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_run(report, path=RESULTS_PATH):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(report) + "\n")
+
+
+def previous_run(runs, settings):
+    return next((run for run in reversed(runs) if run["settings"] == settings), None)
+
+
+def _milliseconds(seconds):
+    return f"{seconds * 1000:10.3f}"
+
+
+def format_report(report, previous=None):
+    lines = [f"{'benchmark':<22}{'median ms':>10}{'min ms':>10}{'max ms':>10}{'runs':>6}{'errors':>7}  change"]
+    for name, result in report["results"].items():
+        change = ""
+        before = (previous or {}).get("results", {}).get(name)
+        if before:
+            ratio = result["median"] / before["median"] - 1 if before["median"] else 0.0
+            change = f"{ratio:+.1%}" + ("  <- slower" if ratio > REGRESSION_THRESHOLD else "")
+        lines.append(
+            f"{name:<22}{_milliseconds(result['median'])}{_milliseconds(result['min'])}{_milliseconds(result['max'])}"
+            f"{result['runs']:>6}{result['errors']:>7}  {change}"
+        )
+    if previous:
+        lines.append(f"Compared with the run of {previous['run_at']} ({previous.get('commit') or 'unknown commit'})")
+    return "\n".join(lines)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark pricing and estimate saves/loads against a fake worksheet")
+    parser.add_argument("--only", help="comma-separated parts of benchmark names to run, e.g. price,save_upsert")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES), help="sheet sizes in rows")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per Sheets call")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0, help="share of Sheets calls that fail with 429")
+    parser.add_argument("--results", default=RESULTS_PATH, help="file the runs are appended to")
+    parser.add_argument("--no-save", action="store_true", help="compare without storing this run")
+    args = parser.parse_args(argv[1:])
+
+    report = run(
+        sizes=[int(size) for size in args.sizes.split(",")],
+        only=args.only.split(",") if args.only else None,
+        latency=args.latency,
+        quota_error_rate=args.quota_error_rate,
+    )
+    report = {"run_at": datetime.now().isoformat(timespec="seconds"), "commit": _commit(), **report}
+    print(format_report(report, previous_run(load_runs(args.results), report["settings"])))
+    if not args.no_save:
+        save_run(report, args.results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
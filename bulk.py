@@ -0,0 +1,233 @@
+import csv
+import io
+import json
+import os
+import sys
+
+import batch_pricing
+import pricing
+import rates
+from estimate_codec import StoredEstimate
+
+# Bulk import of lead lists (CSV or XLSX) and export of every saved estimate.
+#
+# Import reads the file a chunk of rows at a time, checks each row with the
+# same missing-detail rules as the Estimate page, prices the chunk with
+# batch_pricing and saves it with one store.save_many() call, so only one
+# chunk is ever in memory. Columns are matched to estimate inputs by name
+# ("Total Perimeter", "total_perimeter" and "total perimeter" all work);
+# "Account Name" is required and unknown columns are ignored. An add-on is
+# included when its quantity is filled in, unless its flag column (e.g.
+# "roof_treatment") says NO. Imported estimates are priced with the current
+# rates.
+#
+# Export writes one row per saved estimate with the same input columns plus a
+# "Price: <line>" column per service and "Total", so an export can be edited
+# and imported again.
+#
+#   python bulk.py import leads.xlsx
+#   python bulk.py export estimates.csv
+
+IMPORT_CHUNK_ROWS = 500
+EXPORT_CHUNK_ROWS = 1000
+
+INPUT_COLUMNS = list(pricing.DEFAULT_INPUTS)
+PRICE_LINES = pricing.BASE_SERVICES + pricing.ADDITIONAL_SERVICES
+EXPORT_HEADERS = ["Account Name", "Timestamp"] + INPUT_COLUMNS + [f"Price: {line}" for line in PRICE_LINES] + ["Total"]
+
+
+def _file_format(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in (".csv", ".xlsx"):
+        raise ValueError(f"Unsupported file type {extension or filename!r}; use .csv or .xlsx")
+    return extension[1:]
+
+
+def _column_key(header):
+    return str(header or "").strip().lower().replace(" ", "_")
+
+
+def read_rows(file, filename):
+    # (line, {header: cell}) per data row of a .csv or .xlsx file (a path or a
+    # binary file object), read lazily. line is the row's line in the file
+    # (its last line for a CSV row with line breaks in a cell); blank rows
+    # are skipped but still counted.
+    fmt = _file_format(filename)
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            yield from read_rows(f, filename)
+        return
+    if fmt == "csv":
+        reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+        for row in reader:
+            yield reader.line_num, row
+        return
+    import openpyxl
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = next(rows, ())
+        for line, values in enumerate(rows, start=2):
+            if any(value not in (None, "") for value in values):
+                yield line, dict(zip(headers, values))
+    finally:
+        workbook.close()
+
+
+def parse_row(row, rate_version):
+    # (account name, inputs, add-on notes) for one file row; raises ValueError
+    # with a readable message when a value can't be used
+    cells = {_column_key(header): value for header, value in row.items() if header is not None}
+    account_name = str(cells.get("account_name") or "").strip()
+    if not account_name:
+        raise ValueError("missing account name")
+
+    inputs = pricing.default_inputs()
+    inputs["rate_version"] = rate_version
+    for key in INPUT_COLUMNS:
+        value = cells.get(key)
+        if key == "rate_version" or value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        try:
+            inputs[key] = pricing.convert_input(key, value)
+        except ValueError as e:
+            raise ValueError(f"bad {key.replace('_', ' ')} {value!r}: {e}") from None
+
+    notes = []
+    for service, flag in pricing.ADDITIONAL_SERVICE_FLAGS.items():
+        if flag not in cells or cells[flag] in (None, ""):
+            quantity = pricing.ADDITIONAL_SERVICE_PRICES[service][1]
+            inputs[flag] = "YES" if inputs[quantity] != 0 else "NO"
+        elif inputs[flag] == "YES":
+            # Left off, as on the Estimate page, until its details are given
+            missing_detail = pricing.missing_additional_details(service, inputs)
+            if missing_detail:
+                inputs[flag] = "NO"
+                notes.append(f"{service} left off: no {missing_detail}")
+    return account_name, inputs, notes
+
+
+def _import_chunk(chunk, store, rate_version):
+    outcomes = {}
+    parsed = []
+    for line, row in chunk:
+        try:
+            account_name, inputs, notes = parse_row(row, rate_version)
+        except ValueError as e:
+            account_name = next((value for header, value in row.items() if _column_key(header) == "account_name"), None)
+            outcomes[line] = {"line": line, "account_name": account_name, "status": "invalid", "message": str(e)}
+            continue
+        missing = pricing.missing_details(inputs)
+        if missing:
+            outcomes[line] = {"line": line, "account_name": account_name, "status": "invalid", "message": pricing.missing_details_message(missing)}
+            continue
+        parsed.append((line, account_name, inputs, notes))
+
+    if parsed:
+        results = batch_pricing.price_inputs([inputs for _, _, inputs, _ in parsed], rate_version)
+        report = store.save_many([(name, inputs, priced) for (_, name, inputs, _), priced in zip(parsed, results)])
+        for (line, name, _, notes), priced, saved in zip(parsed, results, report):
+            if saved["ok"]:
+                message = "; ".join([f"total ${priced['total']:.2f}"] + notes)
+                outcomes[line] = {"line": line, "account_name": name, "status": "saved", "message": message}
+            else:
+                outcomes[line] = {"line": line, "account_name": name, "status": "failed", "message": saved["error"]}
+    return [outcomes[line] for line, _ in chunk]
+
+
+def import_estimates(rows, store, chunk_rows=IMPORT_CHUNK_ROWS, rate_version=None):
+    # Imports the (line, row) pairs from read_rows() into the store, yielding
+    # one {"line", "account_name", "status", "message"} outcome per row as
+    # each chunk is saved. status is "saved", "invalid" (not priced) or
+    # "failed" (the store rejected it).
+    rate_version = rate_version or rates.current_version()
+    chunk = []
+    for line, row in rows:
+        chunk.append((line, row))
+        if len(chunk) >= chunk_rows:
+            yield from _import_chunk(chunk, store, rate_version)
+            chunk = []
+    if chunk:
+        yield from _import_chunk(chunk, store, rate_version)
+
+
+def _export_cell(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def export_rows(store, chunk_rows=EXPORT_CHUNK_ROWS):
+    # EXPORT_HEADERS-ordered rows for every saved estimate, streamed from the store
+    for record in store.iter_records(chunk_rows):
+        estimate = StoredEstimate(record)
+        try:
+            inputs = estimate.inputs
+            results = estimate.results
+        except ValueError:
+            # Undecodable cells: export what identifies the estimate
+            inputs, results = {}, {}
+        prices = dict(results)
+        custom = [price for line, price in results.items() if line.startswith("custom line item")]
+        if custom:
+            prices["custom items"] = round(sum(custom), 2)
+        yield (
+            [estimate.account_name, estimate.timestamp]
+            + [_export_cell(inputs.get(key, "")) for key in INPUT_COLUMNS]
+            + [prices.get(line, "") for line in PRICE_LINES]
+            + [results.get("total", "")]
+        )
+
+
+def export_estimates(store, out, fmt="csv"):
+    # Writes every saved estimate to out (a binary file object) as CSV or
+    # XLSX. Returns the number of estimates written.
+    count = 0
+    if fmt == "csv":
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+        writer = csv.writer(text)
+        writer.writerow(EXPORT_HEADERS)
+        for row in export_rows(store):
+            writer.writerow(row)
+            count += 1
+        text.detach()
+        return count
+    if fmt != "xlsx":
+        raise ValueError(f"Unsupported export format {fmt!r}; use csv or xlsx")
+    import openpyxl
+    # Write-only workbooks stream rows to a temporary file as they are added
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Estimates")
+    sheet.append(EXPORT_HEADERS)
+    for row in export_rows(store):
+        sheet.append(row)
+        count += 1
+    workbook.save(out)
+    return count
+
+
+def main(argv):
+    import storage
+
+    if len(argv) != 3 or argv[1] not in ("import", "export"):
+        print("usage: python bulk.py import FILE.csv|FILE.xlsx\n       python bulk.py export FILE.csv|FILE.xlsx")
+        return 2
+    command, path = argv[1], argv[2]
+    store = storage.get_store()
+    if command == "export":
+        with open(path, "wb") as out:
+            count = export_estimates(store, out, _file_format(path))
+        print(f"Exported {count} estimates from the {store.name} to {path}")
+        return 0
+
+    counts = {"saved": 0, "invalid": 0, "failed": 0}
+    for outcome in import_estimates(read_rows(path, path), store):
+        counts[outcome["status"]] += 1
+        if outcome["status"] != "saved":
+            print(f"line {outcome['line']} ({outcome['account_name']}): {outcome['status']}: {outcome['message']}")
+    print(f"Imported {counts['saved']} estimates into the {store.name}; {counts['invalid']} invalid, {counts['failed']} failed")
+    return 0 if counts["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,17 @@
+import os
+
+_MISSING = object()
+
+
+def get_secret(name, default=_MISSING):
+    # Streamlit secrets when running inside the app, environment variables
+    # otherwise (scripts, workers), then the default if one is given
+    try:
+        import streamlit as st
+        return st.secrets[name]
+    except Exception:
+        if name in os.environ:
+            return os.environ[name]
+        if default is not _MISSING:
+            return default
+        raise KeyError(f"Missing secret {name}")
@@ -0,0 +1,81 @@
+import copy
+import json
+from functools import cached_property
+
+import pricing
+
+# Encoding of the Inputs and Results cells of a saved estimate.
+#
+# Version 1 (legacy) is the plain json.dumps of the dicts. Version 2 stores
+# {"v": 2, "d": {...}} with compact separators, keeping only the inputs that
+# differ from pricing.DEFAULT_INPUTS and only the non-zero result lines.
+# Decoding puts the defaults back, and anything without a version marker is
+# read as version 1, so old rows keep working.
+
+SCHEMA_VERSION = 2
+
+
+def _dumps(payload):
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def encode_inputs(inputs):
+    changed = {
+        key: value
+        for key, value in inputs.items()
+        if key not in pricing.DEFAULT_INPUTS or pricing.DEFAULT_INPUTS[key] != value
+    }
+    return _dumps({"v": SCHEMA_VERSION, "d": changed})
+
+
+def encode_results(results):
+    lines = {service: price for service, price in results.items() if price != 0}
+    return _dumps({"v": SCHEMA_VERSION, "d": lines})
+
+
+def _versioned(text):
+    payload = json.loads(text) if text else {}
+    if isinstance(payload, dict) and payload.get("v") == SCHEMA_VERSION and isinstance(payload.get("d"), dict):
+        return payload["d"]
+    return None
+
+
+def decode_inputs(text):
+    changed = _versioned(text)
+    if changed is None:
+        return json.loads(text) if text else {}
+    # Not default_inputs(): that pins the current rates, and a row that
+    # recorded no rate_version must keep reading as "not recorded"
+    inputs = copy.deepcopy(pricing.DEFAULT_INPUTS)
+    inputs.update(changed)
+    return inputs
+
+
+def decode_results(text):
+    lines = _versioned(text)
+    if lines is None:
+        return json.loads(text) if text else {}
+    results = {service: lines.get(service, 0.0) for service in pricing.BASE_SERVICES}
+    results.update(lines)
+    if "total" in results:
+        # Keep the total last, as it is when priced
+        results["total"] = results.pop("total")
+    return results
+
+
+class StoredEstimate:
+    # A saved record whose Inputs and Results are only decoded when first used
+
+    def __init__(self, record):
+        self.record = record
+        self.account_name = record["Account Name"]
+        self.timestamp = record["Timestamp"]
+        self.version = record.get("Version", 1)
+
+    @cached_property
+    def inputs(self):
+        return decode_inputs(self.record["Inputs"])
+
+    @cached_property
+    def results(self):
+        return decode_results(self.record["Results"])
@@ -0,0 +1,93 @@
+from bisect import bisect_left, bisect_right, insort
+
+from estimate_codec import StoredEstimate
+
+# In-memory search index over saved estimates: account name prefix/substring,
+# Timestamp range and total price range. Built once from the loaded records
+# (only the Results cell is decoded, for the total) and updated in place as
+# estimates are saved.
+
+
+def _total(estimate):
+    try:
+        total = estimate.results.get("total")
+    except ValueError:
+        return None
+    return float(total) if isinstance(total, (int, float)) else None
+
+
+class EstimateIndex:
+    def __init__(self, records=()):
+        self._entries = {}  # account name -> (timestamp, total)
+        self._names = []  # sorted (lowercase name, name)
+        self._by_timestamp = []  # sorted (timestamp, name)
+        self._by_total = []  # sorted (total, name), priced estimates only
+        for record in records:
+            self.add(record)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, record):
+        estimate = StoredEstimate(record)
+        self.put(estimate.account_name, str(estimate.timestamp), _total(estimate))
+
+    def put(self, account_name, timestamp, total):
+        self.remove(account_name)
+        self._entries[account_name] = (timestamp, total)
+        insort(self._names, (account_name.lower(), account_name))
+        insort(self._by_timestamp, (timestamp, account_name))
+        if total is not None:
+            insort(self._by_total, (total, account_name))
+
+    def remove(self, account_name):
+        entry = self._entries.pop(account_name, None)
+        if entry is None:
+            return
+        timestamp, total = entry
+        self._discard(self._names, (account_name.lower(), account_name))
+        self._discard(self._by_timestamp, (timestamp, account_name))
+        if total is not None:
+            self._discard(self._by_total, (total, account_name))
+
+    @staticmethod
+    def _discard(entries, key):
+        position = bisect_left(entries, key)
+        if position < len(entries) and entries[position] == key:
+            del entries[position]
+
+    def search(self, prefix=None, contains=None, start=None, end=None, min_total=None, max_total=None):
+        # Matching {"Account Name", "Timestamp", "Total"} summaries, newest
+        # first. start/end are inclusive "YYYY-MM-DD[ HH:MM:SS]" strings.
+        candidates = None
+
+        if prefix:
+            prefix = prefix.lower()
+            low = bisect_left(self._names, (prefix,))
+            high = bisect_left(self._names, (prefix + "\uffff",))
+            candidates = {name for _, name in self._names[low:high]}
+
+        if start or end:
+            low = bisect_left(self._by_timestamp, (start,)) if start else 0
+            high = bisect_right(self._by_timestamp, (end + "\uffff",)) if end else len(self._by_timestamp)
+            matches = {name for _, name in self._by_timestamp[low:high]}
+            candidates = matches if candidates is None else candidates & matches
+
+        if min_total is not None or max_total is not None:
+            low = bisect_left(self._by_total, (min_total,)) if min_total is not None else 0
+            high = bisect_right(self._by_total, (max_total, "\uffff")) if max_total is not None else len(self._by_total)
+            matches = {name for _, name in self._by_total[low:high]}
+            candidates = matches if candidates is None else candidates & matches
+
+        if candidates is None:
+            candidates = self._entries.keys()
+        if contains:
+            contains = contains.lower()
+            candidates = [name for name in candidates if contains in name.lower()]
+
+        summaries = [
+            {"Account Name": name, "Timestamp": self._entries[name][0], "Total": self._entries[name][1]}
+            for name in candidates
+        ]
+        summaries.sort(key=lambda summary: (summary["Timestamp"], summary["Account Name"]), reverse=True)
+        return summaries
@@ -0,0 +1,190 @@
+import json
+import random
+import re
+import threading
+import time
+
+import requests
+from gspread.cell import Cell
+from gspread.exceptions import APIError
+from gspread.utils import a1_to_rowcol, numericise_all, rowcol_to_a1
+
+import sheets
+
+# In-process stand-in for the gspread Worksheet calls the app makes, so the
+# estimate store can be exercised without the real spreadsheet:
+#
+#   sheet = FakeWorksheet(latency=0.2, quota_error_rate=0.05)
+#   sheets.use_worksheet("fake", sheet, FakeWorksheet(headers=sheets.REVISION_HEADERS))
+#   store = storage.SheetsEstimateStore("fake")
+#
+# Every call waits `latency` seconds (a Sheets round trip) and fails with a
+# 429 APIError, like a hit quota, with probability `quota_error_rate`.
+# `calls` counts calls by method. Values are kept as strings, as Sheets
+# returns them; get_all_records() converts cells that look like numbers, as
+# gspread does, unless told not to with numericise_ignore.
+
+A1_RANGE = re.compile(r"^(?:.+!)?([A-Z]+\d+)(?::([A-Z]+\d+))?$")
+COLUMN_RANGE = re.compile(r"^(?:.+!)?([A-Z]+):([A-Z]+)$")
+
+
+def quota_error():
+    response = requests.Response()
+    response.status_code = 429
+    response._content = json.dumps({
+        "error": {"code": 429, "message": "Quota exceeded for quota metric 'Write requests'", "status": "RESOURCE_EXHAUSTED"}
+    }).encode()
+    return APIError(response)
+
+
+def _trimmed(values):
+    values = list(values)
+    while values and values[-1] == "":
+        values.pop()
+    return values
+
+
+class FakeWorksheet:
+    title = "Sheet1"
+
+    def __init__(self, rows=None, headers=sheets.HEADERS, latency=0.0, quota_error_rate=0.0, seed=None):
+        self.rows = [list(headers)] + [[str(value) for value in row] for row in rows or []]
+        self.latency = latency
+        self.quota_error_rate = quota_error_rate
+        self.calls = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def row_count(self):
+        # Rows in the grid: like a real sheet, appends grow it and clears don't shrink it
+        with self._lock:
+            return len(self.rows)
+
+    def _call(self, method):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            failed = self.quota_error_rate and self._random.random() < self.quota_error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise quota_error()
+
+    def _range(self, range_name):
+        # "A2:D10" or "A:A" -> (first row, first column, last row, last
+        # column), 1-based
+        match = COLUMN_RANGE.match(range_name)
+        if match:
+            first_col = a1_to_rowcol(f"{match.group(1)}1")[1]
+            last_col = a1_to_rowcol(f"{match.group(2)}1")[1]
+            return 1, first_col, max(len(self.rows), 1), last_col
+        match = A1_RANGE.match(range_name)
+        if not match:
+            raise ValueError(f"Unsupported range {range_name!r}")
+        first_row, first_col = a1_to_rowcol(match.group(1))
+        last_row, last_col = a1_to_rowcol(match.group(2) or match.group(1))
+        return first_row, first_col, last_row, last_col
+
+    def _write(self, first_row, first_col, values):
+        for offset, row_values in enumerate(values):
+            row = first_row + offset
+            while len(self.rows) < row:
+                self.rows.append([])
+            cells = self.rows[row - 1]
+            for col, value in enumerate(row_values, start=first_col):
+                while len(cells) < col:
+                    cells.append("")
+                cells[col - 1] = "" if value is None else str(value)
+
+    def _appended(self, first_row, count, width):
+        updated_range = f"A{first_row}:{rowcol_to_a1(first_row + count - 1, width)}"
+        return {"updates": {"updatedRange": f"{self.title}!{updated_range}", "updatedRows": count}}
+
+    def col_values(self, col):
+        self._call("col_values")
+        with self._lock:
+            return _trimmed(cells[col - 1] if len(cells) >= col else "" for cells in self.rows)
+
+    def row_values(self, row):
+        self._call("row_values")
+        with self._lock:
+            return _trimmed(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def cell(self, row, col):
+        self._call("cell")
+        with self._lock:
+            cells = self.rows[row - 1] if row <= len(self.rows) else []
+            value = cells[col - 1] if len(cells) >= col else ""
+        return Cell(row, col, value or None)
+
+    def _values(self, range_name):
+        first_row, first_col, last_row, last_col = self._range(range_name)
+        with self._lock:
+            values = [_trimmed(cells[first_col - 1:last_col]) for cells in self.rows[first_row - 1:last_row]]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def get(self, range_name):
+        self._call("get")
+        return self._values(range_name)
+
+    def batch_get(self, ranges):
+        self._call("batch_get")
+        return [self._values(range_name) for range_name in ranges]
+
+    def get_all_records(self, numericise_ignore=(), default_blank="", empty2zero=False):
+        self._call("get_all_records")
+        with self._lock:
+            headers = self.rows[0]
+            rows = [list(cells) for cells in self.rows[1:]]
+        # Sheets leaves out trailing empty rows, but not empty rows in between
+        while rows and not any(rows[-1]):
+            rows.pop()
+        records = []
+        for cells in rows:
+            values = [cells[col] if col < len(cells) else "" for col in range(len(headers))]
+            if "all" not in numericise_ignore:
+                values = numericise_all(values, empty2zero, default_blank, ignore=list(numericise_ignore))
+            records.append(dict(zip(headers, values)))
+        return records
+
+    def update(self, range_name=None, values=None):
+        self._call("update")
+        first_row, first_col, _, _ = self._range(range_name)
+        with self._lock:
+            self._write(first_row, first_col, values)
+        return {"updatedRange": f"{self.title}!{range_name}", "updatedRows": len(values)}
+
+    def batch_update(self, data):
+        self._call("batch_update")
+        with self._lock:
+            for item in data:
+                first_row, first_col, _, _ = self._range(item["range"])
+                self._write(first_row, first_col, item["values"])
+        return {"totalUpdatedRows": sum(len(item["values"]) for item in data)}
+
+    def batch_clear(self, ranges):
+        self._call("batch_clear")
+        with self._lock:
+            for range_name in ranges:
+                first_row, first_col, last_row, last_col = self._range(range_name)
+                for cells in self.rows[first_row - 1:last_row]:
+                    for col in range(first_col, min(last_col, len(cells)) + 1):
+                        cells[col - 1] = ""
+
+    def append_row(self, values):
+        return self._append("append_row", [values])
+
+    def append_rows(self, values):
+        return self._append("append_rows", values)
+
+    def _append(self, method, rows):
+        self._call(method)
+        with self._lock:
+            # Like Sheets, append after the last row with anything in it
+            while len(self.rows) > 1 and not any(self.rows[-1]):
+                self.rows.pop()
+            first_row = len(self.rows) + 1
+            self._write(first_row, 1, rows)
+        return self._appended(first_row, len(rows), max(len(row) for row in rows))
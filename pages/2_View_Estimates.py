@@ -1,16 +1,13 @@
 import streamlit as st
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import json
 from router import navigate_to
+import pricing
+import rates
+import revisions
+import storage
+from estimate_codec import StoredEstimate
 
-# Google Sheets setup
-def get_google_sheets_client():
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds_dict = json.loads(st.secrets["GOOGLE_CREDENTIALS"])
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    client = gspread.authorize(creds)
-    return client
+PAGE_SIZE = 50
 
 # Title
 st.title("View Saved Estimates")
@@ -25,35 +22,68 @@ with col2:
         navigate_to("how_to_count_windows")
 
 try:
-    # Connect to Google Sheets
-    client = get_google_sheets_client()
-    spreadsheet_id = st.secrets["SPREADSHEET_ID"]
-    st.write(f"DEBUG: Using Spreadsheet ID: {spreadsheet_id}")  # Debug message
-    sheet = client.open_by_key(spreadsheet_id).sheet1
-
-    # Get all records
-    records = sheet.get_all_records()
-    st.write(f"DEBUG: Found {len(records)} records in the sheet.")
-
-    if not records:
-        st.warning("No saved estimates found.")
+    # Connect to the estimate store
+    store = storage.get_store()
+
+    if st.button("Refresh"):
+        store.invalidate()
+
+    # Search and filters
+    with st.expander("Search estimates"):
+        search_col1, search_col2 = st.columns([3, 1])
+        with search_col1:
+            search_text = st.text_input("Account name")
+        with search_col2:
+            search_mode = st.radio("Match", ["Starts with", "Contains"])
+        date_range = st.date_input("Saved between", value=[])
+        total_col1, total_col2 = st.columns(2)
+        with total_col1:
+            min_total = st.number_input("Minimum total ($)", min_value=0.0, step=50.0, value=None)
+        with total_col2:
+            max_total = st.number_input("Maximum total ($)", min_value=0.0, step=50.0, value=None)
+
+    filtering = bool(search_text or date_range or min_total is not None or max_total is not None)
+    if filtering:
+        # Filters need the totals, so they go through the search index
+        start = date_range[0].isoformat() if len(date_range) > 0 else None
+        end = date_range[-1].isoformat() if len(date_range) > 0 else None
+        matches = store.index().search(
+            prefix=search_text if search_mode == "Starts with" else None,
+            contains=search_text if search_mode == "Contains" else None,
+            start=start,
+            end=end,
+            min_total=min_total,
+            max_total=max_total,
+        )
+        account_names = [match["Account Name"] for match in matches]
+    else:
+        # Get the saved account names (cached; records are fetched one at a time below)
+        account_names = store.list_accounts()
+
+    if not account_names:
+        st.warning("No matching estimates found." if filtering else "No saved estimates found.")
     else:
-        # Extract account names for the dropdown
-        account_names = [record["Account Name"] for record in records]
-        selected_account = st.selectbox("Select an estimate to view:", account_names)
+        page_count = (len(account_names) + PAGE_SIZE - 1) // PAGE_SIZE
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, step=1) if page_count > 1 else 1
+        page_names = account_names[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        selected_account = st.selectbox("Select an estimate to view:", page_names)
 
-        # Find the selected record
-        selected_record = next(record for record in records if record["Account Name"] == selected_account)
+        # Load only the selected record
+        selected_record = store.get(selected_account)
+        if selected_record is None:
+            st.warning(f"No saved estimate found for {selected_account}.")
+            st.stop()
+        estimate = StoredEstimate(selected_record)
 
         # Parse the inputs and results
         try:
-            inputs = json.loads(selected_record["Inputs"])
+            inputs = estimate.inputs
         except json.JSONDecodeError as e:
             st.error(f"Failed to parse inputs for {selected_account}. The data may be corrupted. Error: {str(e)}")
             inputs = {}
 
         try:
-            results = json.loads(selected_record["Results"])
+            results = estimate.results
         except json.JSONDecodeError as e:
             st.error(f"Failed to parse results for {selected_account}. The data may be corrupted. Error: {str(e)}")
             results = {}
@@ -61,7 +91,7 @@ try:
         # Display the estimate details
         st.header(f"Estimate for {selected_account}")
         st.subheader("Timestamp")
-        st.write(selected_record["Timestamp"])
+        st.write(f"{estimate.timestamp} (version {estimate.version})")
 
         st.subheader("Inputs")
         for key, value in inputs.items():
@@ -77,5 +107,71 @@ try:
         else:
             st.write("No pricing results available.")
 
+        # Re-price the saved inputs under any published rate table
+        if inputs:
+            st.subheader("Re-price")
+            recorded_version = inputs.get("rate_version")
+            st.write(f"Priced with rates: {recorded_version or 'not recorded (saved before versioned rates)'}")
+            rate_versions = rates.versions()
+            default_version = recorded_version if recorded_version in rate_versions else rates.current_version()
+            rate_version = st.selectbox("Rate version", rate_versions, index=rate_versions.index(default_version))
+            try:
+                repriced = pricing.price_estimate(inputs, rate_version=rate_version)
+            except ValueError as e:
+                st.warning(str(e))
+            else:
+                for key, value in repriced.items():
+                    if key != "total":
+                        st.write(f"{key.replace('_', ' ')}: {value}")
+                st.write(f"**TOTAL: {repriced['total']}**")
+                if isinstance(results.get("total"), (int, float)):
+                    st.write(f"Change from saved total: {repriced['total'] - results['total']:+.2f}")
+
+        # Earlier versions, rebuilt from the revision log
+        st.subheader("History")
+        logged = revisions.latest(store.revisions(selected_account))
+        versions = sorted(logged, reverse=True)
+        if len(versions) < 2:
+            st.write("No earlier versions saved.")
+        else:
+            def version_label(version):
+                return f"{version} ({logged[version]['Timestamp']})"
+
+            history_col1, history_col2 = st.columns(2)
+            with history_col1:
+                old_version = st.selectbox("Compare version", versions, index=1, format_func=version_label)
+            with history_col2:
+                new_version = st.selectbox("with version", versions, index=0, format_func=version_label)
+            show_unchanged = st.checkbox("Show unchanged fields")
+            if old_version == new_version:
+                st.info("Pick two different versions to compare.")
+                st.stop()
+            try:
+                old_estimate = StoredEstimate(store.get_revision(selected_account, old_version))
+                new_estimate = StoredEstimate(store.get_revision(selected_account, new_version))
+            except ValueError as e:
+                st.warning(str(e))
+            else:
+                for title, old_values, new_values in [
+                    ("Inputs", old_estimate.inputs, new_estimate.inputs),
+                    ("Results", old_estimate.results, new_estimate.results),
+                ]:
+                    rows = revisions.compare(old_values, new_values, changed_only=not show_unchanged)
+                    if not rows:
+                        st.write(f"{title}: no changes.")
+                        continue
+                    st.write(f"**{title}**")
+                    st.dataframe(
+                        [
+                            {
+                                "Field": key.replace("_", " "),
+                                f"Version {old_version}": "" if old_value is None else str(old_value),
+                                f"Version {new_version}": "" if new_value is None else str(new_value),
+                            }
+                            for key, old_value, new_value in rows
+                        ],
+                        hide_index=True,
+                    )
+
 except Exception as e:
     st.error(f"Failed to load saved estimates. Error: {str(e)}")
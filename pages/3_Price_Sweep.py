@@ -0,0 +1,117 @@
+import math
+import time
+
+import altair as alt
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import pricing
+import sweep
+from router import navigate_to
+
+# Largest number of steps per axis drawn in a chart; bigger sweeps are priced
+# in full and thinned out for display
+CHART_STEPS = 100
+
+st.title("Price Sweep")
+st.write("See how the price moves across ranges of inputs. Inputs that are not swept are taken from the current estimate.")
+
+# Navigation buttons
+col1, col2 = st.columns(2)
+with col1:
+    if st.button("Estimate"):
+        navigate_to("estimate")
+with col2:
+    if st.button("View Estimates"):
+        navigate_to("view_estimates")
+
+
+def axis_range(name, key):
+    label, (start, stop, step) = sweep.NUMERIC_AXES[name]
+    start_col, stop_col, step_col = st.columns(3)
+    with start_col:
+        start = st.number_input(f"{label} from", value=float(start), key=f"{key}_start")
+    with stop_col:
+        stop = st.number_input("to", value=float(stop), key=f"{key}_stop")
+    with step_col:
+        step = st.number_input("step", min_value=0.01, value=float(step), key=f"{key}_step")
+    return sweep.value_range(start, stop, step)
+
+
+def numeric_label(name):
+    return sweep.NUMERIC_AXES[name][0]
+
+
+def thinned(values):
+    return values[::math.ceil(len(values) / CHART_STEPS)] if len(values) else values
+
+
+inputs = st.session_state.get("inputs") or pricing.default_inputs()
+numeric_names = list(sweep.NUMERIC_AXES)
+
+x_name = st.selectbox("Sweep", numeric_names, format_func=numeric_label)
+axes = {x_name: axis_range(x_name, "x")}
+
+y_name = st.selectbox("Against", [None] + [name for name in numeric_names if name != x_name], format_func=lambda name: "Nothing" if name is None else numeric_label(name))
+if y_name:
+    axes[y_name] = axis_range(y_name, "y")
+
+split_name = st.selectbox("Split by", [None] + list(sweep.CHOICE_AXES), format_func=lambda name: "Nothing" if name is None else sweep.CHOICE_AXES[name][0])
+if split_name:
+    axes[split_name] = sweep.CHOICE_AXES[split_name][1]
+
+line = st.selectbox("Price", ["total"] + pricing.BASE_SERVICES + list(pricing.ADDITIONAL_SERVICE_FLAGS), format_func=lambda name: name.replace("_", " "))
+
+# The chosen add-on is priced along with the ones already on the estimate
+additional_services = pricing.selected_additional_services(inputs)
+if line in pricing.ADDITIONAL_SERVICE_FLAGS and line not in additional_services:
+    additional_services.append(line)
+
+try:
+    started = time.perf_counter()
+    grid = sweep.sweep(axes, inputs, additional_services)
+    elapsed = time.perf_counter() - started
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+
+st.caption(f"Priced {grid['total'].size:,} combinations in {elapsed * 1000:.0f} ms.")
+if line not in grid:
+    st.info(f"{line} is not priced in this sweep. Enter its quantity on the estimate, or sweep it.")
+    st.stop()
+if not grid["valid"].any():
+    st.info(pricing.missing_details_message(pricing.missing_details(inputs)))
+    st.stop()
+
+# Long table of the (thinned) grid for charting
+axis_values = {name: np.asarray(values) for name, values in axes.items()}
+shown = {name: thinned(np.arange(len(values))) if name in sweep.NUMERIC_AXES else np.arange(len(values)) for name, values in axis_values.items()}
+prices = grid[line][np.ix_(*shown.values())]
+index = pd.MultiIndex.from_product([axis_values[name][positions] for name, positions in shown.items()], names=list(axes))
+surface = pd.DataFrame({"price": prices.ravel()}, index=index).reset_index()
+labels = {name: sweep.NUMERIC_AXES[name][0] if name in sweep.NUMERIC_AXES else sweep.CHOICE_AXES[name][0] for name in axes}
+surface = surface.rename(columns=labels)
+
+if y_name:
+    chart = alt.Chart(surface).mark_rect().encode(
+        x=alt.X(f"{labels[x_name]}:O"),
+        y=alt.Y(f"{labels[y_name]}:O", sort="descending"),
+        color=alt.Color("price:Q", title="Price ($)"),
+        tooltip=[*labels.values(), alt.Tooltip("price:Q", format="$.2f")],
+    )
+    if split_name:
+        chart = chart.facet(column=alt.Column(f"{labels[split_name]}:N"))
+    st.altair_chart(chart)
+else:
+    chart = alt.Chart(surface).mark_line().encode(
+        x=alt.X(f"{labels[x_name]}:Q"),
+        y=alt.Y("price:Q", title="Price ($)"),
+        tooltip=[*labels.values(), alt.Tooltip("price:Q", format="$.2f")],
+    )
+    if split_name:
+        chart = chart.encode(color=alt.Color(f"{labels[split_name]}:N"))
+    st.altair_chart(chart)
+
+with st.expander("Prices"):
+    st.dataframe(surface)
@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+import streamlit as st
+
+import bulk
+import storage
+from router import navigate_to
+
+# Problem rows listed after an import (the counts cover every row)
+MAX_LISTED_ROWS = 200
+
+st.title("Import and Export Estimates")
+
+# Navigation buttons
+col1, col2 = st.columns(2)
+with col1:
+    if st.button("Estimate"):
+        navigate_to("estimate")
+with col2:
+    if st.button("View Estimates"):
+        navigate_to("view_estimates")
+
+store = storage.get_store()
+
+st.header("Import")
+st.write(
+    "Upload a CSV or Excel file with an **Account Name** column and one column per estimate input "
+    "(for example Total Perimeter, Max Height, Exterior Standard Windows). Rows are checked and priced "
+    "like the Estimate page, then saved in batches. Saving an account that already exists replaces it."
+)
+uploaded = st.file_uploader("Lead list", type=["csv", "xlsx"])
+if uploaded is not None and st.button("Import"):
+    counts = {"saved": 0, "invalid": 0, "failed": 0}
+    problems = []
+    progress = st.empty()
+    try:
+        for outcome in bulk.import_estimates(bulk.read_rows(uploaded, uploaded.name), store):
+            counts[outcome["status"]] += 1
+            if outcome["status"] != "saved" and len(problems) < MAX_LISTED_ROWS:
+                problems.append(outcome)
+            processed = sum(counts.values())
+            if processed % bulk.IMPORT_CHUNK_ROWS == 0:
+                progress.write(f"Processed {processed:,} rows...")
+    except Exception as e:
+        progress.empty()
+        st.error(f"Import stopped. Error: {str(e)}")
+        st.warning(f"Saved {counts['saved']:,} estimates to the {store.name} before it stopped.")
+    else:
+        progress.empty()
+        st.success(f"Saved {counts['saved']:,} estimates to the {store.name}.")
+    if counts["invalid"] or counts["failed"]:
+        st.warning(f"{counts['invalid']:,} rows could not be priced and {counts['failed']:,} could not be saved.")
+        st.dataframe(problems)
+
+st.header("Export")
+export_format = st.radio("Format", ["csv", "xlsx"], horizontal=True)
+if st.button("Prepare export"):
+    try:
+        # Written to a temporary file first so the estimates are streamed from the store
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f"estimates.{export_format}")
+            with open(path, "wb") as out:
+                count = bulk.export_estimates(store, out, export_format)
+            with open(path, "rb") as f:
+                st.download_button(f"Download {count:,} estimates", f, file_name=f"estimates.{export_format}")
+    except Exception as e:
+        st.error(f"Failed to export estimates. Error: {str(e)}")
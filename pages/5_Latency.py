@@ -0,0 +1,93 @@
+import hmac
+from datetime import datetime
+
+import streamlit as st
+
+import timing
+from config import get_secret
+from router import navigate_to
+
+# Requests listed in the breakdown table
+MAX_LISTED_REQUESTS = 50
+
+st.title("Latency")
+
+# Navigation buttons
+col1, col2 = st.columns(2)
+with col1:
+    if st.button("Estimate"):
+        navigate_to("estimate")
+with col2:
+    if st.button("View Estimates"):
+        navigate_to("view_estimates")
+
+# Admins only: unlocked once per session with the ADMIN_PASSWORD secret
+admin_password = get_secret("ADMIN_PASSWORD", None)
+if not admin_password:
+    st.info("Set the ADMIN_PASSWORD secret to turn on this page.")
+    st.stop()
+if not st.session_state.get("is_admin"):
+    password = st.text_input("Admin password", type="password")
+    if password and hmac.compare_digest(password.encode(), str(admin_password).encode()):
+        st.session_state.is_admin = True
+        st.rerun()
+    if password:
+        st.error("Wrong password.")
+    st.stop()
+
+st.write(
+    f"Timings of the last {timing.BUFFER_SIZE:,} operations in this server process: page reruns, "
+    "pricing, Google Sheets calls and image loading. Times are in milliseconds."
+)
+if st.button("Refresh"):
+    st.rerun()
+
+stats = timing.summary()
+if not stats:
+    st.info("Nothing timed yet.")
+    st.stop()
+
+st.header("By operation")
+st.dataframe(
+    [
+        {
+            "Operation": name,
+            "Count": span["count"],
+            "Errors": span["errors"],
+            "p50": round(span["p50"] * 1000, 1),
+            "p95": round(span["p95"] * 1000, 1),
+            "p99": round(span["p99"] * 1000, 1),
+            "Max": round(span["max"] * 1000, 1),
+            "Total (s)": round(span["total"], 2),
+        }
+        for name, span in sorted(stats.items(), key=lambda item: item[1]["total"], reverse=True)
+    ],
+    hide_index=True,
+)
+
+st.header("Recent requests")
+st.write("Where each page rerun or API call spent its time; **other** is time outside the timed operations.")
+st.dataframe(
+    [
+        {
+            "Started": datetime.fromtimestamp(request["start"]).strftime("%H:%M:%S"),
+            "Request": request["name"],
+            "Total": round(request["seconds"] * 1000, 1),
+            **{name: round(seconds * 1000, 1) for name, seconds in request["spans"].items()},
+            "other": round(request["other"] * 1000, 1),
+        }
+        for request in timing.requests(MAX_LISTED_REQUESTS)
+    ],
+    hide_index=True,
+)
+
+st.header("Export")
+export_col1, export_col2, export_col3 = st.columns(3)
+with export_col1:
+    st.download_button("JSON", timing.to_json(), file_name="timings.json", mime="application/json")
+with export_col2:
+    st.download_button("Prometheus", timing.to_prometheus(), file_name="timings.prom", mime="text/plain")
+with export_col3:
+    if st.button("Clear timings"):
+        timing.clear()
+        st.rerun()
@@ -0,0 +1,87 @@
+import pandas as pd
+import streamlit as st
+
+import analytics
+import storage
+from router import navigate_to
+
+st.title("Analytics")
+
+# Navigation buttons
+col1, col2 = st.columns(2)
+with col1:
+    if st.button("Estimate"):
+        navigate_to("estimate")
+with col2:
+    if st.button("View Estimates"):
+        navigate_to("view_estimates")
+
+st.write(
+    "Every saved estimate counts once, with its latest version, in the month it was last saved. "
+    "Figures are kept up to date as estimates are saved."
+)
+
+try:
+    store = storage.get_store()
+    aggregates = analytics.get_aggregates()
+
+    if aggregates.built_at() is None or st.button("Rebuild from saved estimates"):
+        with st.spinner("Reading every saved estimate..."):
+            counted, skipped = aggregates.rebuild(store)
+        if skipped:
+            st.warning(f"Skipped {skipped} estimates that could not be read.")
+    st.caption(f"Last rebuilt from {store.name} at {aggregates.built_at()}.")
+
+    months = aggregates.monthly()
+    if not months:
+        st.info("No saved estimates yet.")
+        st.stop()
+
+    periods = [month["period"] for month in months]
+    if len(periods) > 1:
+        first, last = st.select_slider("Months", options=periods, value=(periods[0], periods[-1]))
+        months = [month for month in months if first <= month["period"] <= last]
+
+    frame = pd.DataFrame(months).set_index("period")
+    totals = frame.sum()
+    estimates = int(totals["estimates"])
+
+    metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+    metric_col1.metric("Estimates", f"{estimates:,}")
+    metric_col2.metric("Average ticket", f"${totals['total'] / estimates:,.2f}")
+    metric_col3.metric("At truck minimum", f"{totals['truck_minimum'] / estimates:.1%}")
+    metric_col4.metric("At a service minimum", f"{totals['service_minimum'] / estimates:.1%}")
+
+    # Revenue mix by service group
+    st.header("Revenue by service")
+    revenue = totals[analytics.GROUPS]
+    st.dataframe(
+        [
+            {
+                "Service": analytics.GROUP_LABELS[group],
+                "Revenue": f"${revenue[group]:,.2f}",
+                "Share": f"{revenue[group] / revenue.sum():.1%}" if revenue.sum() else "",
+            }
+            for group in analytics.GROUPS
+        ],
+        hide_index=True,
+    )
+
+    # Month by month
+    st.header("Over time")
+    st.subheader("Revenue mix")
+    st.bar_chart(frame[analytics.GROUPS].rename(columns=analytics.GROUP_LABELS))
+
+    st.subheader("Average ticket")
+    st.line_chart((frame["total"] / frame["estimates"]).rename("Average ticket ($)"))
+
+    st.subheader("Estimates at a minimum")
+    st.line_chart(
+        pd.DataFrame({
+            "Truck minimum (%)": frame["truck_minimum"] / frame["estimates"] * 100,
+            "Service minimum (%)": frame["service_minimum"] / frame["estimates"] * 100,
+        })
+    )
+
+except Exception as e:
+    st.error(f"Failed to load analytics. Error: {str(e)}")
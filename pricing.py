@@ -0,0 +1,433 @@
+import copy
+import json
+import math
+
+import rates
+import timing
+
+# Pricing rules for CC Inc. estimates. Nothing in here imports Streamlit, so
+# the same math can be used by the Estimate page, scripts and workers.
+# Rates, tiers and minimums come from the versioned tables in rates.py; an
+# estimate is priced with the version named in its "rate_version" input.
+
+# Truck minimum under the current rates (older versions may differ; see
+# truck_minimum())
+TRUCK_MINIMUM = rates.rate_table()["truck_minimum"]
+
+BASE_SERVICES = [
+    "house_washing",
+    "pest_control",
+    "rodent_control",
+    "exterior_windows",
+    "interior_windows",
+    "tracks_sills",
+]
+
+ADDITIONAL_SERVICES = [
+    "roof treatment",
+    "gutter cleaning",
+    "roof blow-off",
+    "concrete cleaning",
+    "deck/dock cleaning",
+    "vinyl porch cleaning",
+    "storm windows",
+    "custom items",
+]
+
+# Inputs for a blank estimate (also the Estimate page's session defaults)
+DEFAULT_INPUTS = {
+    "total_perimeter": 0,
+    "max_height": 0,
+    "house_dirtiness": "Light",
+    "stories": 1.0,
+    "pest_infestation": "Light",
+    "ladder_spots_pest": 0,
+    "structure_type": "Main",
+    "rodent_stations": 4,
+    "interior_monitoring": False,
+    "exterior_standard_windows": 0,
+    "exterior_high_windows": 0,
+    "interior_standard_windows": 0,
+    "interior_high_windows": 0,
+    "tracks_sills_price": 99.0,
+    "roof_treatment": "NO",
+    "roof_type": "Asphalt",
+    "roof_sq_ft": 0,
+    "roof_metal_min": 399.0,
+    "gutter_cleaning": "NO",
+    "gutter_linear_feet": 0,
+    "roof_blow_off": "NO",
+    "blow_off_hours": 0,
+    "blow_off_men": 1,
+    "concrete_cleaning": "NO",
+    "concrete_sq_ft": 0,
+    "deck_dock_cleaning": "NO",
+    "deck_dock_sq_ft": 0,
+    "vinyl_porch_cleaning": "NO",
+    "vinyl_panels": 0,
+    "storm_windows_cleaning": "NO",
+    "storm_windows": 0,
+    "custom_items": [],
+    "rate_version": None,  # None prices with the current rates
+}
+
+# Allowed values for the inputs picked from a list on the Estimate page
+INPUT_CHOICES = {
+    "house_dirtiness": ["Light", "Medium", "Heavy"],
+    "stories": [1.0, 1.5, 2.0, 2.5, 3.0],
+    "pest_infestation": ["Light", "Medium", "Heavy"],
+    "structure_type": ["Main", "Additional"],
+    "roof_type": ["Asphalt", "Metal"],
+    "blow_off_men": [1, 2],
+}
+
+# Input flag that records each additional service as selected ("YES"/"NO")
+ADDITIONAL_SERVICE_FLAGS = {
+    "roof treatment": "roof_treatment",
+    "gutter cleaning": "gutter_cleaning",
+    "roof blow-off": "roof_blow_off",
+    "concrete cleaning": "concrete_cleaning",
+    "deck/dock cleaning": "deck_dock_cleaning",
+    "vinyl porch cleaning": "vinyl_porch_cleaning",
+    "storm windows": "storm_windows_cleaning",
+}
+
+
+# Number inputs -> (type, minimum, maximum or None), as the Estimate page's
+# widgets take them; stories and blow_off_men are picked from INPUT_CHOICES
+NUMBER_INPUTS = {
+    "total_perimeter": (float, 0.0, None),
+    "max_height": (float, 0.0, None),
+    "ladder_spots_pest": (int, 0, None),
+    "rodent_stations": (int, 0, None),
+    "exterior_standard_windows": (int, 0, None),
+    "exterior_high_windows": (int, 0, None),
+    "interior_standard_windows": (int, 0, None),
+    "interior_high_windows": (int, 0, None),
+    "tracks_sills_price": (float, 0.0, None),
+    "roof_sq_ft": (float, 0.0, None),
+    "roof_metal_min": (float, 399.0, None),
+    "gutter_linear_feet": (int, 0, None),
+    "blow_off_hours": (float, 0.0, 10.0),
+    "concrete_sq_ft": (int, 0, None),
+    "deck_dock_sq_ft": (int, 0, None),
+    "vinyl_panels": (int, 0, None),
+    "storm_windows": (int, 0, None),
+}
+
+# Words that read as "yes" for a flag or checkbox input given as text
+TRUE_WORDS = {"yes", "y", "true", "1", "x"}
+
+FLAG_SERVICES = {flag: service for service, flag in ADDITIONAL_SERVICE_FLAGS.items()}
+
+
+def _custom_items_value(value):
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not isinstance(value, list):
+        raise ValueError('expected a list of {"name": ..., "price": ...} objects')
+    items = []
+    for item in value:
+        if not isinstance(item, dict) or not isinstance(item.get("name"), str):
+            raise ValueError('expected a list of {"name": ..., "price": ...} objects')
+        price = item.get("price")
+        if isinstance(price, bool) or not isinstance(price, (int, float)) or not price >= 0:
+            raise ValueError(f"custom item {item['name']!r} needs a price of 0 or more")
+        items.append({"name": item["name"], "price": float(price)})
+    return items
+
+
+def _number_value(value, kind, minimum, maximum):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError("expected a number")
+    number = float(value)
+    if math.isnan(number) or math.isinf(number):
+        raise ValueError("expected a number")
+    if kind is int:
+        if not number.is_integer():
+            raise ValueError("expected a whole number")
+        number = int(number)
+    if minimum is not None and number < minimum:
+        raise ValueError(f"expected {minimum:g} or more")
+    if maximum is not None and number > maximum:
+        raise ValueError(f"expected at most {maximum:g}")
+    return number
+
+
+def convert_input(key, value):
+    # A value from outside (a file cell, JSON) as the Estimate page would
+    # have set input key: numbers from text, flags from yes/no words, list
+    # choices matched without case. Raises ValueError saying what was expected.
+    default = DEFAULT_INPUTS[key]
+    if key == "custom_items":
+        return _custom_items_value(value)
+    if key == "rate_version":
+        if not isinstance(value, str) or value not in rates.versions():
+            raise ValueError(f"expected one of {', '.join(rates.versions())}")
+        return value
+    if key in FLAG_SERVICES:
+        return "YES" if str(value).strip().lower() in TRUE_WORDS else "NO"
+    if isinstance(default, bool):
+        return value if isinstance(value, bool) else str(value).strip().lower() in TRUE_WORDS
+    if key in NUMBER_INPUTS:
+        return _number_value(value, *NUMBER_INPUTS[key])
+    if isinstance(default, (int, float)):
+        value = _number_value(value, type(default), None, None)
+    elif isinstance(value, str):
+        value = value.strip()
+    else:
+        raise ValueError("expected text")
+    choices = INPUT_CHOICES.get(key)
+    if choices:
+        matches = [choice for choice in choices if str(choice).lower() == str(value).lower()]
+        if not matches:
+            raise ValueError(f"expected one of {', '.join(str(choice) for choice in choices)}")
+        value = matches[0]
+    return value
+
+
+def default_inputs():
+    # A new estimate is pinned to the current rates, so saving it records them
+    inputs = copy.deepcopy(DEFAULT_INPUTS)
+    inputs["rate_version"] = rates.current_version()
+    return inputs
+
+
+def _value(inputs, key):
+    return inputs.get(key, DEFAULT_INPUTS[key])
+
+
+def _rates(inputs):
+    return rates.rate_table(_value(inputs, "rate_version"))
+
+
+def truck_minimum(inputs):
+    return _rates(inputs)["truck_minimum"]
+
+
+def missing_details(inputs):
+    missing = []
+    if _value(inputs, "total_perimeter") == 0:
+        missing.append("total perimeter")
+    if _value(inputs, "max_height") == 0:
+        missing.append("max height for house washing")
+    if _value(inputs, "tracks_sills_price") == 0:
+        missing.append("tracks/sills price (or confirm to use default $99)")
+    return missing
+
+
+def missing_details_message(missing):
+    return f"I need more information to calculate the prices. Please provide: {', '.join(missing)}."
+
+
+# Base services
+
+def house_washing_price(inputs):
+    house_rates = _rates(inputs)["house_washing"]
+    house_sq_ft = _value(inputs, "total_perimeter") * _value(inputs, "max_height")
+    house_base_rate = house_rates["base_rate"].lookup(house_sq_ft)
+    house_condition_adder = house_rates["dirtiness_adder"].get(_value(inputs, "house_dirtiness"), 0)
+    house_washing_total = (house_sq_ft * house_base_rate) + house_condition_adder
+    return max(house_washing_total, house_rates["minimum"])  # Minimum price
+
+
+def pest_control_price(inputs):
+    pest_rates = _rates(inputs)["pest_control"]
+    structure_type = _value(inputs, "structure_type")
+    treated_area = _value(inputs, "total_perimeter") * (_value(inputs, "stories") * pest_rates["story_height"])
+    base_rate_tiers = pest_rates["main_rate"] if structure_type == "Main" else pest_rates["additional_rate"]
+    pest_base_rate = base_rate_tiers.lookup(treated_area)
+    pest_infestation_adder = pest_rates["infestation_adder"].get(_value(inputs, "pest_infestation"), 0)
+    ladder_spots_pest = _value(inputs, "ladder_spots_pest")
+    ladder_cost = pest_rates["first_ladder_spot"] if ladder_spots_pest > 0 else 0
+    ladder_cost += (ladder_spots_pest - 1) * pest_rates["extra_ladder_spot"] if ladder_spots_pest > 1 else 0
+    pest_total = (treated_area * pest_base_rate) + pest_infestation_adder + ladder_cost
+    if structure_type == "Main":
+        pest_minimum_price = pest_rates["main_minimum"].lookup(treated_area)
+        pest_total = max(pest_total, pest_minimum_price)
+    return pest_total
+
+
+def rodent_control_price(inputs):
+    rodent_rates = _rates(inputs)["rodent_control"]
+    extra_stations = max(0, _value(inputs, "rodent_stations") - rodent_rates["included_stations"])
+    rodent_stations_price = extra_stations * rodent_rates["extra_station"]
+    interior_monitoring_price = rodent_rates["interior_monitoring"] if _value(inputs, "interior_monitoring") else 0.00
+    return rodent_rates["base_price"] + rodent_stations_price + interior_monitoring_price
+
+
+def exterior_windows_price(inputs):
+    window_rates = _rates(inputs)["exterior_windows"]
+    exterior_windows_total = (_value(inputs, "exterior_standard_windows") * window_rates["standard"]) + (_value(inputs, "exterior_high_windows") * window_rates["high"])
+    if exterior_windows_total > 0 and exterior_windows_total < window_rates["minimum"]:
+        exterior_windows_total = window_rates["minimum"]
+    elif exterior_windows_total == 0:
+        exterior_windows_total = 0.00
+    return exterior_windows_total
+
+
+def interior_windows_price(inputs):
+    window_rates = _rates(inputs)["interior_windows"]
+    interior_windows_total = (_value(inputs, "interior_standard_windows") * window_rates["standard"]) + (_value(inputs, "interior_high_windows") * window_rates["high"])
+    if interior_windows_total > 0 and interior_windows_total < window_rates["minimum"]:
+        interior_windows_total = window_rates["minimum"]
+    elif interior_windows_total == 0:
+        interior_windows_total = 0.00
+    return interior_windows_total
+
+
+def tracks_sills_price(inputs):
+    price = _value(inputs, "tracks_sills_price")
+    return price if price > 0 else _rates(inputs)["tracks_sills"]["default_price"]
+
+
+BASE_SERVICE_PRICES = {
+    "house_washing": house_washing_price,
+    "pest_control": pest_control_price,
+    "rodent_control": rodent_control_price,
+    "exterior_windows": exterior_windows_price,
+    "interior_windows": interior_windows_price,
+    "tracks_sills": tracks_sills_price,
+}
+
+
+# Inputs each base service reads, so callers can tell which lines an edit affects
+BASE_SERVICE_INPUTS = {
+    "house_washing": ["total_perimeter", "max_height", "house_dirtiness"],
+    "pest_control": ["total_perimeter", "stories", "pest_infestation", "ladder_spots_pest", "structure_type"],
+    "rodent_control": ["rodent_stations", "interior_monitoring"],
+    "exterior_windows": ["exterior_standard_windows", "exterior_high_windows"],
+    "interior_windows": ["interior_standard_windows", "interior_high_windows"],
+    "tracks_sills": ["tracks_sills_price"],
+}
+
+
+def base_results(inputs):
+    return {service: round(BASE_SERVICE_PRICES[service](inputs), 2) for service in BASE_SERVICES}
+
+
+# Additional services
+
+def _roof_treatment(inputs):
+    roof_rates = _rates(inputs)["roof treatment"]
+    roof_type = _value(inputs, "roof_type")
+    rate = roof_rates["rate"]["Asphalt"] if roof_type == "Asphalt" else roof_rates["rate"]["Metal"]
+    min_price = roof_rates["asphalt_minimum"] if roof_type == "Asphalt" else _value(inputs, "roof_metal_min")
+    roof_price = _value(inputs, "roof_sq_ft") * rate
+    return {"roof treatment": round(max(roof_price, min_price), 2)}
+
+
+def _gutter_cleaning(inputs):
+    gutter_rates = _rates(inputs)["gutter cleaning"]
+    gutter_price = _value(inputs, "gutter_linear_feet") * gutter_rates["rate"]
+    return {"gutter cleaning": round(max(gutter_price, gutter_rates["minimum"]), 2)}
+
+
+def _roof_blow_off(inputs):
+    blow_off_rates = _rates(inputs)["roof blow-off"]
+    blow_off_hours = _value(inputs, "blow_off_hours")
+    second_man = blow_off_hours * blow_off_rates["second_man_hourly"] if _value(inputs, "blow_off_men") == 2 else 0
+    blow_off_price = (blow_off_hours * blow_off_rates["hourly"]) + second_man
+    return {"roof blow-off": round(blow_off_price, 2)}
+
+
+def _concrete_cleaning(inputs):
+    return {"concrete cleaning": round(_value(inputs, "concrete_sq_ft") * _rates(inputs)["concrete cleaning"]["rate"], 2)}
+
+
+def _deck_dock_cleaning(inputs):
+    return {"deck/dock cleaning": round(_value(inputs, "deck_dock_sq_ft") * _rates(inputs)["deck/dock cleaning"]["rate"], 2)}
+
+
+def _vinyl_porch_cleaning(inputs):
+    return {"vinyl porch cleaning": round(_value(inputs, "vinyl_panels") * _rates(inputs)["vinyl porch cleaning"]["per_panel"], 2)}
+
+
+def _storm_windows(inputs):
+    return {"storm windows": round(_value(inputs, "storm_windows") * _rates(inputs)["storm windows"]["per_window"], 2)}
+
+
+def _custom_items(inputs):
+    return {
+        f"custom line item ({item['name']})": round(item["price"], 2)
+        for item in _value(inputs, "custom_items")
+    }
+
+
+# service -> (pricing function, input that must be non-zero, what to ask for when it is missing)
+ADDITIONAL_SERVICE_PRICES = {
+    "roof treatment": (_roof_treatment, "roof_sq_ft", "roof square footage"),
+    "gutter cleaning": (_gutter_cleaning, "gutter_linear_feet", "gutter linear feet"),
+    "roof blow-off": (_roof_blow_off, "blow_off_hours", "hours for roof blow-off"),
+    "concrete cleaning": (_concrete_cleaning, "concrete_sq_ft", "concrete square footage"),
+    "deck/dock cleaning": (_deck_dock_cleaning, "deck_dock_sq_ft", "deck/dock square footage"),
+    "vinyl porch cleaning": (_vinyl_porch_cleaning, "vinyl_panels", "number of vinyl panels"),
+    "storm windows": (_storm_windows, "storm_windows", "number of storm windows"),
+    "custom items": (_custom_items, "custom_items", "custom item name and price"),
+}
+
+
+# Inputs each additional service reads
+ADDITIONAL_SERVICE_INPUTS = {
+    "roof treatment": ["roof_type", "roof_sq_ft", "roof_metal_min"],
+    "gutter cleaning": ["gutter_linear_feet"],
+    "roof blow-off": ["blow_off_hours", "blow_off_men"],
+    "concrete cleaning": ["concrete_sq_ft"],
+    "deck/dock cleaning": ["deck_dock_sq_ft"],
+    "vinyl porch cleaning": ["vinyl_panels"],
+    "storm windows": ["storm_windows"],
+    "custom items": ["custom_items"],
+}
+
+
+def missing_additional_details(service, inputs):
+    _, required, description = ADDITIONAL_SERVICE_PRICES[service]
+    if service == "custom items":
+        items = _value(inputs, "custom_items")
+        if not items or any(not item.get("name") or item.get("price", 0) == 0 for item in items):
+            return description
+        return None
+    if _value(inputs, required) == 0:
+        return description
+    return None
+
+
+def additional_results(service, inputs):
+    price, _, _ = ADDITIONAL_SERVICE_PRICES[service]
+    return price(inputs)
+
+
+def selected_additional_services(inputs):
+    selected = [service for service in ADDITIONAL_SERVICES[:-1] if _value(inputs, ADDITIONAL_SERVICE_FLAGS[service]) == "YES"]
+    if _value(inputs, "custom_items"):
+        selected.append("custom items")
+    return selected
+
+
+def estimate_total(results, minimum=TRUCK_MINIMUM):
+    total = sum(price for service, price in results.items() if service != "total")
+    total = max(total, minimum)  # Apply the truck minimum
+    return round(total, 2)
+
+
+@timing.timed("pricing.price_estimate")
+def price_estimate(inputs, additional_services=None, rate_version=None):
+    # Prices a full estimate from an inputs dict shaped like DEFAULT_INPUTS.
+    # Additional services default to the ones flagged "YES" in the inputs;
+    # services that are still missing details are left off, as on the page.
+    # Pass rate_version to re-price under other rates than the ones recorded
+    # in the inputs.
+    if rate_version is not None:
+        inputs = dict(inputs, rate_version=rate_version)
+    missing = missing_details(inputs)
+    if missing:
+        raise ValueError(missing_details_message(missing))
+    results = base_results(inputs)
+    if additional_services is None:
+        additional_services = selected_additional_services(inputs)
+    for service in additional_services:
+        if missing_additional_details(service, inputs):
+            continue
+        results.update(additional_results(service, inputs))
+    results["total"] = estimate_total(results, truck_minimum(inputs))
+    return results
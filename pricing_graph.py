@@ -0,0 +1,82 @@
+import copy
+
+import pricing
+import timing
+
+# Incremental pricing for the live Estimate page. Each service line is a node
+# that declares the inputs it reads (pricing.BASE_SERVICE_INPUTS and
+# ADDITIONAL_SERVICE_INPUTS); on update() only nodes whose inputs changed are
+# repriced, and the total is adjusted by the difference. The subtotal is kept
+# in whole cents so adding and removing lines never drifts, and results match
+# pricing.price_estimate() for the same inputs. Every line reads the rate
+# table, so changing "rate_version" reprices them all.
+
+
+def _cents(lines):
+    return sum(round(price * 100) for price in lines.values())
+
+
+class PricingGraph:
+    def __init__(self):
+        self._inputs = None
+        self._nodes = {}  # service -> its priced lines
+        self._order = []
+        self._subtotal_cents = 0
+        self.missing = []
+        self.missing_additional = {}
+        self.recomputed = []
+
+    def _price(self, service, inputs):
+        if service in pricing.BASE_SERVICE_PRICES:
+            return {service: round(pricing.BASE_SERVICE_PRICES[service](inputs), 2)}
+        return pricing.additional_results(service, inputs)
+
+    def _dependencies(self, service):
+        return pricing.BASE_SERVICE_INPUTS.get(service) or pricing.ADDITIONAL_SERVICE_INPUTS[service]
+
+    @timing.timed("pricing.graph_update")
+    def update(self, inputs, additional_services=()):
+        if self._inputs is None:
+            changed = None  # first run prices everything
+        else:
+            keys = set(inputs) | set(self._inputs)
+            changed = {key for key in keys if inputs.get(key) != self._inputs.get(key)}
+            if "rate_version" in changed:
+                changed = None
+        self._inputs = copy.deepcopy(inputs)
+
+        self.missing = pricing.missing_details(inputs)
+        self.missing_additional = {}
+        wanted = []
+        if not self.missing:
+            wanted = list(pricing.BASE_SERVICES)
+            for service in additional_services:
+                missing_detail = pricing.missing_additional_details(service, inputs)
+                if missing_detail:
+                    self.missing_additional[service] = missing_detail
+                else:
+                    wanted.append(service)
+
+        for service in list(self._nodes):
+            if service not in wanted:
+                self._subtotal_cents -= _cents(self._nodes.pop(service))
+
+        self.recomputed = []
+        for service in wanted:
+            if service in self._nodes and changed is not None and changed.isdisjoint(self._dependencies(service)):
+                continue
+            lines = self._price(service, inputs)
+            self._subtotal_cents += _cents(lines) - _cents(self._nodes.get(service, {}))
+            self._nodes[service] = lines
+            self.recomputed.append(service)
+        self._order = wanted
+        return self.results()
+
+    def results(self):
+        if not self._order:
+            return {}
+        results = {}
+        for service in self._order:
+            results.update(self._nodes[service])
+        results["total"] = round(max(self._subtotal_cents / 100, pricing.truck_minimum(self._inputs)), 2)
+        return results
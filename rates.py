@@ -0,0 +1,83 @@
+import json
+import os
+from bisect import bisect_right
+from collections import namedtuple
+from types import MappingProxyType
+
+# Rate tables for pricing.py, read from rates.json (or RATES_PATH). The file
+# holds every published version of the rates plus which one is current:
+#
+#   {"current": "2", "versions": {"1": {...}, "2": {...}}}
+#
+# It is parsed once per process into read-only tables. Tiered rates are
+# written as {"boundaries": [6000, 10000], "values": [0.094, 0.067, 0.111]}:
+# amounts below the first boundary get the first value, amounts from 6000 up
+# to (not including) 10000 the second, and so on. Old versions stay in the
+# file so saved estimates can be re-priced with the rates they were quoted at.
+
+RATES_PATH = os.environ.get("RATES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rates.json"))
+
+_tables = None
+_current_version = None
+
+
+class Tiers(namedtuple("Tiers", ["boundaries", "values"])):
+    __slots__ = ()
+
+    def lookup(self, amount):
+        return self.values[bisect_right(self.boundaries, amount)]
+
+
+def _freeze(value, path):
+    if isinstance(value, dict):
+        if set(value) == {"boundaries", "values"}:
+            boundaries = tuple(value["boundaries"])
+            values = tuple(value["values"])
+            if list(boundaries) != sorted(boundaries) or len(values) != len(boundaries) + 1:
+                raise ValueError(f"Bad tiers at {path}: need sorted boundaries and one more value than boundaries")
+            return Tiers(boundaries, values)
+        return MappingProxyType({key: _freeze(item, f"{path}.{key}") for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item, f"{path}[{i}]") for i, item in enumerate(value))
+    return value
+
+
+def load_rate_tables(path=None):
+    # version -> read-only rate table, and the current version
+    with open(path or RATES_PATH, "r") as f:
+        config = json.load(f)
+    tables = {}
+    for version, table in config["versions"].items():
+        table = dict(table, version=version)
+        tables[version] = _freeze(table, version)
+    current = config["current"]
+    if current not in tables:
+        raise ValueError(f"Current rate version {current!r} is not in {path or RATES_PATH}")
+    return MappingProxyType(tables), current
+
+
+def _load():
+    global _tables, _current_version
+    if _tables is None:
+        _tables, _current_version = load_rate_tables()
+    return _tables
+
+
+def versions():
+    return list(_load())
+
+
+def current_version():
+    _load()
+    return _current_version
+
+
+def rate_table(version=None):
+    # The table for a version; None means the current one
+    tables = _load()
+    if version is None:
+        version = _current_version
+    try:
+        return tables[version]
+    except KeyError:
+        raise ValueError(f"Unknown rate version {version!r}; known versions: {', '.join(tables)}") from None
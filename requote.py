@@ -0,0 +1,199 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import batch_pricing
+import rates
+from estimate_codec import StoredEstimate
+
+# Re-prices every saved estimate under a rate version (default: current) and
+# writes the new Results back, e.g. after a rate change:
+#
+#   python requote.py                       # re-quote everything, write back
+#   python requote.py --dry-run             # only write the diff report
+#   python requote.py --rate-version 2 --workers 8
+#
+# Records are streamed from the estimate store in chunks and priced in a pool
+# of worker processes. Changed estimates are written back one chunk at a time
+# with store.save_many() (one batched update per chunk for Sheets), keeping
+# their original Timestamp, and only if nobody saved them since they were read
+# (the "conflict" status; run again to pick those up). After each chunk the account names done so far go
+# to the checkpoint file, so an interrupted run picks up where it left off
+# when started again with the same arguments. Every estimate gets a line in
+# the CSV diff report with its old and new totals.
+
+CHUNK_ROWS = 500
+DEFAULT_CHECKPOINT_PATH = os.path.join("estimates", "requote_checkpoint.json")
+DEFAULT_REPORT_PATH = os.path.join("estimates", "requote_report.csv")
+
+REPORT_HEADERS = ["Account Name", "Old Total", "New Total", "Change", "Status", "Message"]
+
+
+def requote_chunk(records, rate_version):
+    # Runs in a worker process: re-prices the stored inputs of each record.
+    # Returns (record, new inputs, new results or None, old results, status,
+    # message) per record.
+    decoded = []
+    outcomes = []
+    for record in records:
+        estimate = StoredEstimate(record)
+        try:
+            old_inputs = estimate.inputs
+            old_results = estimate.results
+        except ValueError as e:
+            outcomes.append((record, None, None, None, "error", f"could not decode: {e}"))
+            continue
+        decoded.append((record, old_inputs, dict(old_inputs, rate_version=rate_version), old_results))
+
+    priced = batch_pricing.price_inputs([inputs for _, _, inputs, _ in decoded], rate_version) if decoded else []
+    for (record, old_inputs, inputs, old_results), results in zip(decoded, priced):
+        if results is None:
+            outcomes.append((record, inputs, None, old_results, "invalid", "missing required details"))
+        elif results == old_results and old_inputs.get("rate_version") == rate_version:
+            outcomes.append((record, inputs, results, old_results, "unchanged", ""))
+        else:
+            outcomes.append((record, inputs, results, old_results, "changed", ""))
+    return outcomes
+
+
+def _chunks(records, done, size):
+    chunk = []
+    for record in records:
+        if record["Account Name"] in done:
+            continue
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _load_checkpoint(path, rate_version):
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("rate_version") != rate_version:
+        raise SystemExit(f"{path} is for rate version {checkpoint.get('rate_version')}; delete it to start over")
+    return set(checkpoint["done"])
+
+
+def _save_checkpoint(path, rate_version, done):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump({"rate_version": rate_version, "done": sorted(done)}, f)
+    os.replace(temporary, path)
+
+
+def _total(results):
+    total = (results or {}).get("total")
+    return total if isinstance(total, (int, float)) else None
+
+
+def _write_back(store, outcomes, dry_run):
+    # Saves the changed estimates in one batch, each only over the version
+    # that was read; returns {account: (status, error)} for those not saved
+    changed = [
+        (record["Account Name"], inputs, results, record["Timestamp"], StoredEstimate(record).version)
+        for record, inputs, results, _, status, _ in outcomes
+        if status == "changed"
+    ]
+    if dry_run or not changed:
+        return {}
+    report = store.save_many(changed)
+    return {
+        outcome["account_name"]: ("conflict" if outcome.get("conflict") else "failed", outcome["error"])
+        for outcome in report
+        if not outcome["ok"]
+    }
+
+
+def requote(store, rate_version=None, workers=None, chunk_rows=CHUNK_ROWS,
+            checkpoint_path=DEFAULT_CHECKPOINT_PATH, report_path=DEFAULT_REPORT_PATH, dry_run=False):
+    # Returns counts by status for the records handled in this run
+    rate_version = rate_version or rates.current_version()
+    rates.rate_table(rate_version)  # unknown versions fail before any work
+    workers = workers or os.cpu_count() or 1
+    for path in (checkpoint_path, report_path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    done = _load_checkpoint(checkpoint_path, rate_version)
+    counts = {"changed": 0, "unchanged": 0, "invalid": 0, "error": 0, "conflict": 0, "failed": 0}
+
+    new_report = not os.path.exists(report_path) or not done
+    with open(report_path, "w" if new_report else "a", newline="") as report_file, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        report = csv.writer(report_file)
+        if new_report:
+            report.writerow(REPORT_HEADERS)
+        chunks = _chunks(store.iter_records(chunk_rows), done, chunk_rows)
+        # Keep a couple of chunks per worker in flight so memory stays bounded
+        max_in_flight = 2 * workers
+        in_flight = set()
+        while True:
+            for chunk in chunks:
+                in_flight.add(pool.submit(requote_chunk, chunk, rate_version))
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                outcomes = future.result()
+                failures = _write_back(store, outcomes, dry_run)
+                for record, _, results, old_results, status, message in outcomes:
+                    account_name = record["Account Name"]
+                    if account_name in failures:
+                        status, message = failures[account_name]
+                    old_total, new_total = _total(old_results), _total(results)
+                    change = round(new_total - old_total, 2) if old_total is not None and new_total is not None else ""
+                    report.writerow([account_name, old_total, new_total, change, status, message])
+                    counts[status] += 1
+                    if status not in ("conflict", "failed"):
+                        done.add(account_name)
+                report_file.flush()
+                if not dry_run:
+                    _save_checkpoint(checkpoint_path, rate_version, done)
+
+    if not dry_run and counts["failed"] == counts["conflict"] == 0 and os.path.exists(checkpoint_path):
+        # Finished cleanly; the next run starts from scratch
+        os.remove(checkpoint_path)
+    return counts
+
+
+def main(argv):
+    import storage
+
+    parser = argparse.ArgumentParser(description="Re-price every saved estimate and write the results back")
+    parser.add_argument("--rate-version", help="rate version to price with (default: current)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="estimates per chunk and per write-back batch")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_PATH)
+    parser.add_argument("--report", default=DEFAULT_REPORT_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="write the report but leave the store unchanged")
+    args = parser.parse_args(argv[1:])
+
+    store = storage.get_store()
+    counts = requote(
+        store,
+        rate_version=args.rate_version,
+        workers=args.workers,
+        chunk_rows=args.chunk_rows,
+        checkpoint_path=args.checkpoint,
+        report_path=args.report,
+        dry_run=args.dry_run,
+    )
+    print(
+        f"{'Checked' if args.dry_run else 'Re-quoted'} estimates in the {store.name}: "
+        + ", ".join(f"{count} {status}" for status, count in counts.items())
+        + f". Report: {args.report}"
+    )
+    return 1 if counts["failed"] or counts["conflict"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
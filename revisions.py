@@ -0,0 +1,100 @@
+import json
+
+from estimate_codec import decode_inputs, decode_results, encode_inputs, encode_results
+
+# Revision log of saved estimates. Every save appends one entry for the
+# account, shaped like the rows of the revisions sheet:
+#   {"Account Name": ..., "Version": <int>, "Timestamp": ..., "Kind": ..., "Inputs": ..., "Results": ...}
+#
+# A "snapshot" entry holds the whole estimate, encoded by estimate_codec. A
+# "delta" entry holds only what changed since the version before it:
+#   {"set": {field: new value, ...}, "unset": [removed field, ...]}
+# for the inputs and for the result lines. Version 1 and every SNAPSHOT_EVERY
+# versions after it are snapshots (as is any save that didn't know the
+# previous version's contents), so rebuilding a version applies at most
+# SNAPSHOT_EVERY - 1 deltas. If a version was logged twice (a save that was
+# retried after it had been logged), the later entry wins.
+
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+SNAPSHOT_EVERY = 10
+
+
+def _dumps(payload):
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def diff(old, new):
+    # What turns dict old into dict new
+    delta = {}
+    changed = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    if changed:
+        delta["set"] = changed
+    if removed:
+        delta["unset"] = removed
+    return delta
+
+
+def apply(base, delta):
+    result = dict(base)
+    for key in delta.get("unset", []):
+        result.pop(key, None)
+    result.update(delta.get("set", {}))
+    return result
+
+
+def _normalized(inputs, results):
+    # As they read back from the store, so deltas only hold real changes
+    return decode_inputs(encode_inputs(inputs)), decode_results(encode_results(results))
+
+
+def make_entry(account_name, version, timestamp, inputs, results, previous=None):
+    # previous: (inputs, results) of version - 1 as stored, or None if unknown
+    if previous is None or version % SNAPSHOT_EVERY == 1:
+        return {
+            "Account Name": account_name, "Version": version, "Timestamp": timestamp, "Kind": SNAPSHOT,
+            "Inputs": encode_inputs(inputs), "Results": encode_results(results),
+        }
+    inputs, results = _normalized(inputs, results)
+    return {
+        "Account Name": account_name, "Version": version, "Timestamp": timestamp, "Kind": DELTA,
+        "Inputs": _dumps(diff(previous[0], inputs)), "Results": _dumps(diff(previous[1], results)),
+    }
+
+
+def latest(entries):
+    # {version: entry}, keeping the last entry logged for each version
+    return {entry["Version"]: entry for entry in entries}
+
+
+def rebuild(entries, version):
+    # (timestamp, inputs, results) of one version from the account's entries,
+    # which must reach back to a snapshot at or before it. Raises ValueError
+    # if the chain is broken.
+    by_version = latest(entries)
+    start = version
+    while start in by_version and by_version[start]["Kind"] != SNAPSHOT:
+        start -= 1
+    if start not in by_version:
+        if start == version:
+            raise ValueError(f"Version {version} is not in the revision log")
+        raise ValueError(f"Version {version} can't be rebuilt: version {start} is missing from the revision log")
+    inputs = decode_inputs(by_version[start]["Inputs"])
+    results = decode_results(by_version[start]["Results"])
+    for number in range(start + 1, version + 1):
+        inputs = apply(inputs, json.loads(by_version[number]["Inputs"]))
+        results = apply(results, json.loads(by_version[number]["Results"]))
+    return (by_version[version]["Timestamp"],) + _normalized(inputs, results)
+
+
+def compare(old, new, changed_only=True):
+    # [(field, old value, new value)] for a side-by-side view; None where a
+    # field is missing on one side
+    keys = list(old) + [key for key in new if key not in old]
+    return [
+        (key, old.get(key), new.get(key))
+        for key in keys
+        if not changed_only or old.get(key) != new.get(key)
+    ]
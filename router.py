@@ -1,13 +1,53 @@
+import os
+import threading
 import streamlit as st
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 # Dictionary mapping page names to their file paths
 PAGES = {
-    "estimate": "pages/1_Estimate.py",
+    "estimate": "1_Estimate.py",
     "how_to_count_windows": "pages/2_How_to_Count_Windows.py",
     "view_estimates": "pages/2_View_Estimates.py",
+    "price_sweep": "pages/3_Price_Sweep.py",
+    "import_export": "pages/4_Import_Export.py",
+    "latency": "pages/5_Latency.py",
+    "analytics": "pages/6_Analytics.py",
     "top_grids_2_by_2": "pages/window_types/3_Top_Grids_2_by_2.py",
 }
 
+# Recompile a page when its file changes on disk (handy while developing);
+# set PAGE_RELOAD=0 to compile each page exactly once per process
+RELOAD_PAGES = os.environ.get("PAGE_RELOAD", "1") != "0"
+
+_compiled_pages = {}  # page path -> (mtime, code object)
+_compile_lock = threading.Lock()
+
+
+def validate_pages():
+    missing = [f"{name} ({path})" for name, path in PAGES.items() if not os.path.isfile(_page_file(path))]
+    if missing:
+        raise FileNotFoundError(f"Registered pages not found: {', '.join(missing)}")
+
+
+def _page_file(page_path):
+    return os.path.join(BASE_DIR, page_path)
+
+
+def _compiled_page(page_path):
+    with _compile_lock:
+        cached = _compiled_pages.get(page_path)
+        if cached is not None and not RELOAD_PAGES:
+            return cached[1]
+        mtime = os.path.getmtime(_page_file(page_path))
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(_page_file(page_path), "r") as f:
+            code = compile(f.read(), _page_file(page_path), "exec")
+        _compiled_pages[page_path] = (mtime, code)
+        return code
+
+
 def navigate_to(page_name):
     if page_name in PAGES:
         st.session_state.current_page = page_name
@@ -20,10 +60,12 @@ def get_current_page():
 def render_page():
     current_page = get_current_page()
     if current_page in PAGES:
-        # Dynamically import and run the page
+        # Run the cached page code in its own namespace so page variables
+        # don't leak into the router or into other pages
         page_path = PAGES[current_page]
-        with open(page_path, "r") as f:
-            code = f.read()
-        exec(code, globals())
+        exec(_compiled_page(page_path), {"__name__": "__main__", "__file__": _page_file(page_path)})
     else:
         st.error(f"Cannot render page {current_page}")
+
+
+validate_pages()
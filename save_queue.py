@@ -0,0 +1,326 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pricing
+import storage
+from config import get_secret
+from estimate_codec import StoredEstimate
+
+# Write-behind queue for saved estimates. "Save Estimate" writes the estimate
+# to a local SQLite file and returns; a background thread pushes queued saves
+# to the estimate store in batches and retries failures (Sheets quota errors,
+# network drops) with exponential backoff. Saving the same account again
+# before it syncs replaces the queued copy, so only the latest one is sent.
+# Anything still queued when the process stops is sent on the next start.
+#
+# A save can expect a version of the stored estimate (see storage.py). When
+# someone else saved in between, the queue reads their estimate and, if it
+# knows the inputs the save started from (base_inputs), merges field by
+# field: their changes plus ours, re-priced and sent again. Fields both sides
+# changed, or a save with nothing to merge against, leave the save in the
+# "conflict" status for the estimator to resolve.
+
+DEFAULT_QUEUE_PATH = os.path.join("estimates", "save_queue.db")
+
+BATCH_SIZE = 20
+RETRY_BASE_SECONDS = 2
+RETRY_MAX_SECONDS = 300
+IDLE_POLL_SECONDS = 5
+
+# Merges tried for one save before it is left as a conflict
+MAX_MERGE_ATTEMPTS = 5
+
+
+def merge_inputs(base, mine, theirs):
+    # Three-way merge of inputs dicts: theirs plus every field mine changed
+    # from base. Returns (merged, clashes); clashes are the fields both sides
+    # changed to different values, which take mine in merged.
+    merged = dict(theirs)
+    clashes = []
+    for key in sorted(set(base) | set(mine) | set(theirs)):
+        if mine.get(key) == base.get(key):
+            continue
+        if theirs.get(key) != base.get(key) and theirs.get(key) != mine.get(key):
+            clashes.append(key)
+        if key in mine:
+            merged[key] = mine[key]
+        else:
+            merged.pop(key, None)
+    return merged, clashes
+
+
+class SaveQueue:
+    def __init__(self, store, path=DEFAULT_QUEUE_PATH, batch_size=BATCH_SIZE):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.store = store
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS save_queue (
+                    account_name TEXT PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    inputs TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+                """
+            )
+            # Columns added with versioned saves
+            columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(save_queue)")]
+            for column, definition in [
+                ("expected_version", "INTEGER"),
+                ("base_inputs", "TEXT"),
+                ("version", "INTEGER"),
+                ("merged", "TEXT"),
+            ]:
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE save_queue ADD COLUMN {column} {definition}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS save_queue_due ON save_queue (status, next_attempt_at)")
+        self._thread = threading.Thread(target=self._run, name="save-queue", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, account_name, inputs, results, expected_version=None, base_inputs=None):
+        # expected_version: the stored version this save replaces (0 for a new
+        # account, None to replace whatever is there); base_inputs: the
+        # inputs that version had, used to merge with someone else's save
+        timestamp = storage.now_timestamp()
+        base = json.dumps(base_inputs) if base_inputs is not None else None
+        with self._lock, self._conn:
+            seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM save_queue").fetchone()[0]
+            self._conn.execute(
+                """
+                INSERT INTO save_queue (
+                    account_name, timestamp, inputs, results, seq, status, attempts, next_attempt_at, last_error,
+                    expected_version, base_inputs, version, merged
+                )
+                VALUES (?, ?, ?, ?, ?, 'queued', 0, 0, NULL, ?, ?, NULL, NULL)
+                ON CONFLICT (account_name) DO UPDATE SET
+                    timestamp = excluded.timestamp, inputs = excluded.inputs, results = excluded.results,
+                    seq = excluded.seq, status = 'queued', attempts = 0, next_attempt_at = 0, last_error = NULL,
+                    expected_version = excluded.expected_version, base_inputs = excluded.base_inputs,
+                    version = NULL, merged = NULL
+                """,
+                (account_name, timestamp, json.dumps(inputs), json.dumps(results), seq, expected_version, base),
+            )
+        self._wake.set()
+        return timestamp
+
+    def synced(self, account_name):
+        # {"timestamp", "version", "inputs", "merged"} of the account's last
+        # synced save, or None. inputs are what was stored, merged the fields
+        # taken from someone else's save.
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT timestamp, version, inputs, merged FROM save_queue WHERE account_name = ? AND status = 'synced'",
+                (account_name,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "timestamp": row["timestamp"],
+            "version": row["version"],
+            "inputs": json.loads(row["inputs"]),
+            "merged": json.loads(row["merged"]) if row["merged"] else [],
+        }
+
+    def status(self, account_name):
+        # None, "queued", "retrying" (with the last error), "conflict" (with
+        # the reason) or "synced"
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, last_error FROM save_queue WHERE account_name = ?", (account_name,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        if row["status"] == "queued" and row["attempts"] and row["last_error"]:
+            return "retrying", row["last_error"]
+        if row["status"] == "conflict":
+            return "conflict", row["last_error"]
+        return row["status"], None
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM save_queue WHERE status = 'queued'").fetchone()[0]
+
+    def flush(self):
+        # Sends every queued save that is due; returns how many were synced
+        synced = 0
+        while True:
+            batch = self._due_batch()
+            if not batch:
+                return synced
+            synced += self._send(batch)
+            if len(batch) < self.batch_size:
+                return synced
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(timeout=IDLE_POLL_SECONDS)
+
+    def _due_batch(self):
+        with self._lock:
+            return self._conn.execute(
+                """
+                SELECT * FROM save_queue WHERE status = 'queued' AND next_attempt_at <= ?
+                ORDER BY seq LIMIT ?
+                """,
+                (time.time(), self.batch_size),
+            ).fetchall()
+
+    def _send(self, batch):
+        estimates = [
+            (row["account_name"], json.loads(row["inputs"]), json.loads(row["results"]), row["timestamp"], row["expected_version"])
+            for row in batch
+        ]
+        try:
+            report = self.store.save_many(estimates)
+        except Exception as e:
+            report = [{"account_name": row["account_name"], "ok": False, "error": str(e)} for row in batch]
+        synced = 0
+        for row, outcome in zip(batch, report):
+            if outcome["ok"]:
+                self._mark_synced(row, outcome.get("version"))
+                synced += 1
+            elif outcome.get("conflict"):
+                self._resolve_conflict(row, outcome["error"])
+            else:
+                self._mark_failed(row, outcome["error"])
+        return synced
+
+    def _resolve_conflict(self, row, error):
+        # Someone else saved this account since the version we expected
+        if row["attempts"] >= MAX_MERGE_ATTEMPTS:
+            self._mark_conflict(row, error)
+            return
+        try:
+            record = self.store.get(row["account_name"])
+            theirs = StoredEstimate(record).inputs if record is not None else None
+        except Exception as e:
+            self._mark_failed(row, e)
+            return
+        inputs = json.loads(row["inputs"])
+        if row["expected_version"] is None:
+            # An unconditional save that raced another one: just send it again
+            self._retry(row, inputs, json.loads(row["results"]), None, row["base_inputs"], [])
+        elif theirs == inputs:
+            # They saved the same estimate
+            self._mark_synced(row, StoredEstimate(record).version)
+        elif theirs is None or row["base_inputs"] is None:
+            self._mark_conflict(row, error)
+        else:
+            base = json.loads(row["base_inputs"])
+            merged, clashes = merge_inputs(base, inputs, theirs)
+            if clashes:
+                self._mark_conflict(row, f"{error}; both changed {', '.join(key.replace('_', ' ') for key in clashes)}")
+                return
+            try:
+                results = pricing.price_estimate(merged)
+            except ValueError as e:
+                self._mark_conflict(row, f"{error}; the merged estimate can't be priced: {e}")
+                return
+            taken = sorted(key for key in theirs if theirs.get(key) != base.get(key))
+            self._retry(row, merged, results, StoredEstimate(record).version, json.dumps(theirs), taken)
+
+    def _retry(self, row, inputs, results, expected_version, base_inputs, merged):
+        # Sends the (merged) estimate again right away, unless it was saved
+        # again while we were sending it
+        previous = json.loads(row["merged"]) if row["merged"] else []
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                UPDATE save_queue SET inputs = ?, results = ?, expected_version = ?, base_inputs = ?, merged = ?,
+                    attempts = attempts + 1, next_attempt_at = 0, last_error = NULL
+                WHERE account_name = ? AND seq = ?
+                """,
+                (
+                    json.dumps(inputs), json.dumps(results), expected_version, base_inputs,
+                    json.dumps(sorted(set(previous) | set(merged))), row["account_name"], row["seq"],
+                ),
+            )
+        self._wake.set()
+
+    def _mark_conflict(self, row, error):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE save_queue SET status = 'conflict', last_error = ? WHERE account_name = ? AND seq = ?",
+                (str(error), row["account_name"], row["seq"]),
+            )
+
+    def _mark_synced(self, row, version=None):
+        # Only if it was not saved again while we were sending it. A save
+        # queued meanwhile that expects the same version as this one was made
+        # before this one landed (e.g. the estimator saved twice quickly): it
+        # now replaces this one instead of conflicting with it.
+        with self._lock, self._conn:
+            marked = self._conn.execute(
+                "UPDATE save_queue SET status = 'synced', last_error = NULL, version = ? WHERE account_name = ? AND seq = ?",
+                (version, row["account_name"], row["seq"]),
+            ).rowcount
+            if not marked and version is not None and row["expected_version"] is not None:
+                self._conn.execute(
+                    """
+                    UPDATE save_queue SET expected_version = ?, base_inputs = ?
+                    WHERE account_name = ? AND status = 'queued' AND expected_version = ?
+                    """,
+                    (version, row["inputs"], row["account_name"], row["expected_version"]),
+                )
+
+    def _mark_failed(self, row, error):
+        attempts = row["attempts"] + 1
+        delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                UPDATE save_queue SET attempts = ?, next_attempt_at = ?, last_error = ?
+                WHERE account_name = ? AND seq = ?
+                """,
+                (attempts, time.time() + delay, str(error), row["account_name"], row["seq"]),
+            )
+
+    def _seconds_until_due(self):
+        with self._lock:
+            next_attempt_at = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM save_queue WHERE status = 'queued'"
+            ).fetchone()[0]
+        if next_attempt_at is None:
+            return IDLE_POLL_SECONDS
+        return min(max(next_attempt_at - time.time(), 0.1), IDLE_POLL_SECONDS)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self._seconds_until_due())
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Never let the worker die; failed rows are retried on the next pass
+                pass
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_save_queue():
+    # Process-wide queue in front of storage.get_store()
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = SaveQueue(storage.get_store(), get_secret("SAVE_QUEUE_PATH", DEFAULT_QUEUE_PATH))
+        return _queue
@@ -0,0 +1,511 @@
+import json
+import re
+import threading
+
+import gspread
+from google.auth.transport.requests import AuthorizedSession
+from gspread.utils import convert_credentials
+from oauth2client.service_account import ServiceAccountCredentials
+from requests.adapters import HTTPAdapter
+
+import revisions
+import timing
+from config import get_secret
+from storage import ConflictError
+
+# Process-wide Google Sheets access shared by every page and worker. The
+# client is authorized once and its HTTP session is kept for keep-alive
+# connections; AuthorizedSession refreshes the OAuth token by itself when it
+# expires, so repeat operations skip the handshake and the metadata fetch.
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+HEADERS = ["Account Name", "Timestamp", "Inputs", "Results", "Version"]
+LAST_COLUMN = "E"
+
+# Tab holding the revision log (see revisions.py)
+REVISIONS_TITLE = "Revisions"
+REVISION_HEADERS = ["Account Name", "Version", "Timestamp", "Kind", "Inputs", "Results"]
+REVISION_LAST_COLUMN = "F"
+
+HTTP_POOL_SIZE = 10
+
+_lock = threading.RLock()
+_client = None
+_worksheets = {}
+_revision_worksheets = {}
+# (spreadsheet id, account name) of saves that landed but could not be
+# logged (in this process); the account's next entry is a snapshot rather
+# than a delta on a version the log doesn't have
+_unlogged = set()
+_row_indexes = {}
+_headers_checked = set()
+
+
+@timing.timed("sheets.authorize")
+def _new_client():
+    creds_dict = get_secret("GOOGLE_CREDENTIALS")
+    if isinstance(creds_dict, str):
+        creds_dict = json.loads(creds_dict)
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(dict(creds_dict), SCOPE)
+    session = AuthorizedSession(convert_credentials(creds))
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    return gspread.authorize(None, session=session)
+
+
+def get_google_sheets_client():
+    global _client
+    with _lock:
+        if _client is None:
+            _client = _new_client()
+        return _client
+
+
+def get_worksheet(spreadsheet_id=None):
+    if spreadsheet_id is None:
+        spreadsheet_id = get_secret("SPREADSHEET_ID")
+    with _lock:
+        if spreadsheet_id not in _worksheets:
+            client = get_google_sheets_client()
+            with timing.span("sheets.open_worksheet"):
+                _worksheets[spreadsheet_id] = client.open_by_key(spreadsheet_id).sheet1
+        return _worksheets[spreadsheet_id]
+
+
+def reset_client():
+    # Drop the cached client and worksheets; the next call authorizes again
+    global _client
+    with _lock:
+        _client = None
+        _worksheets.clear()
+        _revision_worksheets.clear()
+        _row_indexes.clear()
+        _headers_checked.clear()
+
+
+def use_worksheet(spreadsheet_id, worksheet, revision_worksheet=None):
+    # Serve worksheet for spreadsheet_id instead of opening the real
+    # spreadsheet, e.g. a fake_sheets.FakeWorksheet in benchmarks. Saves are
+    # logged to revision_worksheet, or not at all when it is None.
+    with _lock:
+        _worksheets[spreadsheet_id] = worksheet
+        _revision_worksheets[spreadsheet_id] = revision_worksheet
+        _unlogged.difference_update({key for key in _unlogged if key[0] == spreadsheet_id})
+        _row_indexes.pop(spreadsheet_id, None)
+        _headers_checked.discard(spreadsheet_id)
+
+
+def get_revision_worksheet(spreadsheet_id=None):
+    # The Revisions tab, or None if use_worksheet turned the log off. It is
+    # added on first use with a snapshot of every saved estimate, so their
+    # next saves have a version to build on.
+    if spreadsheet_id is None:
+        spreadsheet_id = get_secret("SPREADSHEET_ID")
+    with _lock:
+        if spreadsheet_id not in _revision_worksheets:
+            estimates = get_worksheet(spreadsheet_id)
+            try:
+                with timing.span("sheets.open_worksheet"):
+                    sheet = estimates.spreadsheet.worksheet(REVISIONS_TITLE)
+            except gspread.exceptions.WorksheetNotFound:
+                with timing.span("sheets.add_worksheet"):
+                    sheet = estimates.spreadsheet.add_worksheet(REVISIONS_TITLE, rows=1000, cols=len(REVISION_HEADERS))
+                with timing.span("sheets.update"):
+                    sheet.update(range_name=f"A1:{REVISION_LAST_COLUMN}1", values=[REVISION_HEADERS])
+                _snapshot_all(sheet, spreadsheet_id)
+            _revision_worksheets[spreadsheet_id] = sheet
+        return _revision_worksheets[spreadsheet_id]
+
+
+def with_worksheet(operation, spreadsheet_id=None, open_worksheet=get_worksheet):
+    # Runs operation(worksheet), re-authorizing once if the cached credentials
+    # were revoked or the token could not be refreshed
+    try:
+        return operation(open_worksheet(spreadsheet_id))
+    except gspread.exceptions.APIError as e:
+        if e.code != 401:
+            raise
+        reset_client()
+        return operation(open_worksheet(spreadsheet_id))
+
+
+# Account name -> sheet row, built once per spreadsheet from column A and kept
+# up to date as rows are written. The account name is the key: a row number
+# is only a hint, and the row is always read back and its name checked before
+# it is used, because rows can move underneath us (someone sorting the sheet
+# by hand). A stale or missing hint re-reads column A.
+#
+# Each row also carries a Version (column E) that goes up by one on every
+# write. A save can name the version it expects to replace (0 for "this
+# account must be new"); if the sheet holds another version, it raises
+# storage.ConflictError instead of writing. Within this process the check
+# and the write happen under _lock, so the guarantee is real. Sheets has no
+# conditional writes, so across processes it is only a best-effort check:
+# conditional saves read the row again after writing it and raise if
+# another save's row is there. That catches a save that lands between our
+# write and the read-back, but not one that read the same version and wrote
+# after our read-back. In that case the later write silently replaces ours.
+# New accounts are checked for a copy appended at the same time by another
+# process; the later copy is cleared and its save conflicts. Rows written
+# before versions existed count as version 1.
+
+def _row_range(row):
+    return f"A{row}:{LAST_COLUMN}{row}"
+
+
+def _padded(values):
+    values = [str(value) for value in values]
+    return values + [""] * (len(HEADERS) - len(values))
+
+
+def parse_version(cell):
+    # Version cell -> int; blank (rows from before versions) counts as 1
+    try:
+        return int(cell) if cell not in ("", None) else 1
+    except ValueError:
+        return 1
+
+
+def row_version(values):
+    # Version of a row's values; 0 when there is no row
+    if not values:
+        return 0
+    return parse_version(values[4] if len(values) > 4 else "")
+
+
+def _read_row(sheet, row):
+    with timing.span("sheets.get"):
+        values = sheet.get(_row_range(row))
+    return _padded(values[0] if values else [])
+
+
+def _build_row_index(sheet):
+    with timing.span("sheets.col_values"):
+        names = sheet.col_values(1)
+    index = {}
+    for row, name in enumerate(names[1:], start=2):
+        if name:
+            index.setdefault(name, row)
+    return index
+
+
+def _ensure_version_header(sheet, spreadsheet_id):
+    # Sheets made before versions existed get the Version header added
+    if spreadsheet_id in _headers_checked:
+        return
+    with timing.span("sheets.row_values"):
+        header = sheet.row_values(1)
+    if header == HEADERS[:-1]:
+        with timing.span("sheets.update"):
+            sheet.update(range_name=f"{LAST_COLUMN}1", values=[[HEADERS[-1]]])
+    _headers_checked.add(spreadsheet_id)
+
+
+def invalidate_row_index(spreadsheet_id=None):
+    with _lock:
+        if spreadsheet_id is None:
+            _row_indexes.clear()
+        else:
+            _row_indexes.pop(spreadsheet_id, None)
+
+
+def locate_account(sheet, spreadsheet_id, account_name):
+    # (row, padded row values) of the account, or (None, None)
+    with _lock:
+        index = _row_indexes.get(spreadsheet_id)
+        row = index.get(account_name) if index is not None else None
+        if row is not None:
+            values = _read_row(sheet, row)
+            if values[0] == account_name:
+                return row, values
+        # Stale or missing entry: refresh from column A and look again
+        index = _row_indexes[spreadsheet_id] = _build_row_index(sheet)
+        row = index.get(account_name)
+        if row is None:
+            return None, None
+        return row, _read_row(sheet, row)
+
+
+def find_account_row(sheet, spreadsheet_id, account_name):
+    return locate_account(sheet, spreadsheet_id, account_name)[0]
+
+
+def _appended_row(response):
+    # "Sheet1!A12:E12" -> 12
+    updated_range = response["updates"]["updatedRange"]
+    return int(re.search(r"(\d+)$", updated_range.split(":")[0]).group(1))
+
+
+def _first_copies(sheet, account_names):
+    # First row of each account, read fresh from column A
+    index = _build_row_index(sheet)
+    return {name: index.get(name) for name in account_names}
+
+
+def _clear_rows(sheet, rows):
+    with timing.span("sheets.batch_clear"):
+        sheet.batch_clear([_row_range(row) for row in rows])
+
+
+def upsert_row(values, spreadsheet_id=None, expected_version=None, revision=None):
+    # Writes one [Account Name, Timestamp, Inputs, Results] row, updating the
+    # account's existing row when there is one. Returns (row, new version).
+    # revision(previous row values or None, new version) gives the revision
+    # log row for the save (see log_revisions).
+    if spreadsheet_id is None:
+        spreadsheet_id = get_secret("SPREADSHEET_ID")
+    account_name = values[0]
+
+    def upsert(sheet):
+        with _lock:
+            _ensure_version_header(sheet, spreadsheet_id)
+            row, current = locate_account(sheet, spreadsheet_id, account_name)
+            current_version = row_version(current)
+            if expected_version is not None and expected_version != current_version:
+                raise ConflictError(account_name, expected_version, current_version)
+            written = _padded(list(values)[:len(HEADERS) - 1] + [current_version + 1])
+            if revision is not None:
+                # Opened first: adding the tab snapshots the version this save replaces
+                get_revision_worksheet(spreadsheet_id)
+            if row:
+                with timing.span("sheets.update"):
+                    sheet.update(range_name=_row_range(row), values=[written])
+                if expected_version is not None:
+                    after = _read_row(sheet, row)
+                    if after != written:
+                        raise ConflictError(account_name, expected_version, row_version(after))
+            else:
+                with timing.span("sheets.append_row"):
+                    response = sheet.append_row(written)
+                row = _appended_row(response)
+                first_row = _first_copies(sheet, [account_name])[account_name]
+                if first_row != row:
+                    # Another save added this account first; keep its row
+                    _clear_rows(sheet, [row])
+                    _row_indexes[spreadsheet_id][account_name] = first_row
+                    raise ConflictError(account_name, expected_version, row_version(_read_row(sheet, first_row)))
+            _row_indexes[spreadsheet_id][account_name] = row
+            if revision is not None:
+                previous = _logged_previous(spreadsheet_id, account_name, current)
+                _log_saved([account_name], [revision(previous, current_version + 1)], spreadsheet_id)
+            return row, current_version + 1
+
+    return with_worksheet(upsert, spreadsheet_id)
+
+
+def _key_columns(sheet):
+    # {account name: (row, version)} from one read of columns A and E
+    with timing.span("sheets.batch_get"):
+        names, versions = sheet.batch_get(["A:A", f"{LAST_COLUMN}:{LAST_COLUMN}"])
+    rows = {}
+    for row, cells in enumerate(names[1:], start=2):
+        if cells and cells[0] and cells[0] not in rows:
+            version_cells = versions[row - 1] if row - 1 < len(versions) else []
+            rows[cells[0]] = (row, parse_version(version_cells[0] if version_cells else ""))
+    return rows
+
+
+def upsert_rows(rows, spreadsheet_id=None, expected_versions=None, revision=None):
+    # Bulk version of upsert_row: existing accounts go out in one batch_update
+    # and new ones in one append_rows call, instead of a request per row.
+    # expected_versions, if given, holds the version each row expects to
+    # replace (None for an unconditional write). Returns one {"account_name",
+    # "ok", "row", "version", "error", "conflict"} dict per input row.
+    # revision(position, previous row values or None, new version) gives the
+    # revision log row for rows[position]; they are logged in one call.
+    if spreadsheet_id is None:
+        spreadsheet_id = get_secret("SPREADSHEET_ID")
+    rows = [list(values)[:len(HEADERS) - 1] for values in rows]
+    expected_versions = expected_versions or [None] * len(rows)
+
+    def upsert(sheet):
+        with _lock:
+            _ensure_version_header(sheet, spreadsheet_id)
+            # One read of columns A and E covers every lookup in the batch
+            current = _key_columns(sheet)
+            index = _row_indexes[spreadsheet_id] = {name: row for name, (row, _) in current.items()}
+            # The last copy of an account in the batch wins
+            latest = {values[0]: position for position, values in enumerate(rows)}
+            outcome = {}
+            written = {}
+            for name, position in latest.items():
+                current_version = current[name][1] if name in current else 0
+                expected = expected_versions[position]
+                if expected is not None and expected != current_version:
+                    outcome[position] = (None, None, str(ConflictError(name, expected, current_version)), True)
+                else:
+                    written[position] = _padded(rows[position] + [current_version + 1])
+            updates = [(current[rows[position][0]][0], position) for position in written if rows[position][0] in current]
+            appends = [position for position in written if rows[position][0] not in current]
+
+            if revision is not None and written:
+                # Opened first: adding the tab snapshots the versions these saves replace
+                get_revision_worksheet(spreadsheet_id)
+            previous = {}
+            if revision is not None and updates:
+                with timing.span("sheets.batch_get"):
+                    before = sheet.batch_get([_row_range(row) for row, _ in updates])
+                for (row, position), values in zip(updates, before):
+                    values = _padded(values[0] if values else [])
+                    # Only a delta base if it is the version checked above
+                    if values[0] == rows[position][0] and row_version(values) == row_version(written[position]) - 1:
+                        previous[position] = values
+
+            if updates:
+                try:
+                    with timing.span("sheets.batch_update"):
+                        sheet.batch_update([{"range": _row_range(row), "values": [written[position]]} for row, position in updates])
+                except Exception as e:
+                    outcome.update({position: (None, None, str(e), False) for _, position in updates})
+                else:
+                    outcome.update({position: (row, row_version(written[position]), None, False) for row, position in updates})
+                    # Conditional writes: check no other save replaced ours in between
+                    checked = [(row, position) for row, position in updates if expected_versions[position] is not None]
+                    if checked:
+                        with timing.span("sheets.batch_get"):
+                            after = sheet.batch_get([_row_range(row) for row, _ in checked])
+                        for (row, position), values in zip(checked, after):
+                            values = _padded(values[0] if values else [])
+                            if values != written[position]:
+                                message = str(ConflictError(rows[position][0], expected_versions[position], row_version(values)))
+                                outcome[position] = (None, None, message, True)
+
+            if appends:
+                try:
+                    with timing.span("sheets.append_rows"):
+                        response = sheet.append_rows([written[position] for position in appends])
+                except Exception as e:
+                    outcome.update({position: (None, None, str(e), False) for position in appends})
+                else:
+                    first_row = _appended_row(response)
+                    appended = {rows[position][0]: (first_row + offset, position) for offset, position in enumerate(appends)}
+                    first_copies = _first_copies(sheet, appended)
+                    duplicates = []
+                    for name, (row, position) in appended.items():
+                        if first_copies[name] == row:
+                            outcome[position] = (row, 1, None, False)
+                            index[name] = row
+                        else:
+                            # Another save added this account first; keep its row
+                            duplicates.append(row)
+                            message = str(ConflictError(name, expected_versions[position], 1))
+                            outcome[position] = (None, None, message, True)
+                            index[name] = first_copies[name]
+                    if duplicates:
+                        _clear_rows(sheet, duplicates)
+
+            # Only the writes that held are logged
+            saved = [position for position in written if outcome[position][2] is None]
+            if revision is not None and saved:
+                _log_saved(
+                    [rows[position][0] for position in saved],
+                    [
+                        revision(
+                            position,
+                            _logged_previous(spreadsheet_id, rows[position][0], previous.get(position)),
+                            row_version(written[position]),
+                        )
+                        for position in saved
+                    ],
+                    spreadsheet_id,
+                )
+
+            report = []
+            for position, values in enumerate(rows):
+                # Earlier duplicates share the outcome of the copy that was written
+                row, version, error, conflict = outcome[latest[values[0]]]
+                report.append({
+                    "account_name": values[0], "ok": error is None, "row": row, "version": version,
+                    "error": error, "conflict": conflict,
+                })
+            return report
+
+    return with_worksheet(upsert, spreadsheet_id)
+
+
+def _logged_previous(spreadsheet_id, account_name, values):
+    # The row a save's log entry builds on: None (a snapshot) when the
+    # account's last save never made it into the log
+    return None if (spreadsheet_id, account_name) in _unlogged else values
+
+
+def _log_saved(account_names, rows, spreadsheet_id):
+    # Logs the rows of saves that have landed. If the log can't be written
+    # the saves still stand, and each account's next entry is a snapshot.
+    try:
+        log_revisions(rows, spreadsheet_id)
+    except Exception:
+        _unlogged.update((spreadsheet_id, account_name) for account_name in account_names)
+    else:
+        _unlogged.difference_update((spreadsheet_id, account_name) for account_name in account_names)
+
+
+def log_revisions(rows, spreadsheet_id=None):
+    # Appends [Account Name, Version, Timestamp, Kind, Inputs, Results] rows
+    # to the revision log. Saves log once their write has been read back, so
+    # a save whose read-back found another save's row is never logged; a
+    # retried save that logs a version twice leaves the later entry in force.
+    def append(sheet):
+        if sheet is None:
+            return
+        with timing.span("sheets.append_rows"):
+            sheet.append_rows([[str(value) for value in row] for row in rows])
+
+    return with_worksheet(append, spreadsheet_id, get_revision_worksheet)
+
+
+def _snapshot_all(sheet, spreadsheet_id, chunk_rows=1000):
+    # Logs every saved estimate as a snapshot of its current version
+    chunk = []
+    for values in iter_rows(chunk_rows, spreadsheet_id):
+        if values and values[0]:
+            values = _padded(values)
+            chunk.append([values[0], row_version(values), values[1], revisions.SNAPSHOT, values[2], values[3]])
+        if len(chunk) >= chunk_rows:
+            with timing.span("sheets.append_rows"):
+                sheet.append_rows(chunk)
+            chunk = []
+    if chunk:
+        with timing.span("sheets.append_rows"):
+            sheet.append_rows(chunk)
+
+
+def revision_rows(account_name, spreadsheet_id=None):
+    # The account's revision log rows, in the order they were logged, from
+    # one read of column A and one batch_get of its rows
+    def read(sheet):
+        if sheet is None:
+            return []
+        with timing.span("sheets.col_values"):
+            names = sheet.col_values(1)
+        rows = [row for row, name in enumerate(names[1:], start=2) if name == account_name]
+        if not rows:
+            return []
+        with timing.span("sheets.batch_get"):
+            ranges = sheet.batch_get([f"A{row}:{REVISION_LAST_COLUMN}{row}" for row in rows])
+        return [
+            (values[0] if values else []) + [""] * (len(REVISION_HEADERS) - len(values[0] if values else []))
+            for values in ranges
+        ]
+
+    return with_worksheet(read, spreadsheet_id, get_revision_worksheet)
+
+
+def iter_rows(chunk_rows=1000, spreadsheet_id=None):
+    # Data rows below the header, read chunk_rows at a time so a large sheet is
+    # never held in memory at once. Short rows come back without their
+    # trailing empty cells, and blank rows (cleared duplicates) as []. A
+    # chunk comes back short when it ends in blank rows, so only a short
+    # chunk that reaches the sheet's last row ends the read.
+    start = 2
+    while True:
+        end = start + chunk_rows - 1
+        with timing.span("sheets.get"):
+            values, row_count = with_worksheet(
+                lambda sheet: (sheet.get(f"A{start}:{LAST_COLUMN}{end}"), sheet.row_count), spreadsheet_id
+            )
+        yield from values
+        if len(values) < chunk_rows and end >= row_count:
+            return
+        start = end + 1
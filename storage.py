@@ -0,0 +1,552 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import analytics
+import revisions
+import timing
+from config import get_secret
+from estimate_codec import decode_inputs, decode_results, encode_inputs, encode_results
+from estimate_index import EstimateIndex
+
+# Where saved estimates live. Every backend hands back records shaped like the
+# rows of the estimates sheet:
+#   {"Account Name": ..., "Timestamp": ..., "Inputs": <json>, "Results": <json>, "Version": <int>}
+# with Inputs and Results written by estimate_codec (read them back with
+# estimate_codec.StoredEstimate or decode_inputs/decode_results).
+# Pick the backend with the ESTIMATE_STORE secret ("sheets" or "sqlite").
+#
+# Records are keyed by account name, and Version goes up by one on every
+# save. Passing expected_version makes a save conditional: it only replaces
+# that version (0: only if the account is new) and raises ConflictError
+# otherwise. Without it the save replaces whatever is there. The SQLite store
+# checks inside a transaction; on Sheets the check only holds between saves
+# made in one process (see sheets.py).
+#
+# Every save is also appended to the account's revision log (revisions.py),
+# so any earlier version can be rebuilt with get_revision().
+
+DEFAULT_DB_PATH = os.path.join("estimates", "estimates.db")
+
+
+class ConflictError(Exception):
+    # A conditional save found another version of the estimate than expected
+
+    def __init__(self, account_name, expected_version, current_version):
+        self.account_name = account_name
+        self.expected_version = expected_version
+        self.current_version = current_version
+        if expected_version == 0:
+            message = f"An estimate for {account_name} was already saved (version {current_version})"
+        elif current_version == 0:
+            message = f"There is no saved estimate for {account_name} to replace"
+        else:
+            message = f"The estimate for {account_name} was changed by someone else (now version {current_version})"
+        super().__init__(message)
+
+
+def make_record(account_name, timestamp, inputs_str, results_str, version=1):
+    return {"Account Name": account_name, "Timestamp": timestamp, "Inputs": inputs_str, "Results": results_str, "Version": version}
+
+
+def now_timestamp():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _estimate_fields(estimate):
+    # (account_name, inputs, results[, timestamp[, expected_version]]) -> always five items
+    return tuple(estimate) + (None,) * (5 - len(estimate))
+
+
+def _outcome(account_name, version=None, error=None, conflict=False):
+    return {"account_name": account_name, "ok": error is None, "version": version, "error": error, "conflict": conflict}
+
+
+def _previous(inputs_str, results_str):
+    # A stored version's contents, as the base of the next revision's delta
+    return decode_inputs(inputs_str), decode_results(results_str)
+
+
+class EstimateStore(ABC):
+    name = "estimate store"
+
+    @abstractmethod
+    def save(self, account_name, inputs, results, timestamp=None, expected_version=None):
+        # Returns the saved record; raises ConflictError (see above)
+        ...
+
+    def save_many(self, estimates):
+        # estimates: iterable of (account_name, inputs, results[, timestamp[,
+        # expected_version]]). Returns one {"account_name", "ok", "version",
+        # "error", "conflict"} dict per estimate.
+        report = []
+        for estimate in estimates:
+            try:
+                record = self.save(*estimate)
+            except ConflictError as e:
+                report.append(_outcome(estimate[0], error=str(e), conflict=True))
+            except Exception as e:
+                report.append(_outcome(estimate[0], error=str(e)))
+            else:
+                report.append(_outcome(estimate[0], version=record["Version"]))
+        return report
+
+    @abstractmethod
+    def get(self, account_name):
+        # The account's record, or None if it was never saved
+        ...
+
+    @abstractmethod
+    def list_accounts(self):
+        # Every saved account name
+        ...
+
+    @abstractmethod
+    def list_recent(self, limit=20):
+        # The most recently saved records, newest first (all of them if limit is None)
+        ...
+
+    def iter_records(self, chunk_size=1000):
+        # Every saved record, in no particular order. Backends override this
+        # to read chunk_size records at a time instead of loading them all.
+        yield from self.list_recent(limit=None)
+
+    @abstractmethod
+    def revisions(self, account_name):
+        # The account's revision log entries, oldest first (see revisions.py)
+        ...
+
+    def get_revision(self, account_name, version):
+        # A record like get() returns, for an earlier version of the estimate.
+        # Raises ValueError if the version can't be rebuilt from the log.
+        timestamp, inputs, results = revisions.rebuild(self.revisions(account_name), version)
+        return make_record(account_name, timestamp, encode_inputs(inputs), encode_results(results), version)
+
+
+class SheetsEstimateStore(EstimateStore):
+    name = "Google Sheets"
+
+    def __init__(self, spreadsheet_id=None):
+        import sheets
+        self.sheets = sheets
+        self.spreadsheet_id = spreadsheet_id or get_secret("SPREADSHEET_ID")
+
+    def _record(self, values):
+        values = list(values) + [""] * (len(self.sheets.HEADERS) - len(values))
+        return make_record(*values[:4], self.sheets.row_version(values))
+
+    def _revision_row(self, account_name, timestamp, inputs, results, previous, version):
+        # Revision log row for a save; previous is the row it replaces, if known
+        if previous is not None:
+            previous = _previous(previous[2], previous[3])
+        entry = revisions.make_entry(account_name, version, timestamp, inputs, results, previous)
+        return [entry[header] for header in self.sheets.REVISION_HEADERS]
+
+    def save(self, account_name, inputs, results, timestamp=None, expected_version=None):
+        values = [account_name, timestamp or now_timestamp(), encode_inputs(inputs), encode_results(results)]
+        _, version = self.sheets.upsert_row(
+            values, self.spreadsheet_id, expected_version,
+            lambda previous, version: self._revision_row(account_name, values[1], inputs, results, previous, version),
+        )
+        return make_record(*values, version)
+
+    def save_many(self, estimates):
+        estimates = [_estimate_fields(estimate) for estimate in estimates]
+        rows = [
+            [account_name, timestamp or now_timestamp(), encode_inputs(inputs), encode_results(results)]
+            for account_name, inputs, results, timestamp, _ in estimates
+        ]
+        if not rows:
+            return []
+
+        def revision(position, previous, version):
+            account_name, inputs, results, _, _ = estimates[position]
+            return self._revision_row(account_name, rows[position][1], inputs, results, previous, version)
+
+        report = self.sheets.upsert_rows(rows, self.spreadsheet_id, [estimate[4] for estimate in estimates], revision)
+        return [
+            _outcome(outcome["account_name"], outcome["version"], outcome["error"], outcome["conflict"])
+            for outcome in report
+        ]
+
+    def get(self, account_name):
+        values = self.sheets.with_worksheet(
+            lambda sheet: self.sheets.locate_account(sheet, self.spreadsheet_id, account_name)[1], self.spreadsheet_id
+        )
+        return self._record(values) if values is not None else None
+
+    def list_accounts(self):
+        with timing.span("sheets.col_values"):
+            names = self.sheets.with_worksheet(lambda sheet: sheet.col_values(1), self.spreadsheet_id)
+        return [name for name in names[1:] if name]
+
+    def list_recent(self, limit=20):
+        with timing.span("sheets.get_all_records"):
+            # Raw strings: gspread would turn an account named "007" into 7
+            records = self.sheets.with_worksheet(
+                lambda sheet: sheet.get_all_records(numericise_ignore=["all"]), self.spreadsheet_id
+            )
+        # Rows cleared after a conflicting save come back blank
+        records = [record for record in records if record.get("Account Name")]
+        for record in records:
+            record["Version"] = self.sheets.parse_version(record.get("Version", ""))
+        records.sort(key=lambda record: str(record["Timestamp"]), reverse=True)
+        return records[:limit] if limit else records
+
+    def iter_records(self, chunk_size=1000):
+        for values in self.sheets.iter_rows(chunk_size, self.spreadsheet_id):
+            if values and values[0]:
+                yield self._record(values)
+
+    def revisions(self, account_name):
+        return [
+            dict(zip(self.sheets.REVISION_HEADERS, values), Version=self.sheets.parse_version(values[1]))
+            for values in self.sheets.revision_rows(account_name, self.spreadsheet_id)
+        ]
+
+
+class SQLiteEstimateStore(EstimateStore):
+    name = "local database"
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # One connection shared by the Streamlit session threads, guarded by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS estimates (
+                    account_name TEXT PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    inputs TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 1
+                )
+                """
+            )
+            columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(estimates)")]
+            if "version" not in columns:
+                # Databases from before versions: every estimate starts at 1
+                self._conn.execute("ALTER TABLE estimates ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS estimates_timestamp ON estimates (timestamp)")
+            logged = self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'revisions'").fetchone()
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS revisions (
+                    account_name TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    inputs TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    PRIMARY KEY (account_name, version)
+                )
+                """
+            )
+            if not logged:
+                # Databases from before the log: start it with a snapshot of each estimate
+                self._conn.execute(
+                    "INSERT INTO revisions SELECT account_name, version, timestamp, ?, inputs, results FROM estimates",
+                    (revisions.SNAPSHOT,),
+                )
+
+    @staticmethod
+    def _record(row):
+        return make_record(row["account_name"], row["timestamp"], row["inputs"], row["results"], row["version"])
+
+    def _write(self, record, inputs, results, expected_version):
+        # Compare-and-set on the version, logging the revision in the same
+        # transaction; the caller holds the lock and the transaction. Returns
+        # the new version.
+        account_name = record["Account Name"]
+        row = self._conn.execute(
+            "SELECT version, inputs, results FROM estimates WHERE account_name = ?", (account_name,)
+        ).fetchone()
+        current_version = row["version"] if row else 0
+        if expected_version is not None and expected_version != current_version:
+            raise ConflictError(account_name, expected_version, current_version)
+        values = (record["Timestamp"], record["Inputs"], record["Results"], current_version + 1, account_name)
+        if row:
+            cursor = self._conn.execute(
+                "UPDATE estimates SET timestamp = ?, inputs = ?, results = ?, version = ? WHERE account_name = ? AND version = ?",
+                values + (current_version,),
+            )
+        else:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO estimates (timestamp, inputs, results, version, account_name) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (account_name) DO NOTHING
+                """,
+                values,
+            )
+        if cursor.rowcount != 1:
+            # Another process wrote it between the read and the write
+            latest = self._conn.execute("SELECT version FROM estimates WHERE account_name = ?", (account_name,)).fetchone()
+            raise ConflictError(account_name, expected_version, latest["version"] if latest else 0)
+        entry = revisions.make_entry(
+            account_name, current_version + 1, record["Timestamp"], inputs, results,
+            _previous(row["inputs"], row["results"]) if row else None,
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO revisions (account_name, version, timestamp, kind, inputs, results) VALUES (?, ?, ?, ?, ?, ?)",
+            (account_name, entry["Version"], entry["Timestamp"], entry["Kind"], entry["Inputs"], entry["Results"]),
+        )
+        return current_version + 1
+
+    def save(self, account_name, inputs, results, timestamp=None, expected_version=None):
+        record = make_record(account_name, timestamp or now_timestamp(), encode_inputs(inputs), encode_results(results))
+        with self._lock, self._conn:
+            record["Version"] = self._write(record, inputs, results, expected_version)
+        return record
+
+    def save_many(self, estimates):
+        estimates = [_estimate_fields(estimate) for estimate in estimates]
+        records = [
+            (
+                make_record(account_name, timestamp or now_timestamp(), encode_inputs(inputs), encode_results(results)),
+                inputs, results, expected_version,
+            )
+            for account_name, inputs, results, timestamp, expected_version in estimates
+        ]
+        report = []
+        try:
+            # One transaction; a conflict only skips its own estimate
+            with self._lock, self._conn:
+                for record, inputs, results, expected_version in records:
+                    try:
+                        version = self._write(record, inputs, results, expected_version)
+                    except ConflictError as e:
+                        report.append(_outcome(record["Account Name"], error=str(e), conflict=True))
+                    else:
+                        report.append(_outcome(record["Account Name"], version=version))
+        except sqlite3.Error as e:
+            return [_outcome(record["Account Name"], error=str(e)) for record, _, _, _ in records]
+        return report
+
+    def get(self, account_name):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM estimates WHERE account_name = ?", (account_name,)).fetchone()
+        return self._record(row) if row else None
+
+    def list_accounts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT account_name FROM estimates ORDER BY account_name").fetchall()
+        return [row["account_name"] for row in rows]
+
+    def list_recent(self, limit=20):
+        query = "SELECT * FROM estimates ORDER BY timestamp DESC"
+        with self._lock:
+            if limit:
+                rows = self._conn.execute(query + " LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = self._conn.execute(query).fetchall()
+        return [self._record(row) for row in rows]
+
+    def iter_records(self, chunk_size=1000):
+        # Keyset pages by account name; the lock is only held per page
+        last_name = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT * FROM estimates WHERE account_name > ? ORDER BY account_name LIMIT ?",
+                    (last_name, chunk_size),
+                ).fetchall()
+            for row in rows:
+                yield self._record(row)
+            if len(rows) < chunk_size:
+                return
+            last_name = rows[-1]["account_name"]
+
+    @staticmethod
+    def _entry(row):
+        return {
+            "Account Name": row["account_name"], "Version": row["version"], "Timestamp": row["timestamp"],
+            "Kind": row["kind"], "Inputs": row["inputs"], "Results": row["results"],
+        }
+
+    def revisions(self, account_name):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM revisions WHERE account_name = ? ORDER BY version", (account_name,)
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def get_revision(self, account_name, version):
+        # Only reads back to the nearest snapshot
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT * FROM revisions WHERE account_name = ? AND version <= ? AND version >= COALESCE(
+                    (SELECT MAX(version) FROM revisions WHERE account_name = ? AND version <= ? AND kind = ?), 0
+                )
+                ORDER BY version
+                """,
+                (account_name, version, account_name, version, revisions.SNAPSHOT),
+            ).fetchall()
+        timestamp, inputs, results = revisions.rebuild([self._entry(row) for row in rows], version)
+        return make_record(account_name, timestamp, encode_inputs(inputs), encode_results(results), version)
+
+
+class CachedEstimateStore(EstimateStore):
+    # Read-through cache in front of another store. The account list and each
+    # record fetched are kept for ttl seconds; saves through this store drop
+    # the affected entries right away, and invalidate() drops everything.
+    # Saves are also recorded in aggregates (analytics.Aggregates), if given.
+
+    def __init__(self, store, ttl=60, aggregates=None):
+        self.store = store
+        self.ttl = ttl
+        self.aggregates = aggregates
+        self._lock = threading.Lock()
+        self._accounts = None
+        self._records = {}
+        self._recent = {}
+        self._revisions = {}
+        self._index = None
+
+    @property
+    def name(self):
+        return self.store.name
+
+    def _fresh(self, entry):
+        return entry is not None and time.monotonic() - entry[0] < self.ttl
+
+    def invalidate(self, account_name=None):
+        with self._lock:
+            self._accounts = None
+            self._recent.clear()
+            if account_name is None:
+                self._records.clear()
+                self._revisions.clear()
+                self._index = None
+            else:
+                self._records.pop(account_name, None)
+                self._revisions.pop(account_name, None)
+
+    def _index_saved(self, account_name, timestamp, results):
+        # Keep a built search index current instead of rebuilding it
+        with self._lock:
+            if self._index is not None:
+                self._index[1].put(account_name, timestamp, results.get("total"))
+
+    def _record_saved(self, estimates):
+        # Keep the analytics figures current; if this fails, the Analytics
+        # page's rebuild catches up, so the save still counts
+        if self.aggregates is None:
+            return
+        try:
+            self.aggregates.record(estimates)
+        except sqlite3.Error:
+            pass
+
+    def save(self, account_name, inputs, results, timestamp=None, expected_version=None):
+        try:
+            record = self.store.save(account_name, inputs, results, timestamp, expected_version)
+        except ConflictError:
+            # Whatever we have cached for it is out of date
+            self.invalidate(account_name)
+            raise
+        self.invalidate(account_name)
+        self._index_saved(account_name, record["Timestamp"], results)
+        self._record_saved([(account_name, record["Version"], record["Timestamp"], inputs, results)])
+        return record
+
+    def save_many(self, estimates):
+        estimates = [_estimate_fields(estimate) for estimate in estimates]
+        estimates = [
+            (account_name, inputs, results, timestamp or now_timestamp(), expected_version)
+            for account_name, inputs, results, timestamp, expected_version in estimates
+        ]
+        report = self.store.save_many(estimates)
+        saved = []
+        for (account_name, inputs, results, timestamp, _), outcome in zip(estimates, report):
+            self.invalidate(account_name)
+            if outcome["ok"]:
+                self._index_saved(account_name, timestamp, results)
+                saved.append((account_name, outcome["version"], timestamp, inputs, results))
+        self._record_saved(saved)
+        return report
+
+    def index(self):
+        # Search index over every saved estimate, built from one full load
+        with self._lock:
+            entry = self._index
+        if self._fresh(entry):
+            return entry[1]
+        index = EstimateIndex(self.store.list_recent(limit=None))
+        with self._lock:
+            self._index = (time.monotonic(), index)
+        return index
+
+    def get(self, account_name):
+        with self._lock:
+            entry = self._records.get(account_name)
+        if self._fresh(entry):
+            return entry[1]
+        record = self.store.get(account_name)
+        with self._lock:
+            self._records[account_name] = (time.monotonic(), record)
+        return record
+
+    def list_accounts(self):
+        with self._lock:
+            entry = self._accounts
+        if self._fresh(entry):
+            return entry[1]
+        accounts = self.store.list_accounts()
+        with self._lock:
+            self._accounts = (time.monotonic(), accounts)
+        return accounts
+
+    def iter_records(self, chunk_size=1000):
+        # Streams straight from the backing store; nothing is cached
+        return self.store.iter_records(chunk_size)
+
+    def revisions(self, account_name):
+        with self._lock:
+            entry = self._revisions.get(account_name)
+        if self._fresh(entry):
+            return entry[1]
+        entries = self.store.revisions(account_name)
+        with self._lock:
+            self._revisions[account_name] = (time.monotonic(), entries)
+        return entries
+
+    def list_recent(self, limit=20):
+        with self._lock:
+            entry = self._recent.get(limit)
+        if self._fresh(entry):
+            return entry[1]
+        records = self.store.list_recent(limit)
+        with self._lock:
+            self._recent[limit] = (time.monotonic(), records)
+        return records
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    # Process-wide store picked from the ESTIMATE_STORE secret, cached for
+    # ESTIMATE_CACHE_TTL seconds and keeping the analytics figures current
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = get_secret("ESTIMATE_STORE", "sheets")
+            if backend == "sqlite":
+                store = SQLiteEstimateStore(get_secret("ESTIMATE_DB_PATH", DEFAULT_DB_PATH))
+            elif backend == "sheets":
+                store = SheetsEstimateStore()
+            else:
+                raise ValueError(f"Unknown ESTIMATE_STORE {backend!r}, expected 'sheets' or 'sqlite'")
+            _store = CachedEstimateStore(store, float(get_secret("ESTIMATE_CACHE_TTL", 60)), analytics.get_aggregates())
+        return _store
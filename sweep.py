@@ -0,0 +1,91 @@
+import numpy as np
+
+import batch_pricing
+import pricing
+
+# What-if pricing: price every combination of a few input ranges in one
+# batch_pricing pass, e.g.
+#
+#   totals = sweep({
+#       "total_perimeter": value_range(100, 400, 10),
+#       "max_height": value_range(10, 30, 1),
+#       "house_dirtiness": ["Light", "Medium", "Heavy"],
+#   })["total"]            # array of shape (31, 21, 3)
+#
+# Inputs that are not swept come from the given estimate inputs (or the
+# defaults). Custom line items are not included, as in batch_pricing.
+
+# Inputs that make sense to sweep, with a label and default (start, stop, step)
+NUMERIC_AXES = {
+    "total_perimeter": ("Total Perimeter (ft)", (100, 400, 10)),
+    "max_height": ("Max Height (ft)", (10, 30, 1)),
+    "ladder_spots_pest": ("Ladder Spots (Pest Control)", (0, 10, 1)),
+    "rodent_stations": ("Rodent Stations", (4, 20, 1)),
+    "exterior_standard_windows": ("Exterior Standard Windows", (0, 80, 1)),
+    "exterior_high_windows": ("Exterior High Windows", (0, 40, 1)),
+    "interior_standard_windows": ("Interior Standard Windows", (0, 80, 1)),
+    "interior_high_windows": ("Interior High Windows", (0, 40, 1)),
+    "roof_sq_ft": ("Roof Square Footage", (0, 5000, 100)),
+    "gutter_linear_feet": ("Gutter Linear Feet", (0, 500, 10)),
+    "blow_off_hours": ("Hours for Roof Blow-Off", (0, 10, 0.25)),
+    "concrete_sq_ft": ("Concrete Square Footage", (0, 3000, 100)),
+    "deck_dock_sq_ft": ("Deck/Dock Square Footage", (0, 2000, 100)),
+    "vinyl_panels": ("Number of Vinyl Panels", (0, 40, 1)),
+    "storm_windows": ("Number of Storm Windows", (0, 30, 1)),
+}
+
+CHOICE_AXES = {
+    "house_dirtiness": ("Dirtiness", pricing.INPUT_CHOICES["house_dirtiness"]),
+    "stories": ("Number of Stories", pricing.INPUT_CHOICES["stories"]),
+    "pest_infestation": ("Infestation Level", pricing.INPUT_CHOICES["pest_infestation"]),
+    "structure_type": ("Structure Type", pricing.INPUT_CHOICES["structure_type"]),
+    "roof_type": ("Roof Type", pricing.INPUT_CHOICES["roof_type"]),
+    "blow_off_men": ("Number of Men", pricing.INPUT_CHOICES["blow_off_men"]),
+}
+
+# Largest grid sweep() will build (about 100 MB of working arrays)
+MAX_POINTS = 5_000_000
+
+
+def value_range(start, stop, step):
+    # start, start + step, ... up to and including stop
+    if step <= 0:
+        raise ValueError("Step must be positive")
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1
+    return start + step * np.arange(max(count, 0))
+
+
+def sweep(axes, inputs=None, additional_services=None, rate_version=None):
+    # Prices the Cartesian product of the axes (input name -> values, in
+    # order) and returns price_batch() results reshaped to the grid: one array
+    # per line, "total" and "valid", each of shape (len(values), ...) in axis
+    # order. additional_services, when given, replaces the add-ons selected
+    # in the inputs.
+    unknown = [name for name in axes if name not in pricing.DEFAULT_INPUTS or name in ("custom_items", "rate_version")]
+    if unknown:
+        raise ValueError(f"Cannot sweep {', '.join(unknown)}")
+    values = [np.asarray(axis_values) for axis_values in axes.values()]
+    shape = tuple(len(axis_values) for axis_values in values)
+    points = int(np.prod(shape, dtype=np.int64))
+    if points > MAX_POINTS:
+        raise ValueError(f"Sweep of {points:,} points is larger than the {MAX_POINTS:,} point limit")
+
+    inputs = inputs or pricing.DEFAULT_INPUTS
+    if rate_version is None:
+        rate_version = inputs.get("rate_version")
+    columns = {
+        key: inputs.get(key, default)
+        for key, default in pricing.DEFAULT_INPUTS.items()
+        if key not in ("custom_items", "rate_version")
+    }
+    if additional_services is not None:
+        for service, flag in pricing.ADDITIONAL_SERVICE_FLAGS.items():
+            columns[flag] = "YES" if service in additional_services else "NO"
+
+    # Each axis varies along its own dimension; ravel() gives the flat columns
+    for dimension, (name, axis_values) in enumerate(zip(axes, values)):
+        view = axis_values.reshape([-1 if i == dimension else 1 for i in range(len(shape))])
+        columns[name] = np.broadcast_to(view, shape).ravel()
+
+    results = batch_pricing.price_batch(columns, rate_version=rate_version)
+    return {line: prices.reshape(shape) for line, prices in results.items()}
@@ -0,0 +1,22 @@
+import itertools
+
+import pytest
+
+import sheets
+import storage
+from fake_sheets import FakeWorksheet
+
+_spreadsheet_ids = itertools.count(1)
+
+
+@pytest.fixture
+def spreadsheet_id():
+    # An id no other test has used, so sheets' per-spreadsheet caches start empty
+    return f"test-{next(_spreadsheet_ids)}"
+
+
+@pytest.fixture
+def sheet_store(spreadsheet_id):
+    # Estimates store over a fake worksheet and a fake revision log
+    sheets.use_worksheet(spreadsheet_id, FakeWorksheet(), FakeWorksheet(headers=sheets.REVISION_HEADERS))
+    return storage.SheetsEstimateStore(spreadsheet_id)
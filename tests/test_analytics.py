@@ -0,0 +1,109 @@
+import pytest
+
+import analytics
+import pricing
+import rates
+import storage
+
+
+def _estimate(total_perimeter=150, **values):
+    inputs = pricing.default_inputs()
+    inputs.update(total_perimeter=total_perimeter, max_height=20)
+    inputs.update(values)
+    return inputs, pricing.price_estimate(inputs)
+
+
+@pytest.fixture
+def backing(tmp_path):
+    return storage.SQLiteEstimateStore(str(tmp_path / "estimates.db"))
+
+
+@pytest.fixture
+def aggregates(tmp_path):
+    return analytics.Aggregates(str(tmp_path / "analytics.db"))
+
+
+def _rebuilt(backing, tmp_path):
+    fresh = analytics.Aggregates(str(tmp_path / "rebuilt.db"))
+    fresh.rebuild(backing)
+    return fresh.monthly()
+
+
+def _approx(months):
+    return [{name: pytest.approx(value) if isinstance(value, float) else value for name, value in month.items()} for month in months]
+
+
+def test_period():
+    assert analytics.period("2024-05-17 14:03:00") == "2024-05"
+    assert analytics.period("") == analytics.UNKNOWN_PERIOD
+    assert analytics.period(None) == analytics.UNKNOWN_PERIOD
+
+
+def test_rebuild_sums_by_month(backing, aggregates):
+    acme = _estimate(150)
+    beacon = _estimate(300, gutter_cleaning="YES", gutter_linear_feet=120)
+    backing.save("Acme", *acme, timestamp="2026-01-05 09:30:00")
+    backing.save("Beacon", *beacon, timestamp="2026-01-20 09:30:00")
+    backing.save("Cedar", *_estimate(200), timestamp="2026-02-01 09:30:00")
+
+    assert aggregates.built_at() is None
+    assert aggregates.rebuild(backing) == (3, 0)
+
+    january, february = aggregates.monthly()
+    assert (january["period"], january["estimates"], february["estimates"]) == ("2026-01", 2, 1)
+    assert january["total"] == pytest.approx(acme[1]["total"] + beacon[1]["total"])
+    assert january["add_ons"] == pytest.approx(beacon[1]["gutter cleaning"])
+    assert aggregates.built_at() is not None
+
+
+def test_record_does_nothing_before_the_first_rebuild(backing, aggregates):
+    store = storage.CachedEstimateStore(backing, aggregates=aggregates)
+
+    store.save("Acme", *_estimate())
+
+    assert aggregates.monthly() == []
+
+
+def test_incremental_saves_match_a_rebuild(backing, aggregates, tmp_path):
+    aggregates.rebuild(backing)
+    store = storage.CachedEstimateStore(backing, aggregates=aggregates)
+
+    store.save("Acme", *_estimate(150), timestamp="2026-01-05 09:30:00")
+    store.save("Beacon", *_estimate(90), timestamp="2026-01-20 09:30:00")
+    # Moves Acme to February, out of January's sums
+    store.save("Acme", *_estimate(250), timestamp="2026-02-02 09:30:00")
+    store.save_many([("Cedar", *_estimate(175)), ("Beacon", *_estimate(400, rodent_stations=8), "2026-01-21 09:30:00")])
+
+    assert _approx(aggregates.monthly()) == _rebuilt(backing, tmp_path)
+
+
+def test_older_save_does_not_replace_newer_facts(backing, aggregates):
+    backing.save("Acme", *_estimate(150), timestamp="2026-01-05 09:30:00")
+    backing.save("Acme", *_estimate(300), timestamp="2026-02-05 09:30:00")
+    aggregates.rebuild(backing)
+    before = aggregates.monthly()
+
+    inputs, results = _estimate(150)
+    aggregates.record([("Acme", 1, "2026-01-05 09:30:00", inputs, results)])
+
+    assert aggregates.monthly() == before
+
+
+def test_minimum_flags(backing, aggregates):
+    table = rates.rate_table()
+    backing.save("Small", *_estimate(10, max_height=10), timestamp="2026-01-05 09:30:00")
+    aggregates.rebuild(backing)
+
+    [month] = aggregates.monthly()
+    _, small = _estimate(10, max_height=10)
+    lines = sum(price for line, price in small.items() if line != "total")
+    assert month["truck_minimum"] == int(lines < table["truck_minimum"])
+    assert month["service_minimum"] == 1
+
+
+def test_unreadable_records_are_skipped(backing, aggregates):
+    backing.save("Acme", *_estimate())
+    with backing._conn:
+        backing._conn.execute("UPDATE estimates SET results = 'not json'")
+
+    assert aggregates.rebuild(backing) == (0, 1)
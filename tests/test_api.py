@@ -0,0 +1,190 @@
+import asyncio
+import json
+
+import pytest
+
+import api
+import pricing
+import save_queue
+import storage
+
+
+def _call(method, path, body=None):
+    # (status, JSON body) of one request sent straight to the ASGI app
+    payload = json.dumps(body).encode() if body is not None else b""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"content-type", b"application/json")], "client": ("test", 1), "server": ("test", 80),
+    }
+    messages = [{"type": "http.request", "body": payload, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(api.create_app()(scope, receive, send))
+    status = next(message["status"] for message in sent if message["type"] == "http.response.start")
+    content = b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+    return status, json.loads(content)
+
+
+@pytest.fixture(autouse=True)
+def no_api_key(monkeypatch):
+    monkeypatch.delenv("API_KEY", raising=False)
+
+
+def _inputs(**values):
+    return {"total_perimeter": 150, "max_height": 20, **values}
+
+
+def _stored(**values):
+    # (inputs, results) as the store keeps them
+    inputs = pricing.default_inputs()
+    inputs.update(_inputs(**values))
+    return inputs, pricing.price_estimate(inputs)
+
+
+def _expected(**values):
+    return _stored(**values)[1]
+
+
+@pytest.mark.parametrize("values", [
+    {"total_perimeter": 152.5},
+    {"max_height": 22.5},
+    {"roof_blow_off": "YES", "blow_off_hours": 1.5},
+    {"roof_treatment": "YES", "roof_sq_ft": 1850.5},
+])
+def test_price_accepts_fractional_inputs(values):
+    status, body = _call("POST", "/price", {"inputs": _inputs(**values)})
+    assert status == 200
+    assert body["results"] == _expected(**values)
+
+
+@pytest.mark.parametrize("values", [
+    {"total_perimeter": -5},
+    {"max_height": -1},
+    {"exterior_standard_windows": -2},
+    {"exterior_standard_windows": 2.5},
+    {"blow_off_hours": 12},
+    {"stories": 7},
+    {"house_dirtiness": "Filthy"},
+    {"total_perimeter": True},
+    {"total_perimeter": None},
+    {"custom_items": 5},
+    {"custom_items": [{"name": "gate", "price": -1}]},
+    {"unknown_input": 1},
+])
+def test_price_rejects_bad_inputs(values):
+    status, body = _call("POST", "/price", {"inputs": _inputs(**values)})
+    assert status == 400
+    assert body["error"]
+
+
+@pytest.mark.parametrize("body", [
+    {"inputs": _inputs(), "additional_services": "roof treatment"},
+    {"inputs": _inputs(), "additional_services": [3]},
+    {"inputs": _inputs(), "additional_services": ["sandblasting"]},
+    {"inputs": _inputs(), "rate_version": "no such version"},
+    {"inputs": [1, 2]},
+])
+def test_price_rejects_bad_requests(body):
+    assert _call("POST", "/price", body)[0] == 400
+
+
+def test_price_reports_missing_details():
+    status, body = _call("POST", "/price", {"inputs": {"total_perimeter": 150}})
+    assert status == 422
+    assert body["missing"] == ["max height for house washing"]
+
+
+def test_batch_price_matches_price():
+    estimates = [{"inputs": _inputs(total_perimeter=152.5)}, {"inputs": {"total_perimeter": 150}}]
+    status, body = _call("POST", "/batch-price", {"estimates": estimates})
+    assert status == 200
+    assert body["estimates"][0] == {"results": _expected(total_perimeter=152.5)}
+    assert body["estimates"][1]["missing"] == ["max height for house washing"]
+
+
+def test_batch_price_rejects_a_bad_estimate():
+    estimates = [{"inputs": _inputs()}, {"inputs": _inputs(total_perimeter=-5)}]
+    assert _call("POST", "/batch-price", {"estimates": estimates})[0] == 400
+
+
+@pytest.mark.parametrize("expected_version", [True, -1, 1.5, "3"])
+def test_save_rejects_a_bad_expected_version(expected_version):
+    body = {"account_name": "Acme", "inputs": _inputs(), "expected_version": expected_version}
+    assert _call("POST", "/estimates", body)[0] == 400
+
+
+def test_save_rejects_negative_inputs():
+    body = {"account_name": "Acme", "inputs": _inputs(total_perimeter=-5), "expected_version": 0}
+    assert _call("POST", "/estimates", body)[0] == 400
+
+
+def test_api_key_is_required_when_set(monkeypatch):
+    monkeypatch.setenv("API_KEY", "secret")
+    assert _call("POST", "/price", {"inputs": _inputs()})[0] == 401
+    assert _call("GET", "/health")[0] == 200
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # A local store behind a queue that is flushed by hand
+    store = storage.CachedEstimateStore(storage.SQLiteEstimateStore(str(tmp_path / "estimates.db")))
+    queue = save_queue.SaveQueue(store, str(tmp_path / "queue.db"))
+    queue.stop()
+    monkeypatch.setattr(storage, "_store", store)
+    monkeypatch.setattr(save_queue, "_queue", queue)
+    return store
+
+
+def test_save_then_read_back(store):
+    status, body = _call("POST", "/estimates", {"account_name": "Acme", "inputs": _inputs(), "expected_version": 0})
+    assert (status, body["status"]) == (202, "queued")
+    assert _call("GET", "/estimates/Acme")[0] == 404
+
+    save_queue.get_save_queue().flush()
+
+    status, body = _call("GET", "/estimates/Acme")
+    assert status == 200
+    assert (body["version"], body["sync_status"]) == (1, "synced")
+    assert body["results"] == _expected()
+    assert body["inputs"]["total_perimeter"] == 150
+
+
+def test_stale_save_is_reported_as_a_conflict(store):
+    store.save("Acme", *_stored())
+    _call("POST", "/estimates", {"account_name": "Acme", "inputs": _inputs(max_height=25), "expected_version": 0})
+
+    save_queue.get_save_queue().flush()
+
+    body = _call("GET", "/estimates/Acme")[1]
+    assert (body["version"], body["sync_status"]) == (1, "conflict")
+
+
+def test_search(store):
+    for name, perimeter in [("Acme", 150), ("Acme Storage", 600), ("Beacon", 150)]:
+        store.save(name, *_stored(total_perimeter=perimeter))
+
+    def names(query):
+        return sorted(summary["Account Name"] for summary in _call("GET", f"/estimates?{query}")[1]["estimates"])
+
+    assert names("prefix=acme") == ["Acme", "Acme Storage"]
+    assert names(f"min_total={_expected(total_perimeter=600)['total']}") == ["Acme Storage"]
+    assert _call("GET", "/estimates?min_total=lots")[0] == 400
+
+
+def test_metrics_as_json():
+    _call("GET", "/health")
+
+    status, body = _call("GET", "/metrics?format=json")
+
+    assert status == 200
+    assert "api GET /health" in body["spans"]
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+
+import pytest
+from PIL import Image
+
+import assets
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, "CACHE_DIR", str(tmp_path / ".cache"))
+    monkeypatch.setattr(assets, "_hashes", {})
+    monkeypatch.setattr(assets, "_formats", {})
+    monkeypatch.setattr(assets, "_memory_cache", OrderedDict())
+    monkeypatch.setattr(assets, "_memory_cache_bytes", 0)
+    return tmp_path / ".cache"
+
+
+def _image(tmp_path, name, size, mode="RGB", color=(200, 120, 40)):
+    path = tmp_path / name
+    Image.new(mode, size, color).save(path)
+    return str(path)
+
+
+def test_large_image_is_shrunk_to_the_display_width(tmp_path, cache_dir):
+    path = _image(tmp_path, "house.jpg", (2000, 1000))
+
+    variant = assets.asset_path(path, "grid")
+
+    assert variant.startswith(str(cache_dir)) and variant.endswith(".grid.jpg")
+    with Image.open(variant) as image:
+        assert (image.format, image.size) == ("JPEG", (assets.SIZES["grid"], 240))
+
+
+def test_transparent_image_stays_png(tmp_path):
+    path = _image(tmp_path, "icon.png", (1200, 600), "RGBA", (0, 0, 0, 0))
+
+    variant = assets.asset_path(path, "detail")
+
+    assert variant.endswith(".detail.png")
+    with Image.open(variant) as image:
+        assert image.format == "PNG" and image.width == assets.SIZES["detail"]
+
+
+def test_opaque_png_becomes_jpeg(tmp_path):
+    path = _image(tmp_path, "photo.png", (300, 200))
+
+    assert assets.asset_path(path).endswith(".grid.jpg")
+
+
+def test_small_jpeg_is_never_made_bigger(tmp_path):
+    path = _image(tmp_path, "small.jpg", (100, 80))
+
+    variant = assets.asset_path(path)
+
+    with open(path, "rb") as original, open(variant, "rb") as built:
+        assert len(built.read()) <= len(original.read())
+
+
+def test_edited_image_gets_a_new_variant(tmp_path):
+    path = _image(tmp_path, "house.jpg", (800, 600))
+    first = assets.asset_path(path)
+
+    Image.new("RGB", (900, 600), (10, 10, 10)).save(path)
+
+    assert assets.asset_path(path) != first
+
+
+def test_unreadable_image_falls_back_to_the_original(tmp_path):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"not an image")
+
+    assert assets.asset_path(str(path)) == str(path)
+
+
+def test_image_bytes_evicts_least_recently_used(tmp_path, monkeypatch):
+    paths = [_image(tmp_path, f"house{i}.jpg", (300, 200), color=(i * 40, 0, 0)) for i in range(3)]
+    sizes = [len(assets.image_bytes(path)) for path in paths[:2]]
+    monkeypatch.setattr(assets, "MEMORY_CACHE_BYTES", sum(sizes))
+
+    assets.image_bytes(paths[0])
+    assets.image_bytes(paths[2])
+
+    cached = list(assets._memory_cache)
+    assert assets.asset_path(paths[1]) not in cached
+    assert assets.asset_path(paths[0]) in cached
+    assert assets.image_bytes(paths[2]) is assets.image_bytes(paths[2])
@@ -0,0 +1,49 @@
+import itertools
+
+import pytest
+
+import batch_pricing
+import pricing
+
+
+def _grid():
+    # Inputs around the tier edges and minimums, with add-ons on and off
+    for perimeter, height, dirtiness, stories, windows, roof, custom in itertools.product(
+        [0, 60, 150, 151, 400],
+        [0, 10, 20, 35],
+        pricing.INPUT_CHOICES["house_dirtiness"],
+        [1.0, 2.5],
+        [0, 12],
+        [("NO", 0), ("YES", 0), ("YES", 1800)],
+        [[], [{"name": "gate repair", "price": 75.0}]],
+    ):
+        inputs = pricing.default_inputs()
+        inputs.update(
+            total_perimeter=perimeter, max_height=height, house_dirtiness=dirtiness, stories=stories,
+            exterior_standard_windows=windows, interior_high_windows=windows // 3,
+            roof_treatment=roof[0], roof_sq_ft=roof[1], custom_items=custom,
+        )
+        yield inputs
+
+
+def _expected(inputs):
+    if pricing.missing_details(inputs):
+        return None
+    return pricing.price_estimate(inputs)
+
+
+def test_price_inputs_matches_price_estimate():
+    estimates = list(_grid())
+    assert batch_pricing.price_inputs(estimates) == [_expected(inputs) for inputs in estimates]
+
+
+def test_price_inputs_returns_plain_floats():
+    for results in batch_pricing.price_inputs(list(_grid())):
+        if results is not None:
+            assert all(type(price) is float for price in results.values())
+
+
+@pytest.mark.parametrize("count", [0, 1])
+def test_price_inputs_small_batches(count):
+    estimates = list(_grid())[-count:] if count else []
+    assert batch_pricing.price_inputs(estimates) == [_expected(inputs) for inputs in estimates]
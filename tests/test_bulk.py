@@ -0,0 +1,113 @@
+import csv
+import io
+
+import pytest
+
+import bulk
+import pricing
+import sheets
+import storage
+from estimate_codec import StoredEstimate
+
+
+def _inputs(**values):
+    inputs = pricing.default_inputs()
+    inputs.update(total_perimeter=152.5, max_height=22.5)
+    inputs.update(values)
+    return inputs
+
+
+@pytest.fixture
+def store(tmp_path):
+    return storage.SQLiteEstimateStore(str(tmp_path / "estimates.db"))
+
+
+def _import(store, data, filename):
+    return list(bulk.import_estimates(bulk.read_rows(io.BytesIO(data), filename), store))
+
+
+@pytest.mark.parametrize("fmt", ["csv", "xlsx"])
+def test_export_then_import_keeps_fractional_values(store, tmp_path, fmt):
+    saved = {
+        "Half Foot": _inputs(),
+        "Blow-Off": _inputs(roof_blow_off="YES", blow_off_hours=1.5, blow_off_men=2),
+        "Roof": _inputs(roof_treatment="YES", roof_sq_ft=1850.5, custom_items=[{"name": "gate", "price": 42.5}]),
+    }
+    for account_name, inputs in saved.items():
+        store.save(account_name, inputs, pricing.price_estimate(inputs))
+    out = io.BytesIO()
+    assert bulk.export_estimates(store, out, fmt) == len(saved)
+
+    target = storage.SQLiteEstimateStore(str(tmp_path / "imported.db"))
+    outcomes = _import(target, out.getvalue(), f"estimates.{fmt}")
+
+    assert [outcome["status"] for outcome in outcomes] == ["saved"] * len(saved)
+    for account_name, inputs in saved.items():
+        imported = StoredEstimate(target.get(account_name))
+        assert imported.inputs == inputs
+        assert imported.results == pricing.price_estimate(inputs)
+
+
+def _csv(*rows):
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return text.getvalue().encode()
+
+
+@pytest.mark.parametrize("column, value", [
+    ("Total Perimeter", "-5"),
+    ("Exterior Standard Windows", "2.5"),
+    ("Blow Off Hours", "12"),
+    ("Stories", "7"),
+    ("Custom Items", '[{"name": "gate", "price": -1}]'),
+])
+def test_bad_values_are_reported(store, column, value):
+    row = {"Account Name": "Acme", "Total Perimeter": "150", "Max Height": "20"}
+    row[column] = value
+    [outcome] = _import(store, _csv(row), "leads.csv")
+    assert outcome["status"] == "invalid"
+    assert store.get("Acme") is None
+
+
+def _xlsx(*rows):
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+def test_lines_count_blank_rows_in_xlsx(store):
+    data = _xlsx(
+        ["Account Name", "Total Perimeter", "Max Height"],
+        ["Good", 150, 20],
+        [None, None, None],
+        [None, None, None],
+        ["Bad", -5, 20],
+    )
+    outcomes = _import(store, data, "leads.xlsx")
+    assert [(outcome["line"], outcome["status"]) for outcome in outcomes] == [(2, "saved"), (5, "invalid")]
+
+
+def test_lines_count_blank_lines_in_csv(store):
+    data = b"Account Name,Total Perimeter,Max Height\nGood,150,20\n\n\nBad,-5,20\n"
+    outcomes = _import(store, data, "leads.csv")
+    assert [(outcome["line"], outcome["status"]) for outcome in outcomes] == [(2, "saved"), (5, "invalid")]
+
+
+def test_export_reads_past_cleared_rows(sheet_store, spreadsheet_id):
+    # A chunk of the sheet that ends in rows cleared after a duplicate append
+    # comes back short; the rows after it must still be exported
+    inputs = _inputs()
+    results = pricing.price_estimate(inputs)
+    sheet_store.save_many([(f"Account {number}", inputs, results) for number in range(1, 9)])
+    sheet = sheets.get_worksheet(spreadsheet_id)
+    sheet.batch_clear(["A4:E4", "A5:E5"])
+
+    rows = list(bulk.export_rows(sheet_store, chunk_rows=4))
+    assert [row[0] for row in rows] == [f"Account {number}" for number in [1, 2, 5, 6, 7, 8]]
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import estimate_codec
+import pricing
+from estimate_codec import StoredEstimate
+
+
+def _inputs():
+    inputs = pricing.default_inputs()
+    inputs.update(
+        total_perimeter=180.5,
+        max_height=22,
+        roof_treatment="YES",
+        roof_sq_ft=1500,
+        custom_items=[{"name": "Shutters", "price": 45.0}],
+    )
+    return inputs
+
+
+def test_inputs_round_trip():
+    inputs = _inputs()
+
+    assert estimate_codec.decode_inputs(estimate_codec.encode_inputs(inputs)) == inputs
+
+
+def test_results_round_trip():
+    inputs = _inputs()
+    results = pricing.price_estimate(inputs)
+
+    decoded = estimate_codec.decode_results(estimate_codec.encode_results(results))
+
+    assert decoded == results
+    assert list(decoded)[-1] == "total"
+
+
+def test_encoding_keeps_only_what_differs_from_the_defaults():
+    inputs = _inputs()
+    inputs["total_perimeter"] = pricing.DEFAULT_INPUTS["total_perimeter"]
+
+    payload = json.loads(estimate_codec.encode_inputs(inputs))
+
+    assert payload["v"] == estimate_codec.SCHEMA_VERSION
+    assert "total_perimeter" not in payload["d"]
+    assert payload["d"]["max_height"] == 22
+    assert " " not in estimate_codec.encode_inputs(inputs)
+
+
+def test_encoding_drops_zero_result_lines():
+    results = {service: 0.0 for service in pricing.BASE_SERVICES}
+    results.update(house_washing=250.0, total=250.0)
+
+    payload = json.loads(estimate_codec.encode_results(results))
+
+    assert payload["d"] == {"house_washing": 250.0, "total": 250.0}
+    assert estimate_codec.decode_results(estimate_codec.encode_results(results)) == results
+
+
+def test_legacy_json_still_decodes():
+    inputs = _inputs()
+    results = pricing.price_estimate(inputs)
+
+    assert estimate_codec.decode_inputs(json.dumps(inputs)) == inputs
+    assert estimate_codec.decode_results(json.dumps(results)) == results
+
+
+@pytest.mark.parametrize("decode", [estimate_codec.decode_inputs, estimate_codec.decode_results])
+def test_empty_cell_decodes_to_nothing(decode):
+    assert decode("") == {}
+
+
+def test_unrecorded_rate_version_stays_unrecorded():
+    inputs = _inputs()
+    inputs["rate_version"] = None
+
+    assert estimate_codec.decode_inputs(estimate_codec.encode_inputs(inputs))["rate_version"] is None
+
+
+def test_decoded_defaults_are_not_shared():
+    first = estimate_codec.decode_inputs(estimate_codec.encode_inputs(pricing.DEFAULT_INPUTS))
+    first["custom_items"].append({"name": "Shutters", "price": 45.0})
+
+    assert pricing.DEFAULT_INPUTS["custom_items"] == []
+
+
+def test_stored_estimate_decodes_lazily():
+    record = {
+        "Account Name": "Acme",
+        "Timestamp": "2026-01-05 09:30:00",
+        "Inputs": "not json",
+        "Results": estimate_codec.encode_results({"house_washing": 250.0, "total": 250.0}),
+    }
+
+    estimate = StoredEstimate(record)
+
+    assert (estimate.account_name, estimate.timestamp, estimate.version) == ("Acme", "2026-01-05 09:30:00", 1)
+    assert estimate.results["total"] == 250.0
+    with pytest.raises(ValueError):
+        estimate.inputs
@@ -0,0 +1,81 @@
+import pytest
+
+from estimate_codec import encode_results
+from estimate_index import EstimateIndex
+
+
+def _record(account_name, timestamp, total):
+    return {
+        "Account Name": account_name,
+        "Timestamp": timestamp,
+        "Inputs": "",
+        "Results": encode_results({"total": total}) if total is not None else "not json",
+    }
+
+
+@pytest.fixture
+def index():
+    return EstimateIndex([
+        _record("Acme", "2026-01-05 09:30:00", 450.0),
+        _record("Acme Storage", "2026-02-10 14:00:00", 1200.0),
+        _record("Beacon Hill", "2026-02-28 08:15:00", 250.0),
+        _record("Lakeside Acme", "2026-03-01 10:00:00", 800.0),
+        _record("Broken Row", "2026-03-02 10:00:00", None),
+    ])
+
+
+def _names(summaries):
+    return [summary["Account Name"] for summary in summaries]
+
+
+def test_search_with_no_filters_is_newest_first(index):
+    assert _names(index.search()) == ["Broken Row", "Lakeside Acme", "Beacon Hill", "Acme Storage", "Acme"]
+
+
+def test_prefix_ignores_case(index):
+    assert _names(index.search(prefix="acme")) == ["Acme Storage", "Acme"]
+
+
+def test_contains(index):
+    assert _names(index.search(contains="ACME")) == ["Lakeside Acme", "Acme Storage", "Acme"]
+
+
+def test_date_range_includes_the_whole_end_day(index):
+    assert _names(index.search(start="2026-02-10", end="2026-02-28")) == ["Beacon Hill", "Acme Storage"]
+
+
+@pytest.mark.parametrize(
+    ("min_total", "max_total", "expected"),
+    [
+        (450.0, 800.0, ["Lakeside Acme", "Acme"]),
+        (1000.0, None, ["Acme Storage"]),
+        (None, 250.0, ["Beacon Hill"]),
+    ],
+)
+def test_total_range_is_inclusive(index, min_total, max_total, expected):
+    assert _names(index.search(min_total=min_total, max_total=max_total)) == expected
+
+
+def test_filters_combine(index):
+    assert _names(index.search(prefix="acme", min_total=1000.0)) == ["Acme Storage"]
+
+
+def test_undecodable_results_have_no_total(index):
+    assert index.search(prefix="broken") == [{"Account Name": "Broken Row", "Timestamp": "2026-03-02 10:00:00", "Total": None}]
+    assert "Broken Row" not in _names(index.search(min_total=0.0))
+
+
+def test_put_replaces_an_entry(index):
+    index.put("Acme", "2026-03-05 12:00:00", 90.0)
+
+    assert len(index) == 5
+    assert index.search(prefix="acme")[0] == {"Account Name": "Acme", "Timestamp": "2026-03-05 12:00:00", "Total": 90.0}
+    assert _names(index.search(min_total=400.0, max_total=500.0)) == []
+
+
+def test_remove(index):
+    index.remove("Acme")
+    index.remove("Nobody")
+
+    assert _names(index.search(prefix="acme")) == ["Acme Storage"]
+    assert len(index) == 4
@@ -0,0 +1,79 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import analytics
+import pricing
+import save_queue
+import storage
+from estimate_codec import StoredEstimate
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # The app over a local database and queue of its own
+    secrets = {
+        "ESTIMATE_STORE": "sqlite",
+        "ESTIMATE_DB_PATH": str(tmp_path / "estimates.db"),
+        "SAVE_QUEUE_PATH": str(tmp_path / "queue.db"),
+        "ANALYTICS_DB_PATH": str(tmp_path / "analytics.db"),
+    }
+    for name, value in secrets.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(storage, "_store", None)
+    monkeypatch.setattr(save_queue, "_queue", None)
+    monkeypatch.setattr(analytics, "_aggregates", None)
+    at = AppTest.from_file("../app.py", default_timeout=30)
+    for name, value in secrets.items():
+        at.secrets[name] = value
+    yield at
+    save_queue.get_save_queue().stop()
+
+
+def _click(at, label):
+    next(button for button in at.button if button.label == label).click().run()
+
+
+def test_saving_twice_before_the_page_sees_the_first_sync(app):
+    app.session_state["account_name"] = "Rizzo"
+    app.session_state["total_perimeter"] = 200.0
+    app.session_state["max_height"] = 20.0
+    app.run()
+    _click(app, "Save Estimate")
+    # The first save syncs, but the page hasn't rerun since
+    save_queue.get_save_queue().flush()
+
+    app.session_state["total_perimeter"] = 250.0
+    _click(app, "Save Estimate")
+    save_queue.get_save_queue().flush()
+
+    assert save_queue.get_save_queue().status("Rizzo") == ("synced", None)
+    stored = StoredEstimate(storage.get_store().get("Rizzo"))
+    assert (stored.version, stored.inputs["total_perimeter"]) == (2, 250.0)
+
+
+
+def test_editing_a_section_reprices_the_summary(app):
+    app.session_state["total_perimeter"] = 200.0
+    app.session_state["max_height"] = 20.0
+    app.run()
+
+    app.number_input(key="rodent_stations").set_value(8).run()
+
+    inputs = app.session_state["inputs"]
+    assert inputs["rodent_stations"] == 8
+    assert app.session_state["results"] == pricing.price_estimate(inputs)
+    assert app.session_state["pricing_graph"].recomputed == ["rodent_control"]
+
+
+def test_add_on_section_feeds_the_summary(app):
+    app.session_state["total_perimeter"] = 200.0
+    app.session_state["max_height"] = 20.0
+    app.run()
+    app.multiselect(key="additional_services").set_value(["gutter cleaning"]).run()
+    assert app.session_state["inputs"]["gutter_cleaning"] == "NO"
+
+    app.number_input(key="gutter_linear_feet").set_value(120).run()
+
+    inputs = app.session_state["inputs"]
+    assert inputs["gutter_cleaning"] == "YES"
+    assert app.session_state["results"] == pricing.price_estimate(inputs, ["gutter cleaning"])
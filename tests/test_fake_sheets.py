@@ -0,0 +1,81 @@
+import pytest
+from gspread.exceptions import APIError
+
+from fake_sheets import FakeWorksheet
+
+HEADERS = ["Name", "Count", "Note"]
+
+
+@pytest.fixture
+def sheet():
+    return FakeWorksheet([["a", 1, ""], ["b", 2, "x"]], headers=HEADERS)
+
+
+def test_values_are_kept_as_strings(sheet):
+    assert sheet.row_values(2) == ["a", "1"]
+    assert sheet.col_values(2) == ["Count", "1", "2"]
+    assert sheet.get("A2:C3") == [["a", "1"], ["b", "2", "x"]]
+    assert sheet.batch_get(["A:A", "C2"]) == [[["Name"], ["a"], ["b"]], []]
+    assert sheet.cell(3, 3).value == "x"
+    assert sheet.cell(9, 9).value is None
+
+
+def test_get_all_records_converts_numbers_like_gspread(sheet):
+    assert sheet.get_all_records() == [{"Name": "a", "Count": 1, "Note": ""}, {"Name": "b", "Count": 2, "Note": "x"}]
+    assert sheet.get_all_records(numericise_ignore=["all"])[0]["Count"] == "1"
+
+
+def test_update_and_batch_update(sheet):
+    sheet.update("B2", [[5]])
+    sheet.batch_update([{"range": "A3:B3", "values": [["c", 7]]}, {"range": "A5", "values": [["e"]]}])
+
+    assert sheet.rows[1:] == [["a", "5", ""], ["c", "7", "x"], [], ["e"]]
+
+
+def test_append_goes_after_the_last_row_with_anything_in_it(sheet):
+    sheet.batch_clear(["A3:C3"])
+
+    response = sheet.append_rows([["c", 3, "y"]])
+
+    assert response["updates"]["updatedRange"] == "Sheet1!A3:C3"
+    assert sheet.get_all_records()[-1] == {"Name": "c", "Count": 3, "Note": "y"}
+
+
+def test_row_count_grows_with_appends(sheet):
+    assert sheet.row_count == 3
+    sheet.append_row(["c", 3])
+    assert sheet.row_count == 4
+
+
+def test_calls_are_counted(sheet):
+    sheet.row_values(1)
+    sheet.row_values(2)
+    sheet.get_all_records()
+
+    assert sheet.calls == {"row_values": 2, "get_all_records": 1}
+
+
+def test_quota_errors():
+    sheet = FakeWorksheet(headers=HEADERS, quota_error_rate=1.0)
+
+    with pytest.raises(APIError) as error:
+        sheet.append_row(["a", 1])
+
+    assert error.value.code == 429
+    assert sheet.rows == [HEADERS]
+
+
+def test_seeded_quota_errors_repeat():
+    def failures(seed):
+        sheet = FakeWorksheet(headers=HEADERS, quota_error_rate=0.5, seed=seed)
+        outcomes = []
+        for _ in range(20):
+            try:
+                sheet.row_values(1)
+                outcomes.append(False)
+            except APIError:
+                outcomes.append(True)
+        return outcomes
+
+    assert failures(7) == failures(7)
+    assert 0 < sum(failures(7)) < 20
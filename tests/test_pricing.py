@@ -0,0 +1,90 @@
+import pytest
+
+import pricing
+
+
+def _inputs(**values):
+    inputs = pricing.default_inputs()
+    inputs.update(total_perimeter=200, max_height=20)
+    inputs.update(values)
+    return inputs
+
+
+@pytest.mark.parametrize("values, price", [
+    ({}, 429.0),  # 4,000 sq ft at $0.094 is under the minimum
+    ({"total_perimeter": 400}, 536.0),  # 8,000 sq ft at $0.067
+    ({"total_perimeter": 400, "house_dirtiness": "Heavy"}, 688.0),
+    ({"total_perimeter": 600}, 1332.0),  # 12,000 sq ft at $0.111
+])
+def test_house_washing(values, price):
+    assert pricing.house_washing_price(_inputs(**values)) == pytest.approx(price)
+
+
+@pytest.mark.parametrize("values, price", [
+    ({}, 179.0),  # 2,000 sq ft treated is under the main minimum
+    ({"total_perimeter": 400, "stories": 2.0}, 240.0),
+    ({"total_perimeter": 400, "stories": 2.0, "ladder_spots_pest": 3}, 295.0),
+    ({"total_perimeter": 400, "stories": 2.0, "pest_infestation": "Heavy"}, 340.0),
+    ({"structure_type": "Additional"}, 98.0),  # no minimum for additional structures
+])
+def test_pest_control(values, price):
+    assert pricing.pest_control_price(_inputs(**values)) == pytest.approx(price)
+
+
+def test_rodent_control():
+    assert pricing.rodent_control_price(_inputs()) == 399.0
+    assert pricing.rodent_control_price(_inputs(rodent_stations=6, interior_monitoring=True)) == 509.0
+
+
+@pytest.mark.parametrize("values, price", [
+    ({}, 0.0),
+    ({"exterior_standard_windows": 10}, 149.0),  # $33 is under the minimum
+    ({"exterior_standard_windows": 40, "exterior_high_windows": 4}, 153.0),
+])
+def test_exterior_windows(values, price):
+    assert pricing.exterior_windows_price(_inputs(**values)) == pytest.approx(price)
+
+
+@pytest.mark.parametrize("values, line, price", [
+    ({"roof_treatment": "YES", "roof_sq_ft": 1000}, "roof treatment", 399.0),
+    ({"roof_treatment": "YES", "roof_sq_ft": 2000}, "roof treatment", 500.0),
+    ({"roof_treatment": "YES", "roof_type": "Metal", "roof_sq_ft": 1000}, "roof treatment", 850.0),
+    ({"roof_treatment": "YES", "roof_type": "Metal", "roof_sq_ft": 500, "roof_metal_min": 599.0}, "roof treatment", 599.0),
+    ({"gutter_cleaning": "YES", "gutter_linear_feet": 100}, "gutter cleaning", 149.0),
+    ({"roof_blow_off": "YES", "blow_off_hours": 1.5, "blow_off_men": 2}, "roof blow-off", 286.5),
+    ({"vinyl_porch_cleaning": "YES", "vinyl_panels": 3}, "vinyl porch cleaning", 39.0),
+    ({"custom_items": [{"name": "gate", "price": 42.5}]}, "custom line item (gate)", 42.5),
+])
+def test_additional_services(values, line, price):
+    results = pricing.price_estimate(_inputs(**values))
+    assert results[line] == price
+    assert results["total"] == round(sum(price for service, price in results.items() if service != "total"), 2)
+
+
+def test_additional_service_missing_details_is_left_off():
+    results = pricing.price_estimate(_inputs(roof_treatment="YES", roof_sq_ft=0))
+    assert "roof treatment" not in results
+    assert pricing.missing_additional_details("roof treatment", _inputs()) == "roof square footage"
+
+
+def test_price_estimate_lists_every_base_service():
+    results = pricing.price_estimate(_inputs())
+    assert list(results) == pricing.BASE_SERVICES + ["total"]
+    assert results["total"] == 429.0 + 179.0 + 399.0 + 99.0
+
+
+def test_truck_minimum():
+    assert pricing.estimate_total({"gutter cleaning": 149.0}, 299.0) == 299.0
+    assert pricing.estimate_total({"gutter cleaning": 149.0, "roof treatment": 399.0}, 299.0) == 548.0
+
+
+def test_missing_details():
+    inputs = _inputs(total_perimeter=0, max_height=0)
+    assert pricing.missing_details(inputs) == ["total perimeter", "max height for house washing"]
+    with pytest.raises(ValueError, match="total perimeter"):
+        pricing.price_estimate(inputs)
+
+
+def test_unknown_rate_version():
+    with pytest.raises(ValueError, match="Unknown rate version"):
+        pricing.price_estimate(_inputs(), rate_version="no such version")
@@ -0,0 +1,85 @@
+import pytest
+
+import pricing
+from pricing_graph import PricingGraph
+
+
+def _inputs(**values):
+    inputs = pricing.default_inputs()
+    inputs.update(total_perimeter=180, max_height=20, roof_sq_ft=1500, gutter_linear_feet=120)
+    inputs.update(values)
+    return inputs
+
+
+@pytest.fixture
+def graph():
+    return PricingGraph()
+
+
+def test_first_update_matches_price_estimate(graph):
+    inputs = _inputs()
+
+    assert graph.update(inputs, ["roof treatment"]) == pricing.price_estimate(inputs, ["roof treatment"])
+    assert graph.recomputed == pricing.BASE_SERVICES + ["roof treatment"]
+
+
+def test_only_dependent_lines_are_repriced(graph):
+    graph.update(_inputs(), ["roof treatment"])
+    inputs = _inputs(rodent_stations=6)
+
+    results = graph.update(inputs, ["roof treatment"])
+
+    assert graph.recomputed == ["rodent_control"]
+    assert results == pricing.price_estimate(inputs, ["roof treatment"])
+
+
+def test_shared_input_reprices_every_reader(graph):
+    graph.update(_inputs())
+
+    graph.update(_inputs(total_perimeter=240))
+
+    assert graph.recomputed == ["house_washing", "pest_control"]
+
+
+def test_adding_and_removing_add_ons(graph):
+    inputs = _inputs()
+    graph.update(inputs)
+
+    with_gutters = graph.update(inputs, ["gutter cleaning"])
+    assert graph.recomputed == ["gutter cleaning"]
+    assert with_gutters == pricing.price_estimate(inputs, ["gutter cleaning"])
+
+    assert graph.update(inputs) == pricing.price_estimate(inputs)
+    assert graph.recomputed == []
+
+
+def test_many_edits_do_not_drift(graph):
+    for perimeter in range(100, 400, 7):
+        inputs = _inputs(total_perimeter=perimeter + 0.35, exterior_standard_windows=perimeter % 13)
+        results = graph.update(inputs, ["gutter cleaning"])
+
+    assert results == pricing.price_estimate(inputs, ["gutter cleaning"])
+
+
+def test_rate_version_change_reprices_everything(graph):
+    graph.update(_inputs())
+
+    graph.update(_inputs(rate_version=None))
+
+    assert graph.recomputed == pricing.BASE_SERVICES
+
+
+def test_missing_details_give_no_results(graph):
+    inputs = _inputs(total_perimeter=0)
+
+    assert graph.update(inputs) == {}
+    assert graph.missing == pricing.missing_details(inputs)
+
+
+def test_add_on_missing_details_is_left_off(graph):
+    inputs = _inputs(gutter_linear_feet=0)
+
+    results = graph.update(inputs, ["gutter cleaning"])
+
+    assert "gutter cleaning" in graph.missing_additional
+    assert results == pricing.price_estimate(inputs)
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import pricing
+import rates
+
+
+def _write_rates(tmp_path, config):
+    path = tmp_path / "rates.json"
+    path.write_text(json.dumps(config))
+    return str(path)
+
+
+def test_tiers_lookup():
+    tiers = rates.Tiers((6000, 10000), (0.094, 0.067, 0.111))
+
+    assert [tiers.lookup(amount) for amount in (0, 5999, 6000, 9999.5, 10000, 50000)] == [
+        0.094, 0.094, 0.067, 0.067, 0.111, 0.111,
+    ]
+
+
+def test_load_rate_tables(tmp_path):
+    path = _write_rates(tmp_path, {
+        "current": "2",
+        "versions": {
+            "1": {"truck_minimum": 250, "rate": {"boundaries": [100], "values": [1.0, 0.5]}},
+            "2": {"truck_minimum": 275, "rate": {"boundaries": [100], "values": [1.2, 0.6]}},
+        },
+    })
+
+    tables, current = rates.load_rate_tables(path)
+
+    assert current == "2"
+    assert list(tables) == ["1", "2"]
+    assert tables["1"]["version"] == "1"
+    assert tables["2"]["truck_minimum"] == 275
+    assert tables["2"]["rate"].lookup(150) == 0.6
+
+
+def test_tables_are_read_only(tmp_path):
+    path = _write_rates(tmp_path, {"current": "1", "versions": {"1": {"truck_minimum": 250, "sizes": [1, 2]}}})
+
+    tables, _ = rates.load_rate_tables(path)
+
+    with pytest.raises(TypeError):
+        tables["1"]["truck_minimum"] = 0
+    assert tables["1"]["sizes"] == (1, 2)
+
+
+@pytest.mark.parametrize(
+    "tiers",
+    [
+        {"boundaries": [10000, 6000], "values": [1, 2, 3]},
+        {"boundaries": [6000], "values": [1, 2, 3]},
+    ],
+)
+def test_bad_tiers_are_rejected(tmp_path, tiers):
+    path = _write_rates(tmp_path, {"current": "1", "versions": {"1": {"rate": tiers}}})
+
+    with pytest.raises(ValueError, match=r"1\.rate"):
+        rates.load_rate_tables(path)
+
+
+def test_current_version_must_exist(tmp_path):
+    path = _write_rates(tmp_path, {"current": "3", "versions": {"1": {}}})
+
+    with pytest.raises(ValueError, match="'3'"):
+        rates.load_rate_tables(path)
+
+
+def test_rate_table_defaults_to_the_current_version():
+    assert rates.current_version() in rates.versions()
+    assert rates.rate_table() is rates.rate_table(rates.current_version())
+
+
+def test_unknown_rate_version():
+    with pytest.raises(ValueError, match="Unknown rate version"):
+        rates.rate_table("no-such-version")
+
+
+def test_new_estimates_record_the_current_rates():
+    assert pricing.default_inputs()["rate_version"] == rates.current_version()
+    assert pricing.DEFAULT_INPUTS["rate_version"] is None
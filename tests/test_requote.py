@@ -0,0 +1,103 @@
+import csv
+import json
+import os
+
+import pytest
+
+import pricing
+import rates
+import requote
+import storage
+from estimate_codec import StoredEstimate
+
+
+def _inputs(total_perimeter=150):
+    inputs = pricing.default_inputs()
+    inputs.update(total_perimeter=total_perimeter, max_height=20)
+    return inputs
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = storage.SQLiteEstimateStore(str(tmp_path / "estimates.db"))
+    inputs = _inputs()
+    store.save("Current", inputs, pricing.price_estimate(inputs), timestamp="2026-01-05 09:30:00")
+    stale = dict(pricing.price_estimate(inputs), total=1.0)
+    store.save("Stale", inputs, stale, timestamp="2026-01-06 09:30:00")
+    store.save("Incomplete", _inputs(0), {}, timestamp="2026-01-07 09:30:00")
+    return store
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {"checkpoint_path": str(tmp_path / "checkpoint.json"), "report_path": str(tmp_path / "report.csv")}
+
+
+def _report(paths):
+    with open(paths["report_path"], newline="") as f:
+        return {row["Account Name"]: row for row in csv.DictReader(f)}
+
+
+def test_requote_writes_back_changed_estimates(store, paths):
+    counts = requote.requote(store, workers=1, chunk_rows=2, **paths)
+
+    assert (counts["changed"], counts["unchanged"], counts["invalid"]) == (1, 1, 1)
+    stale = store.get("Stale")
+    assert stale["Version"] == 2
+    assert stale["Timestamp"] == "2026-01-06 09:30:00"
+    assert StoredEstimate(stale).results == pricing.price_estimate(_inputs())
+    assert store.get("Current")["Version"] == 1
+
+    report = _report(paths)
+    assert report["Stale"]["Status"] == "changed"
+    assert report["Stale"]["Old Total"] == "1.0"
+    assert report["Incomplete"]["Status"] == "invalid"
+    assert not os.path.exists(paths["checkpoint_path"])
+
+
+def test_second_run_finds_nothing_to_change(store, paths):
+    requote.requote(store, workers=1, **paths)
+
+    counts = requote.requote(store, workers=1, **paths)
+
+    assert counts["changed"] == 0
+    assert store.get("Stale")["Version"] == 2
+
+
+def test_dry_run_leaves_the_store_alone(store, paths):
+    counts = requote.requote(store, workers=1, dry_run=True, **paths)
+
+    assert counts["changed"] == 1
+    assert store.get("Stale")["Version"] == 1
+    assert _report(paths)["Stale"]["Status"] == "changed"
+
+
+def test_checkpoint_skips_finished_accounts(store, paths):
+    with open(paths["checkpoint_path"], "w") as f:
+        json.dump({"rate_version": rates.current_version(), "done": ["Stale"]}, f)
+
+    counts = requote.requote(store, workers=1, **paths)
+
+    assert counts["changed"] == 0
+    assert store.get("Stale")["Version"] == 1
+
+
+def test_checkpoint_for_other_rates_is_refused(store, paths):
+    with open(paths["checkpoint_path"], "w") as f:
+        json.dump({"rate_version": "other", "done": []}, f)
+
+    with pytest.raises(SystemExit, match="delete it"):
+        requote.requote(store, workers=1, **paths)
+
+
+def test_estimate_saved_since_reading_is_a_conflict(store, paths):
+    outcomes = requote.requote_chunk([store.get("Stale")], rates.current_version())
+    store.save("Stale", _inputs(200), pricing.price_estimate(_inputs(200)))
+
+    assert requote._write_back(store, outcomes, dry_run=False)["Stale"][0] == "conflict"
+    assert StoredEstimate(store.get("Stale")).inputs["total_perimeter"] == 200
+
+
+def test_unknown_rate_version_fails_first(store, paths):
+    with pytest.raises(ValueError, match="Unknown rate version"):
+        requote.requote(store, rate_version="no-such-version", workers=1, **paths)
@@ -0,0 +1,128 @@
+import pytest
+
+import pricing
+import revisions
+import sheets
+import storage
+from estimate_codec import StoredEstimate
+from fake_sheets import FakeWorksheet
+
+
+def _inputs(total_perimeter):
+    inputs = pricing.default_inputs()
+    inputs.update(total_perimeter=total_perimeter, max_height=20)
+    return inputs
+
+
+def _save_versions(store, count):
+    # Saves versions 1..count, version n with a total perimeter of 100 + n
+    for version in range(1, count + 1):
+        inputs = _inputs(100 + version)
+        store.save("Acme", inputs, pricing.price_estimate(inputs), expected_version=version - 1)
+
+
+def _entries(count):
+    entries = []
+    previous = None
+    for version in range(1, count + 1):
+        inputs = _inputs(100 + version)
+        results = pricing.price_estimate(inputs)
+        entries.append(revisions.make_entry("Acme", version, f"t{version}", inputs, results, previous))
+        previous = revisions._normalized(inputs, results)
+    return entries
+
+
+def test_snapshots_every_snapshot_every_versions():
+    kinds = [entry["Kind"] for entry in _entries(2 * revisions.SNAPSHOT_EVERY + 1)]
+    snapshots = [version for version, kind in enumerate(kinds, start=1) if kind == revisions.SNAPSHOT]
+    assert snapshots == [1, revisions.SNAPSHOT_EVERY + 1, 2 * revisions.SNAPSHOT_EVERY + 1]
+
+
+@pytest.mark.parametrize("version", [1, revisions.SNAPSHOT_EVERY, revisions.SNAPSHOT_EVERY + 1, revisions.SNAPSHOT_EVERY + 2])
+def test_rebuild_across_a_snapshot_boundary(version):
+    timestamp, inputs, results = revisions.rebuild(_entries(revisions.SNAPSHOT_EVERY + 2), version)
+    assert timestamp == f"t{version}"
+    assert inputs["total_perimeter"] == 100 + version
+    assert results == pricing.price_estimate(_inputs(100 + version))
+
+
+def test_rebuild_without_the_snapshot_fails():
+    entries = _entries(revisions.SNAPSHOT_EVERY)[1:]
+    with pytest.raises(ValueError):
+        revisions.rebuild(entries, revisions.SNAPSHOT_EVERY)
+
+
+def test_later_entry_for_a_version_wins():
+    entries = _entries(2)
+    inputs = _inputs(500)
+    retried = revisions.make_entry("Acme", 2, "retried", inputs, pricing.price_estimate(inputs))
+    timestamp, inputs, _ = revisions.rebuild(entries + [retried], 2)
+    assert (timestamp, inputs["total_perimeter"]) == ("retried", 500)
+
+
+@pytest.fixture(params=["sqlite", "sheets"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return storage.SQLiteEstimateStore(str(tmp_path / "estimates.db"))
+    return request.getfixturevalue("sheet_store")
+
+
+def test_store_rebuilds_every_version(store):
+    count = revisions.SNAPSHOT_EVERY + 2
+    _save_versions(store, count)
+
+    assert [entry["Kind"] for entry in store.revisions("Acme")].count(revisions.SNAPSHOT) == 2
+    for version in range(1, count + 1):
+        revision = StoredEstimate(store.get_revision("Acme", version))
+        assert revision.version == version
+        assert revision.inputs["total_perimeter"] == 100 + version
+    assert store.get_revision("Acme", count) == store.get("Acme")
+
+
+class FlakyLog(FakeWorksheet):
+    # Revision log whose next append fails
+    fail_next = False
+
+    def append_rows(self, values):
+        if self.fail_next:
+            self.fail_next = False
+            raise ConnectionError("append failed")
+        return super().append_rows(values)
+
+
+@pytest.fixture
+def flaky(spreadsheet_id):
+    log = FlakyLog(headers=sheets.REVISION_HEADERS)
+    sheets.use_worksheet(spreadsheet_id, FakeWorksheet(), log)
+    return log, storage.SheetsEstimateStore(spreadsheet_id)
+
+
+def test_save_stands_when_its_revision_is_not_logged(flaky):
+    log, store = flaky
+    _save_versions(store, 1)
+    log.fail_next = True
+    inputs = _inputs(102)
+    assert store.save("Acme", inputs, pricing.price_estimate(inputs), expected_version=1)["Version"] == 2
+    assert store.get("Acme")["Version"] == 2
+
+    inputs = _inputs(103)
+    store.save("Acme", inputs, pricing.price_estimate(inputs), expected_version=2)
+
+    kinds = {entry["Version"]: entry["Kind"] for entry in store.revisions("Acme")}
+    assert kinds == {1: revisions.SNAPSHOT, 3: revisions.SNAPSHOT}
+    assert StoredEstimate(store.get_revision("Acme", 3)).inputs["total_perimeter"] == 103
+    with pytest.raises(ValueError):
+        store.get_revision("Acme", 2)
+
+
+def test_batch_save_stands_when_its_revisions_are_not_logged(flaky):
+    log, store = flaky
+    _save_versions(store, 1)
+    log.fail_next = True
+    inputs = _inputs(102)
+    report = store.save_many([("Acme", inputs, pricing.price_estimate(inputs), None, 1)])
+    assert [(outcome["ok"], outcome["version"]) for outcome in report] == [(True, 2)]
+
+    inputs = _inputs(103)
+    store.save_many([("Acme", inputs, pricing.price_estimate(inputs), None, 2)])
+    assert StoredEstimate(store.get_revision("Acme", 3)).inputs["total_perimeter"] == 103
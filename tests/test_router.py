@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+import router
+
+
+@pytest.fixture
+def page(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "BASE_DIR", str(tmp_path))
+    monkeypatch.setattr(router, "PAGES", {"demo": "demo.py"})
+    monkeypatch.setattr(router, "_compiled_pages", {})
+    path = tmp_path / "demo.py"
+    path.write_text("result = 1\n")
+    return path
+
+
+def _run(code):
+    namespace = {}
+    exec(code, namespace)
+    return namespace["result"]
+
+
+def _edit(path, source):
+    # Bump the mtime past the filesystem's resolution
+    mtime = os.path.getmtime(path)
+    path.write_text(source)
+    os.utime(path, (mtime + 10, mtime + 10))
+
+
+def test_registered_pages_exist():
+    router.validate_pages()
+
+
+def test_missing_page_is_reported(page, monkeypatch):
+    monkeypatch.setitem(router.PAGES, "gone", "pages/gone.py")
+
+    with pytest.raises(FileNotFoundError, match="gone"):
+        router.validate_pages()
+
+
+def test_page_is_compiled_once(page):
+    assert router._compiled_page("demo.py") is router._compiled_page("demo.py")
+
+
+def test_changed_page_is_recompiled(page, monkeypatch):
+    monkeypatch.setattr(router, "RELOAD_PAGES", True)
+    assert _run(router._compiled_page("demo.py")) == 1
+
+    _edit(page, "result = 2\n")
+
+    assert _run(router._compiled_page("demo.py")) == 2
+
+
+def test_changed_page_is_kept_without_reload(page, monkeypatch):
+    monkeypatch.setattr(router, "RELOAD_PAGES", False)
+    router._compiled_page("demo.py")
+
+    _edit(page, "result = 2\n")
+
+    assert _run(router._compiled_page("demo.py")) == 1
@@ -0,0 +1,196 @@
+import pytest
+
+import pricing
+import save_queue
+from estimate_codec import StoredEstimate
+
+
+def _inputs(**values):
+    inputs = pricing.default_inputs()
+    inputs.update(total_perimeter=200, max_height=20)
+    inputs.update(values)
+    return inputs
+
+
+@pytest.fixture
+def queue(sheet_store, tmp_path):
+    # Flushed by hand: the background thread is stopped straight away
+    queue = save_queue.SaveQueue(sheet_store, str(tmp_path / "queue.db"))
+    queue.stop()
+    return queue
+
+
+def _flush(queue):
+    # A conflict is merged and queued again, so it takes a second pass
+    queue.flush()
+    queue.flush()
+
+
+def _save_and_sync(queue, account_name, inputs):
+    queue.enqueue(account_name, inputs, pricing.price_estimate(inputs), expected_version=0)
+    _flush(queue)
+    return queue.synced(account_name)
+
+
+def test_merge_inputs_takes_both_sides():
+    base = _inputs()
+    merged, clashes = save_queue.merge_inputs(base, dict(base, max_height=25), dict(base, exterior_standard_windows=10))
+    assert clashes == []
+    assert merged["max_height"] == 25
+    assert merged["exterior_standard_windows"] == 10
+
+
+def test_merge_inputs_reports_clashes():
+    base = _inputs()
+    merged, clashes = save_queue.merge_inputs(base, dict(base, max_height=25), dict(base, max_height=30))
+    assert clashes == ["max_height"]
+    assert merged["max_height"] == 25
+
+
+def test_merge_inputs_same_change_is_no_clash():
+    base = _inputs()
+    _, clashes = save_queue.merge_inputs(base, dict(base, max_height=25), dict(base, max_height=25))
+    assert clashes == []
+
+
+def test_changes_to_different_fields_are_merged(queue, sheet_store):
+    base = _save_and_sync(queue, "Acme", _inputs())["inputs"]
+    theirs = dict(base, exterior_standard_windows=10)
+    sheet_store.save("Acme", theirs, pricing.price_estimate(theirs), expected_version=1)
+
+    mine = dict(base, max_height=25)
+    queue.enqueue("Acme", mine, pricing.price_estimate(mine), expected_version=1, base_inputs=base)
+    _flush(queue)
+
+    assert queue.status("Acme") == ("synced", None)
+    synced = queue.synced("Acme")
+    assert synced["version"] == 3
+    assert synced["merged"] == ["exterior_standard_windows"]
+    stored = StoredEstimate(sheet_store.get("Acme"))
+    assert stored.inputs["max_height"] == 25
+    assert stored.inputs["exterior_standard_windows"] == 10
+    # Re-priced with both changes, not either side's results
+    assert stored.results == pricing.price_estimate(stored.inputs)
+
+
+def test_clashing_changes_are_left_as_a_conflict(queue, sheet_store):
+    base = _save_and_sync(queue, "Acme", _inputs())["inputs"]
+    theirs = dict(base, max_height=30)
+    sheet_store.save("Acme", theirs, pricing.price_estimate(theirs), expected_version=1)
+
+    mine = dict(base, max_height=12)
+    queue.enqueue("Acme", mine, pricing.price_estimate(mine), expected_version=1, base_inputs=base)
+    _flush(queue)
+
+    status, error = queue.status("Acme")
+    assert status == "conflict"
+    assert "max height" in error
+    # Their save is kept
+    stored = sheet_store.get("Acme")
+    assert stored["Version"] == 2
+    assert StoredEstimate(stored).inputs["max_height"] == 30
+
+
+def test_save_without_a_base_conflicts(queue, sheet_store):
+    _save_and_sync(queue, "Acme", _inputs())
+    theirs = _inputs(max_height=30)
+    sheet_store.save("Acme", theirs, pricing.price_estimate(theirs))
+
+    mine = _inputs(max_height=12)
+    queue.enqueue("Acme", mine, pricing.price_estimate(mine), expected_version=1)
+    _flush(queue)
+
+    assert queue.status("Acme")[0] == "conflict"
+
+
+def test_second_save_while_the_first_is_in_flight(queue, sheet_store):
+    # The estimator saves a new account twice; the first save is being sent
+    # when the second is queued, both expecting a new account
+    first = _inputs()
+    queue.enqueue("Acme", first, pricing.price_estimate(first), expected_version=0)
+    in_flight = queue._due_batch()
+    second = _inputs(max_height=25)
+    queue.enqueue("Acme", second, pricing.price_estimate(second), expected_version=0)
+    queue._send(in_flight)
+    _flush(queue)
+
+    assert queue.status("Acme") == ("synced", None)
+    assert queue.synced("Acme")["version"] == 2
+    assert StoredEstimate(sheet_store.get("Acme")).inputs == second
+
+
+def test_second_save_while_the_first_is_queued(queue, sheet_store):
+    first = _inputs()
+    queue.enqueue("Acme", first, pricing.price_estimate(first), expected_version=0)
+    second = _inputs(max_height=25)
+    queue.enqueue("Acme", second, pricing.price_estimate(second), expected_version=0)
+    _flush(queue)
+
+    assert queue.status("Acme") == ("synced", None)
+    assert StoredEstimate(sheet_store.get("Acme")).inputs == second
+
+
+def test_save_is_queued_then_synced(queue, sheet_store):
+    inputs = _inputs()
+    queue.enqueue("Acme", inputs, pricing.price_estimate(inputs))
+
+    assert queue.pending_count() == 1
+    assert queue.status("Acme") == ("queued", None)
+    assert sheet_store.get("Acme") is None
+
+    assert queue.flush() == 1
+    assert queue.pending_count() == 0
+    assert queue.status("Acme") == ("synced", None)
+    assert StoredEstimate(sheet_store.get("Acme")).inputs == inputs
+
+
+def test_saving_again_replaces_the_queued_copy(queue, sheet_store, monkeypatch):
+    sent = []
+    save_many = sheet_store.save_many
+    monkeypatch.setattr(sheet_store, "save_many", lambda estimates: sent.append(len(estimates)) or save_many(estimates))
+    for windows in (1, 2, 3):
+        inputs = _inputs(exterior_standard_windows=windows)
+        queue.enqueue("Acme", inputs, pricing.price_estimate(inputs))
+
+    assert queue.pending_count() == 1
+    queue.flush()
+    assert sent == [1]
+    assert StoredEstimate(sheet_store.get("Acme")).inputs["exterior_standard_windows"] == 3
+
+
+def test_failed_save_is_retried_with_backoff(queue, sheet_store, monkeypatch):
+    def unavailable(estimates):
+        raise ConnectionError("network down")
+
+    monkeypatch.setattr(sheet_store, "save_many", unavailable)
+    inputs = _inputs()
+    queue.enqueue("Acme", inputs, pricing.price_estimate(inputs))
+
+    assert queue.flush() == 0
+    assert queue.status("Acme") == ("retrying", "network down")
+    assert queue._seconds_until_due() > save_queue.RETRY_BASE_SECONDS - 1
+    # Not due yet, so nothing is sent
+    assert queue._due_batch() == []
+
+    monkeypatch.undo()
+    with queue._conn:
+        queue._conn.execute("UPDATE save_queue SET next_attempt_at = 0")
+    assert queue.flush() == 1
+    assert queue.status("Acme") == ("synced", None)
+
+
+def test_queued_saves_survive_a_restart(sheet_store, tmp_path):
+    path = str(tmp_path / "queue.db")
+    first = save_queue.SaveQueue(sheet_store, path)
+    first.stop()
+    inputs = _inputs()
+    first.enqueue("Acme", inputs, pricing.price_estimate(inputs))
+
+    assert sheet_store.get("Acme") is None
+    # The new queue's thread may send it before stop() returns
+    second = save_queue.SaveQueue(sheet_store, path)
+    second.stop()
+    second.flush()
+
+    assert second.status("Acme") == ("synced", None)
+    assert StoredEstimate(sheet_store.get("Acme")).inputs == inputs
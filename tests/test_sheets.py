@@ -0,0 +1,202 @@
+import json
+
+import pytest
+import requests
+from gspread.exceptions import APIError
+
+import pricing
+import sheets
+import storage
+from fake_sheets import FakeWorksheet, quota_error
+from storage import ConflictError
+
+
+class RacingWorksheet(FakeWorksheet):
+    # Another process appends the same new account just before our append
+    competing = None
+
+    def _compete(self, account_name):
+        if self.competing == account_name:
+            self.competing = None
+            FakeWorksheet.append_row(self, [account_name, "theirs", "{}", "{}", "1"])
+
+    def append_row(self, values):
+        self._compete(values[0])
+        return super().append_row(values)
+
+    def append_rows(self, values):
+        self._compete(values[0][0])
+        return super().append_rows(values)
+
+
+@pytest.fixture
+def racing(spreadsheet_id):
+    worksheet = RacingWorksheet()
+    sheets.use_worksheet(spreadsheet_id, worksheet, FakeWorksheet(headers=sheets.REVISION_HEADERS))
+    return worksheet, storage.SheetsEstimateStore(spreadsheet_id)
+
+
+def _estimate():
+    inputs = pricing.default_inputs()
+    inputs.update(total_perimeter=200, max_height=20)
+    return inputs, pricing.price_estimate(inputs)
+
+
+def _account_rows(worksheet, account_name):
+    return [row for row in worksheet.rows[1:] if row and row[0] == account_name]
+
+
+def test_duplicate_append_keeps_the_first_copy(racing):
+    worksheet, store = racing
+    worksheet.competing = "New Co"
+
+    with pytest.raises(ConflictError):
+        store.save("New Co", *_estimate(), expected_version=0)
+
+    assert [row[1] for row in _account_rows(worksheet, "New Co")] == ["theirs"]
+    assert store.get("New Co")["Timestamp"] == "theirs"
+    assert store.list_accounts() == ["New Co"]
+
+
+def test_duplicate_append_in_a_batch_keeps_the_first_copy(racing):
+    worksheet, store = racing
+    worksheet.competing = "New Co"
+    inputs, results = _estimate()
+
+    report = store.save_many([("New Co", inputs, results, None, 0), ("Other Co", inputs, results, None, 0)])
+
+    assert [(outcome["ok"], outcome["conflict"]) for outcome in report] == [(False, True), (True, False)]
+    assert [row[1] for row in _account_rows(worksheet, "New Co")] == ["theirs"]
+    assert len(_account_rows(worksheet, "Other Co")) == 1
+    assert store.get("Other Co")["Version"] == 1
+
+
+def test_duplicate_append_is_not_logged(racing, spreadsheet_id):
+    worksheet, store = racing
+    worksheet.competing = "New Co"
+
+    with pytest.raises(ConflictError):
+        store.save("New Co", *_estimate(), expected_version=0)
+
+    assert sheets.revision_rows("New Co", spreadsheet_id) == []
+
+
+def test_stale_expected_version_conflicts(sheet_store):
+    inputs, results = _estimate()
+    sheet_store.save("Acme", inputs, results, expected_version=0)
+    sheet_store.save("Acme", inputs, results, expected_version=1)
+
+    with pytest.raises(ConflictError):
+        sheet_store.save("Acme", inputs, results, expected_version=1)
+    assert sheet_store.get("Acme")["Version"] == 2
+
+
+def _api_error(code):
+    response = requests.Response()
+    response.status_code = code
+    response._content = json.dumps({"error": {"code": code, "message": "test", "status": "TEST"}}).encode()
+    return APIError(response)
+
+
+def test_client_is_authorized_once(monkeypatch):
+    clients = []
+    monkeypatch.setattr(sheets, "_client", None)
+    monkeypatch.setattr(sheets, "_new_client", lambda: clients.append(object()) or clients[-1])
+
+    assert sheets.get_google_sheets_client() is sheets.get_google_sheets_client()
+    assert len(clients) == 1
+
+
+def test_revoked_credentials_are_refreshed_once(monkeypatch, spreadsheet_id):
+    authorized = []
+    monkeypatch.setattr(sheets, "reset_client", lambda: authorized.append(True))
+    calls = []
+
+    def operation(sheet):
+        calls.append(sheet)
+        if len(calls) == 1:
+            raise _api_error(401)
+        return "ok"
+
+    assert sheets.with_worksheet(operation, spreadsheet_id, lambda _: "sheet") == "ok"
+    assert (len(calls), len(authorized)) == (2, 1)
+
+
+def test_other_api_errors_are_raised(spreadsheet_id):
+    def operation(sheet):
+        raise _api_error(429)
+
+    with pytest.raises(APIError):
+        sheets.with_worksheet(operation, spreadsheet_id, lambda _: "sheet")
+
+
+def _saved(store, *account_names):
+    inputs, results = _estimate()
+    for account_name in account_names:
+        store.save(account_name, inputs, results)
+
+
+def test_saves_use_the_row_index(sheet_store, spreadsheet_id):
+    _saved(sheet_store, "Acme", "Bravo", "Charlie")
+    sheet = sheets.get_worksheet(spreadsheet_id)
+    sheet.calls.clear()
+
+    _saved(sheet_store, "Bravo")
+
+    assert "get_all_records" not in sheet.calls
+    assert sheet.calls.get("col_values", 0) == 0
+    assert [row[0] for row in sheet.rows[1:]] == ["Acme", "Bravo", "Charlie"]
+    assert sheet_store.get("Bravo")["Version"] == 2
+
+
+def test_rows_moved_by_hand_are_found_again(sheet_store, spreadsheet_id):
+    _saved(sheet_store, "Acme", "Bravo", "Charlie")
+    sheet = sheets.get_worksheet(spreadsheet_id)
+    # Someone sorts the sheet in reverse
+    sheet.rows[1:] = sheet.rows[:0:-1]
+
+    _saved(sheet_store, "Acme")
+
+    assert [row[0] for row in sheet.rows[1:]] == ["Charlie", "Bravo", "Acme"]
+    assert [row[4] for row in sheet.rows[1:]] == ["1", "1", "2"]
+    assert sheets.find_account_row(sheet, spreadsheet_id, "Acme") == 4
+
+
+def test_bulk_save_uses_one_write_per_kind(sheet_store, spreadsheet_id):
+    _saved(sheet_store, "Acme", "Bravo")
+    sheet = sheets.get_worksheet(spreadsheet_id)
+    sheet.calls.clear()
+    inputs, results = _estimate()
+
+    report = sheet_store.save_many([(name, inputs, results) for name in ["Acme", "New 1", "Bravo", "New 2"]])
+
+    assert [(outcome["account_name"], outcome["version"]) for outcome in report] == [
+        ("Acme", 2), ("New 1", 1), ("Bravo", 2), ("New 2", 1),
+    ]
+    assert sheet.calls["batch_update"] == 1
+    assert sheet.calls["append_rows"] == 1
+    assert "update" not in sheet.calls and "append_row" not in sheet.calls
+    assert [row[0] for row in sheet.rows[1:]] == ["Acme", "Bravo", "New 1", "New 2"]
+
+
+def test_bulk_save_keeps_the_last_copy_of_an_account(sheet_store, spreadsheet_id):
+    report = sheet_store.save_many([("Acme", *_estimate()), ("Acme", *_estimate())])
+    assert [outcome["ok"] for outcome in report] == [True, True]
+    assert [row[0] for row in sheets.get_worksheet(spreadsheet_id).rows[1:]] == ["Acme"]
+
+
+def test_bulk_save_reports_a_failed_write(sheet_store, spreadsheet_id):
+    _saved(sheet_store, "Acme")
+    sheet = sheets.get_worksheet(spreadsheet_id)
+
+    def quota_exceeded(*args):
+        raise quota_error()
+
+    sheet.batch_update = sheet.append_rows = quota_exceeded
+
+    report = sheet_store.save_many([("Acme", *_estimate()), ("New Co", *_estimate())])
+
+    assert [(outcome["ok"], outcome["conflict"]) for outcome in report] == [(False, False), (False, False)]
+    assert all("Quota exceeded" in outcome["error"] for outcome in report)
+    assert sheet_store.get("Acme")["Version"] == 1
+    assert sheet_store.get("New Co") is None
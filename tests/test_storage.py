@@ -0,0 +1,131 @@
+import pytest
+
+import pricing
+import storage
+from estimate_codec import StoredEstimate
+
+
+def _estimate(total_perimeter=150):
+    inputs = pricing.default_inputs()
+    inputs.update(total_perimeter=total_perimeter, max_height=20)
+    return inputs, pricing.price_estimate(inputs)
+
+
+@pytest.fixture(params=["sqlite", "sheets", "cached"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return storage.SQLiteEstimateStore(str(tmp_path / "estimates.db"))
+    if request.param == "sheets":
+        return request.getfixturevalue("sheet_store")
+    return storage.CachedEstimateStore(storage.SQLiteEstimateStore(str(tmp_path / "cached.db")))
+
+
+def test_estimate_store_is_abstract():
+    with pytest.raises(TypeError):
+        storage.EstimateStore()
+
+
+def test_save_then_get(store):
+    inputs, results = _estimate()
+    record = store.save("Acme", inputs, results, timestamp="2024-05-17 14:03:00")
+
+    assert record["Version"] == 1
+    assert store.get("Acme") == record
+    stored = StoredEstimate(store.get("Acme"))
+    assert (stored.inputs, stored.results, stored.timestamp) == (inputs, results, "2024-05-17 14:03:00")
+    assert store.get("Nobody") is None
+
+
+def test_saving_again_replaces_the_record(store):
+    store.save("Acme", *_estimate(150))
+    inputs, results = _estimate(300)
+    assert store.save("Acme", inputs, results)["Version"] == 2
+
+    assert store.list_accounts() == ["Acme"]
+    assert StoredEstimate(store.get("Acme")).inputs["total_perimeter"] == 300
+
+
+def test_list_recent_is_newest_first(store):
+    for number, timestamp in enumerate(["2024-01-01 09:00:00", "2024-03-01 09:00:00", "2024-02-01 09:00:00"]):
+        store.save(f"Account {number}", *_estimate(), timestamp=timestamp)
+
+    assert [record["Account Name"] for record in store.list_recent(2)] == ["Account 1", "Account 2"]
+    assert len(store.list_recent(limit=None)) == 3
+    assert sorted(store.list_accounts()) == ["Account 0", "Account 1", "Account 2"]
+
+
+def test_iter_records_reads_every_record_in_chunks(store):
+    store.save_many([(f"Account {number}", *_estimate()) for number in range(7)])
+    names = [record["Account Name"] for record in store.iter_records(chunk_size=3)]
+    assert sorted(names) == [f"Account {number}" for number in range(7)]
+
+
+def test_save_many_reports_each_estimate(store):
+    inputs, results = _estimate()
+    store.save("Acme", inputs, results)
+    report = store.save_many([("Acme", inputs, results, None, 0), ("New Co", inputs, results)])
+    assert [(outcome["ok"], outcome["conflict"]) for outcome in report] == [(False, True), (True, False)]
+
+
+def test_cached_store_sees_its_own_saves(tmp_path):
+    store = storage.CachedEstimateStore(storage.SQLiteEstimateStore(str(tmp_path / "estimates.db")), ttl=60)
+    assert store.list_accounts() == []
+    assert store.index().search(prefix="Ac") == []
+    store.save("Acme", *_estimate())
+    assert store.list_accounts() == ["Acme"]
+    assert [summary["Account Name"] for summary in store.index().search(prefix="Ac")] == ["Acme"]
+
+
+@pytest.fixture
+def counted(tmp_path, monkeypatch):
+    # A cached SQLite store that counts the reads reaching the database
+    backing = storage.SQLiteEstimateStore(str(tmp_path / "estimates.db"))
+    reads = []
+    for method in ("get", "list_accounts", "list_recent"):
+        read = getattr(backing, method)
+        monkeypatch.setattr(backing, method, lambda *args, read=read, method=method: reads.append(method) or read(*args))
+    return storage.CachedEstimateStore(backing, ttl=60), reads
+
+
+def test_cached_store_reads_once_within_the_ttl(counted):
+    store, reads = counted
+    store.store.save("Acme", *_estimate())
+
+    for _ in range(3):
+        store.get("Acme")
+        store.list_accounts()
+        store.list_recent(10)
+
+    assert sorted(reads) == ["get", "list_accounts", "list_recent"]
+
+
+def test_cached_store_reads_again_after_the_ttl(counted):
+    store, reads = counted
+    store.ttl = 0
+
+    store.list_recent(10)
+    store.list_recent(10)
+
+    assert reads == ["list_recent", "list_recent"]
+
+
+def test_cached_store_keeps_each_page_size_apart(counted):
+    store, reads = counted
+    for number in range(5):
+        store.store.save(f"Account {number}", *_estimate(), timestamp=f"2024-01-0{number + 1} 09:00:00")
+
+    assert len(store.list_recent(2)) == 2
+    assert len(store.list_recent(None)) == 5
+    assert reads == ["list_recent", "list_recent"]
+
+
+def test_invalidate_drops_cached_reads(counted):
+    store, reads = counted
+    store.get("Acme")
+    store.store.save("Acme", *_estimate())
+    assert store.get("Acme") is None
+
+    store.invalidate()
+
+    assert store.get("Acme")["Account Name"] == "Acme"
+    assert reads == ["get", "get"]
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import pricing
+import sweep
+
+
+def test_value_range_includes_stop():
+    assert sweep.value_range(0, 10, 0.25).tolist()[-2:] == [9.75, 10.0]
+    assert sweep.value_range(100, 400, 10).tolist() == list(range(100, 401, 10))
+    assert sweep.value_range(5, 1, 1).tolist() == []
+
+
+def test_value_range_needs_a_positive_step():
+    with pytest.raises(ValueError, match="positive"):
+        sweep.value_range(0, 10, 0)
+
+
+def test_sweep_matches_price_estimate():
+    base = pricing.default_inputs()
+    base.update(max_height=20, gutter_linear_feet=120)
+    perimeters = [0, 120, 151.5]
+    dirtiness = pricing.INPUT_CHOICES["house_dirtiness"]
+
+    results = sweep.sweep({"total_perimeter": perimeters, "house_dirtiness": dirtiness}, base, ["gutter cleaning"])
+
+    assert results["total"].shape == (3, 3)
+    for i, perimeter in enumerate(perimeters):
+        for j, level in enumerate(dirtiness):
+            inputs = dict(base, total_perimeter=perimeter, house_dirtiness=level, gutter_cleaning="YES")
+            if pricing.missing_details(inputs):
+                assert not results["valid"][i, j]
+                continue
+            expected = pricing.price_estimate(inputs)
+            assert results["valid"][i, j]
+            assert results["total"][i, j] == pytest.approx(expected["total"])
+            assert results["gutter cleaning"][i, j] == pytest.approx(expected["gutter cleaning"])
+
+
+def test_single_axis_sweep():
+    base = pricing.default_inputs()
+    base.update(total_perimeter=180, max_height=20)
+
+    totals = sweep.sweep({"rodent_stations": np.arange(4, 9)}, base)["total"]
+
+    assert totals.shape == (5,)
+    assert totals.tolist() == pytest.approx(
+        [pricing.price_estimate(dict(base, rodent_stations=stations))["total"] for stations in range(4, 9)]
+    )
+
+
+@pytest.mark.parametrize("name", ["custom_items", "rate_version", "not_an_input"])
+def test_unsweepable_inputs_are_rejected(name):
+    with pytest.raises(ValueError, match="Cannot sweep"):
+        sweep.sweep({name: [1, 2]})
+
+
+def test_oversized_sweep_is_rejected(monkeypatch):
+    monkeypatch.setattr(sweep, "MAX_POINTS", 10)
+
+    with pytest.raises(ValueError, match="point limit"):
+        sweep.sweep({"total_perimeter": range(4), "max_height": range(3)})
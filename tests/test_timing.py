@@ -0,0 +1,114 @@
+import asyncio
+import json
+from collections import deque
+
+import pytest
+
+import timing
+
+
+@pytest.fixture(autouse=True)
+def fresh_buffer(monkeypatch):
+    monkeypatch.setattr(timing, "_spans", deque(maxlen=timing.BUFFER_SIZE))
+    monkeypatch.setattr(timing, "_totals", {})
+
+
+def _add(name, *seconds):
+    for value in seconds:
+        timing._spans.append(timing.Span(name, 0.0, value, None, 0, None))
+
+
+def test_span_records_time_and_errors():
+    with timing.span("work"):
+        pass
+    with pytest.raises(KeyError):
+        with timing.span("work"):
+            raise KeyError("missing")
+
+    spans = timing.recent_spans()
+    assert [(item.name, item.error) for item in spans] == [("work", None), ("work", "KeyError")]
+    assert timing.summary()["work"]["errors"] == 1
+
+
+def test_timed_keeps_the_function():
+    @timing.timed("add")
+    def add(a, b):
+        """Adds two numbers."""
+        return a + b
+
+    assert add(2, 3) == 5
+    assert add.__name__ == "add" and add.__doc__ == "Adds two numbers."
+    assert timing.summary()["add"]["count"] == 1
+
+
+def test_summary_quantiles_use_nearest_rank():
+    _add("read", *[value / 100 for value in range(1, 101)])
+
+    stats = timing.summary()["read"]
+
+    assert stats["count"] == 100
+    assert (stats["p50"], stats["p95"], stats["p99"], stats["max"]) == (0.5, 0.95, 0.99, 1.0)
+    assert stats["total"] == pytest.approx(50.5)
+
+
+def test_request_breaks_down_its_spans():
+    with timing.request("page"):
+        with timing.span("pricing"):
+            with timing.span("pricing.inner"):
+                pass
+        with timing.span("sheets"):
+            pass
+        with timing.request("fragment"):
+            pass
+
+    [breakdown] = timing.requests()
+    assert breakdown["name"] == "page"
+    assert set(breakdown["spans"]) == {"pricing", "sheets", "fragment"}
+    assert breakdown["other"] >= 0.0
+
+
+def test_requests_are_newest_first():
+    for name in ("first", "second"):
+        with timing.request(name):
+            pass
+
+    assert [breakdown["name"] for breakdown in timing.requests()] == ["second", "first"]
+    assert [breakdown["name"] for breakdown in timing.requests(limit=1)] == ["second"]
+
+
+def test_concurrent_tasks_keep_their_own_request():
+    async def handle(name):
+        with timing.request(name):
+            await asyncio.sleep(0)
+            with timing.span(f"{name}.work"):
+                await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(handle("a"), handle("b"))
+
+    asyncio.run(main())
+
+    assert sorted((breakdown["name"], list(breakdown["spans"])) for breakdown in timing.requests()) == [
+        ("a", ["a.work"]),
+        ("b", ["b.work"]),
+    ]
+
+
+def test_to_json():
+    _add("read", 0.25)
+
+    assert json.loads(timing.to_json())["spans"]["read"]["count"] == 1
+
+
+def test_to_prometheus_counts_since_start():
+    with timing.span('sheets "read"'):
+        pass
+    timing.clear()
+    with timing.span('sheets "read"'):
+        pass
+
+    text = timing.to_prometheus()
+
+    assert text.endswith("\n")
+    assert 'ccinc_span_seconds_count{span="sheets \\"read\\""} 2' in text
+    assert text.count('quantile="0.5"') == 1
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+import window_catalog
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize(
+    ("counted", "whole_house", "expected"),
+    [(16, True, 14), (16, False, 16), (0, True, 0), (10, True, 9)],
+)
+def test_french_windows_drop_ten_percent_for_a_whole_house(counted, whole_house, expected):
+    assert window_catalog.adjusted_pane_count("frenchie", counted, whole_house) == expected
+
+
+def test_other_window_types_are_not_reduced():
+    assert window_catalog.adjusted_pane_count("single_window", 16, whole_house=True) == 16
+
+
+def test_ids_are_unique():
+    assert len(window_catalog.WINDOW_TYPES_BY_ID) == len(window_catalog.WINDOW_TYPES)
+
+
+@pytest.mark.parametrize("window_type", window_catalog.WINDOW_TYPES, ids=lambda window_type: window_type["id"])
+def test_catalog_images_exist(window_type):
+    images = [window_type["thumbnail"]] + [block["image"] for block in window_type["detail"] if "image" in block]
+    for image in images:
+        assert os.path.isfile(os.path.join(REPO_DIR, image)), image
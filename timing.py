@@ -0,0 +1,175 @@
+import contextvars
+import itertools
+import json
+import math
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from functools import wraps
+
+# Timing spans around the slow parts of a request: page reruns, pricing,
+# Sheets authorization and reads/writes, image loading. Wrap code in
+#
+#   with timing.span("sheets.update"):
+#       ...
+#
+# or decorate a function with @timing.timed("pricing.price_estimate"). Each
+# finished span goes to an in-process ring buffer of the last BUFFER_SIZE
+# spans, which summary() turns into p50/p95/p99 per span name. Spans opened
+# inside timing.request(...) (one per page rerun or API call) are tagged with
+# that request, so requests() can show where each one's time went.
+# to_json() and to_prometheus() export the same numbers; the Latency page
+# shows them to admins.
+
+BUFFER_SIZE = 10000
+QUANTILES = (0.5, 0.95, 0.99)
+
+Span = namedtuple("Span", ["name", "start", "seconds", "request", "depth", "error"])
+
+_lock = threading.Lock()
+_spans = deque(maxlen=BUFFER_SIZE)
+_totals = {}  # span name -> [count, seconds] since the process started, for Prometheus
+_request_ids = itertools.count(1)
+
+# (request id, nesting depth) of the code currently running
+_context = contextvars.ContextVar("timing_context", default=(None, 0))
+
+
+@contextmanager
+def span(name):
+    request_id, depth = _context.get()
+    token = _context.set((request_id, depth + 1))
+    start = time.time()
+    began = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - began
+        _context.reset(token)
+        with _lock:
+            _spans.append(Span(name, start, seconds, request_id, depth, error))
+            total = _totals.setdefault(name, [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+
+
+@contextmanager
+def request(name):
+    # Top-level span for one page rerun, fragment rerun or API call; spans
+    # opened inside it (in this thread or task) are counted towards it. Inside
+    # another request this is just a span. Works as a decorator too.
+    if _context.get()[0] is not None:
+        with span(name):
+            yield
+        return
+    token = _context.set((next(_request_ids), 0))
+    try:
+        with span(name):
+            yield
+    finally:
+        _context.reset(token)
+
+
+def timed(name):
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def clear():
+    with _lock:
+        _spans.clear()
+
+
+def recent_spans():
+    with _lock:
+        return list(_spans)
+
+
+def _quantile(ordered, q):
+    # Nearest-rank quantile of an already sorted list
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def summary():
+    # {span name: {"count", "errors", "total", "max", "p50", "p95", "p99"}}
+    # over the spans in the buffer, times in seconds
+    durations = {}
+    errors = {}
+    for item in recent_spans():
+        durations.setdefault(item.name, []).append(item.seconds)
+        if item.error:
+            errors[item.name] = errors.get(item.name, 0) + 1
+    stats = {}
+    for name, seconds in sorted(durations.items()):
+        seconds.sort()
+        stats[name] = {"count": len(seconds), "errors": errors.get(name, 0), "total": sum(seconds), "max": seconds[-1]}
+        for q in QUANTILES:
+            stats[name][f"p{round(q * 100)}"] = _quantile(seconds, q)
+    return stats
+
+
+def requests(limit=50):
+    # The most recent requests in the buffer, newest first, each with the
+    # time of the spans directly inside it and whatever they don't cover
+    spans = {}
+    roots = {}
+    for item in recent_spans():
+        if item.request is None:
+            continue
+        if item.depth == 0:
+            roots[item.request] = item
+        elif item.depth == 1:
+            spans.setdefault(item.request, []).append(item)
+    breakdowns = []
+    for request_id in sorted(roots, reverse=True)[:limit]:
+        root = roots[request_id]
+        breakdown = {}
+        for item in spans.get(request_id, []):
+            breakdown[item.name] = breakdown.get(item.name, 0.0) + item.seconds
+        breakdowns.append({
+            "request": request_id,
+            "name": root.name,
+            "start": root.start,
+            "seconds": root.seconds,
+            "error": root.error,
+            "spans": breakdown,
+            "other": max(0.0, root.seconds - sum(breakdown.values())),
+        })
+    return breakdowns
+
+
+def to_json(limit=50):
+    return json.dumps({"spans": summary(), "requests": requests(limit)}, indent=2)
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus():
+    # Prometheus text format: quantiles over the buffer, counts and sums
+    # since the process started
+    lines = [
+        "# HELP ccinc_span_seconds Time spent in instrumented operations.",
+        "# TYPE ccinc_span_seconds summary",
+    ]
+    stats = summary()
+    with _lock:
+        totals = {name: tuple(total) for name, total in _totals.items()}
+    for name in sorted(totals):
+        label = _label(name)
+        for q in QUANTILES if name in stats else ():
+            lines.append(f'ccinc_span_seconds{{span="{label}",quantile="{q}"}} {stats[name][f"p{round(q * 100)}"]:.6f}')
+        lines.append(f'ccinc_span_seconds_sum{{span="{label}"}} {totals[name][1]:.6f}')
+        lines.append(f'ccinc_span_seconds_count{{span="{label}"}} {totals[name][0]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,113 @@
+import math
+import streamlit as st
+from assets import image_bytes
+
+# Window types shown in the "How to Count Windows" guide. The grid and every
+# detail page are drawn from this list, so adding a type means adding an entry
+# here. Detail content is a list of blocks drawn in order:
+#   {"image": path, "caption": text}, {"heading": text} or {"text": markdown}
+
+WINDOW_TYPES = [
+    {
+        "id": "top_grids_2_by_2",
+        "name": "Top Grids 2 by 2",
+        "thumbnail": "images/top_grids_2_by_2.jpg",
+        "title": "Counting Top Grids 2 by 2 Windows",
+        "detail": [
+            {"text": "Follow these steps to count the panes for a Top Grids 2 by 2 Window:"},
+            {"image": "images/top_grids_2_by_2.jpg", "caption": "Top Grids 2 by 2 Window"},
+            {"image": "images/top_grids_2_by_2_count.jpg", "caption": "Counting the Panes"},
+            {"heading": "Instructions"},
+            {"text": "- Each red line represents one pane of glass."},
+            {"text": "- Count the number of red lines to determine the total number of panes."},
+            {"text": "- In this example, there are 6 red lines, so this window has **6 panes of glass**."},
+        ],
+        "whole_house_reduction": 0.0,
+    },
+    {
+        "id": "single_window",
+        "name": "Single Window",
+        "thumbnail": "images/single_window.jpg",
+        "title": "Counting Single Windows",
+        "detail": [
+            {"text": "Follow these steps to count the panes for a Single Window:"},
+            {"image": "images/single_window_counted.png", "caption": "Counting the Panes"},
+            {"heading": "Instructions"},
+            {"text": "- This is a single window. The red lines equal one pane of glass."},
+            {"text": "- In this example, there’s **1 pane of glass**."},
+            {"image": "images/single_window_divided.jpg", "caption": "Divided Single Window"},
+            {"text": "- If the windows are large, the panes of glass will be divided such as in this example."},
+            {"text": "- In this example, this is **three panes of glass**."},
+        ],
+        "whole_house_reduction": 0.0,
+    },
+    {
+        "id": "sliding_glass_door",
+        "name": "Sliding Glass Door",
+        "thumbnail": "images/slidinsliding_glass_door.jpg",
+        "title": "Counting Sliding Glass Doors",
+        "detail": [
+            {"text": "Follow these steps to count the panes for a Sliding Glass Door:"},
+            {"image": "images/slidinsliding_glass_door_count.jpg", "caption": "Counting the Panes"},
+            {"heading": "Instructions"},
+            {"text": "- Doors we break into two panes of glass. The blue line represents the split and the red lines represent each pane of glass."},
+            {"text": "- In this example, there are **8 panes of glass**."},
+        ],
+        "whole_house_reduction": 0.0,
+    },
+    {
+        "id": "frenchie",
+        "name": "Frenchie",
+        "thumbnail": "images/frenchie.jpg",
+        "title": "Counting French Windows",
+        "detail": [
+            {"text": "**Important Note:** When counting French windows and the entire house consists of French windows, you must reduce the total pane count by 10% after completing the count. For example, if the total is 16 panes, the adjusted count is 14.4 panes, which we round down to 14."},
+            {"text": "Follow these steps to count the panes for a French Window:"},
+            {"image": "images/frenchie_counted.jpg", "caption": "Counting the Panes"},
+            {"heading": "Instructions"},
+            {"text": "- Most of the time, depending on size, for Frenchies, 2 panes of glass count as one. All the red lines represent one pane of glass."},
+            {"text": "- In this example, there are **16 panes of glass** to be accounted for."},
+        ],
+        "whole_house_reduction": 0.10,
+    },
+]
+
+WINDOW_TYPES_BY_ID = {window_type["id"]: window_type for window_type in WINDOW_TYPES}
+
+
+def adjusted_pane_count(window_type_id, counted_panes, whole_house=False):
+    # Pane count to quote: French windows drop 10% (rounded down) when the
+    # whole house is French windows
+    window_type = WINDOW_TYPES_BY_ID[window_type_id]
+    if whole_house and window_type["whole_house_reduction"]:
+        return math.floor(counted_panes * (1 - window_type["whole_house_reduction"]))
+    return counted_panes
+
+
+def render_grid(on_select, columns=2):
+    # Thumbnails only; detail images are not touched until a type is selected
+    for start in range(0, len(WINDOW_TYPES), columns):
+        row_cols = st.columns(columns)
+        for col, window_type in zip(row_cols, WINDOW_TYPES[start:start + columns]):
+            with col:
+                st.markdown('<div class="image-container">', unsafe_allow_html=True)
+                st.image(image_bytes(window_type["thumbnail"], "grid"), caption=window_type["name"], use_container_width=False)
+                st.markdown('</div>', unsafe_allow_html=True)
+                if st.button("Select", key=window_type["id"]):
+                    on_select(window_type["id"])
+
+
+def render_detail(window_type_id, use_container_width=False):
+    window_type = WINDOW_TYPES_BY_ID[window_type_id]
+    st.title(window_type["title"])
+    for block in window_type["detail"]:
+        if "image" in block:
+            st.image(image_bytes(block["image"], "detail"), caption=block["caption"], use_container_width=use_container_width)
+        elif "heading" in block:
+            st.write(f"### {block['heading']}")
+        else:
+            st.write(block["text"])
+    if window_type["whole_house_reduction"]:
+        counted = st.number_input("Total panes counted", min_value=0, step=1, key=f"{window_type_id}_counted")
+        whole_house = st.checkbox("The entire house is this window type", key=f"{window_type_id}_whole_house")
+        st.write(f"Panes to quote: **{adjusted_pane_count(window_type_id, counted, whole_house)}**")